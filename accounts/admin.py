@@ -11,13 +11,10 @@ from .models import User
 def approve_user(modeladmin, request, queryset):
     auth_facade = AuthenticationFacade()
 
-    result = []
-    for user in queryset:
-        approval_result = auth_facade.approve_user(user.id)
-        result.append(f"User {user.user_name} approval result: {approval_result}")
+    result = auth_facade.approve_users(queryset)
 
     # Returning results in an admin message
-    modeladmin.message_user(request, "\n".join(result))
+    modeladmin.message_user(request, result["message"])
 
 
 approve_user.short_description = "Approve selected users"
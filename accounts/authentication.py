@@ -0,0 +1,66 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.services.jwt_service_impl import JWTServiceImpl
+from accounts.services.token_cache_service import token_user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user from the verified-token cache.
+
+    The token signature and expiry are still checked on every request through
+    JWTServiceImpl.verify_token; only the User lookup is cached, keyed by the
+    token's jti.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jwt_service = JWTServiceImpl()
+        self.token_cache = token_user_cache
+
+    def get_validated_token(self, raw_token):
+        return self.jwt_service.verify_token(raw_token)
+
+    def get_user(self, validated_token):
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if jti is None or user_id is None:
+            return super().get_user(validated_token)
+
+        snapshot, generation = self.token_cache.get(jti, user_id)
+        if snapshot is not None:
+            return self.token_cache.to_user(snapshot)
+
+        # Raises AuthenticationFailed for unknown or inactive users, which are
+        # therefore never cached.
+        user = super().get_user(validated_token)
+        self.token_cache.set(jti, user, generation, validated_token["exp"])
+        return user
+
+
+class TokenClaimsJWTAuthentication(CachedJWTAuthentication):
+    """
+    Stateless variant for read-only endpoints that only need the user's id and
+    user_name: request.user is built from the claims embedded by
+    JWTServiceImpl.generate_token, with no database or cache round trip.
+
+    Deactivating or deleting a user revokes the tokens issued to them so far
+    (TokenUserCache.revoke_user). Revoked tokens, tokens issued before the
+    claims existed, and any token while the cache is unavailable fall back
+    to the cached lookup, which checks the user in the database.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        claims = {
+            claim: validated_token.get(claim) for claim in JWTServiceImpl.USER_CLAIMS
+        }
+        if user_id is None or None in claims.values():
+            return super().get_user(validated_token)
+
+        revoked_at = self.token_cache.revoked_at(user_id)
+        if revoked_at is None or validated_token.get("iat", 0) <= revoked_at:
+            return super().get_user(validated_token)
+
+        return self.token_cache.to_user({"id": user_id, "is_active": True, **claims})
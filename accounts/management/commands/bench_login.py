@@ -0,0 +1,99 @@
+import logging
+import random
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from accounts.models import User
+from accounts.services.missing_user_cache import missing_user_cache
+from common.db.instrumentation import QueryRecorder
+
+BENCH_USER_NAME = "bench_login_user"
+BENCH_PASSWORD = "bench-password-123"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the login endpoint under a synthetic brute-force mix of "
+        "unknown user names, wrong passwords and valid logins."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument(
+            "--missing-ratio",
+            type=float,
+            default=0.9,
+            help="Share of attempts against user names that do not exist.",
+        )
+        parser.add_argument(
+            "--valid-ratio",
+            type=float,
+            default=0.01,
+            help="Share of attempts with the correct password.",
+        )
+        parser.add_argument(
+            "--distinct-missing",
+            type=int,
+            default=200,
+            help="Size of the pool of unknown user names the attacker cycles through.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        missing_names = [f"ghost_{i}" for i in range(options["distinct_missing"])]
+        for name in missing_names:
+            missing_user_cache.discard(name)
+
+        # Every failed attempt is a 400; keep django.request from logging each one.
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        client = Client(HTTP_HOST="localhost")
+        url = reverse("accounts:login")
+        latencies = defaultdict(list)
+        queries = defaultdict(int)
+
+        # The test client handles requests on this thread and connection, so
+        # the bench user and anything the logins write are rolled back.
+        with transaction.atomic():
+            User.objects.create_user(
+                user_name=BENCH_USER_NAME, password=BENCH_PASSWORD, is_approved=True
+            )
+            started = time.perf_counter()
+            for _ in range(options["requests"]):
+                roll = rng.random()
+                if roll < options["missing_ratio"]:
+                    kind = "missing_user"
+                    payload = {"username": rng.choice(missing_names), "password": "x"}
+                elif roll < options["missing_ratio"] + options["valid_ratio"]:
+                    kind = "valid"
+                    payload = {"username": BENCH_USER_NAME, "password": BENCH_PASSWORD}
+                else:
+                    kind = "wrong_password"
+                    payload = {"username": BENCH_USER_NAME, "password": "wrong"}
+
+                request_started = time.perf_counter()
+                with QueryRecorder() as recorder:
+                    client.post(url, payload)
+                latencies[kind].append(time.perf_counter() - request_started)
+                queries[kind] += recorder.count
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        missing_user_cache.discard(BENCH_USER_NAME)
+
+        self.stdout.write(
+            f"{options['requests']} requests in {elapsed:.2f}s "
+            f"-> {options['requests'] / elapsed:.1f} req/s"
+        )
+        for kind, samples in sorted(latencies.items()):
+            samples.sort()
+            self.stdout.write(
+                f"  {kind:<15} n={len(samples):<6} "
+                f"mean={1000 * sum(samples) / len(samples):7.2f}ms "
+                f"p95={1000 * samples[int(len(samples) * 0.95) - 1]:7.2f}ms "
+                f"queries/req={queries[kind] / len(samples):.2f}"
+            )
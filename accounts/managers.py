@@ -3,19 +3,64 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin,
 )
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
 
 
 class UserManager(BaseUserManager):
-    def create_user(self, user_name, password=None, **extra_fields):
+    def _build_user(self, user_name, **extra_fields):
         if not user_name:
             raise ValueError("The user_name number must be provided")
         user_name = user_name.lower()
-        user = self.model(user_name=user_name, **extra_fields)
+        return self.model(user_name=user_name, **extra_fields)
+
+    def create_user(self, user_name, password=None, **extra_fields):
+        user = self._build_user(user_name, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
         return user
 
+    def create_user_with_hash(self, user_name, password_hash, **extra_fields):
+        """
+        Create a user from an already-hashed password, e.g. one produced by
+        the password hashing executor off the request thread.
+
+        The INSERT runs in a savepoint so that a duplicate user_name raises
+        IntegrityError without breaking an enclosing transaction; callers rely
+        on the unique index instead of a separate exists() query.
+        """
+        user = self._build_user(user_name, password=password_hash, **extra_fields)
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db)
+        return user
+
+    async def acreate_user_with_hash(self, user_name, password_hash, **extra_fields):
+        return await sync_to_async(self.create_user_with_hash)(
+            user_name, password_hash, **extra_fields
+        )
+
+    def approve_pending(self, users):
+        """
+        Approve every not-yet-approved user among `users`, a User queryset or
+        an iterable of ids, and return [(id, user_name), ...] for the rows that
+        actually changed. The pending rows are locked while they are read, so
+        a concurrent approval cannot report them twice. Bypasses save() and
+        its signals.
+        """
+        if not isinstance(users, models.QuerySet):
+            users = self.filter(id__in=list(users))
+        with transaction.atomic(using=self._db):
+            approved = list(
+                users.filter(is_approved=False)
+                .select_for_update()
+                .values_list("id", "user_name")
+            )
+            if approved:
+                self.filter(id__in=[user_id for user_id, _ in approved]).update(
+                    is_approved=True
+                )
+        return approved
+
     def create_superuser(self, user_name, password=None, **extra_fields):
         extra_fields.setdefault("is_staff", True)
         extra_fields.setdefault("is_superuser", True)
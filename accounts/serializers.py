@@ -1,17 +1,18 @@
 from django.core.exceptions import ValidationError
 from rest_framework import serializers
 
-from accounts.models import User
-
 
 class UserSignupSerializer(serializers.Serializer):
     username = serializers.CharField(max_length=20)
     password = serializers.CharField(write_only=True)
 
     def validate_username(self, value):
-        # Check if the username already exists
-        if User.objects.filter(user_name=value).exists():
-            raise serializers.ValidationError(
-                "Please choose another username. This one is already taken."
-            )
-        return value
+        # Uniqueness is enforced by the user_name unique index when the user is
+        # inserted (AuthenticationFacade.signup); only normalize here.
+        return value.lower()
+
+
+class BulkApproveUsersSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=10000
+    )
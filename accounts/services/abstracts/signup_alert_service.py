@@ -9,3 +9,9 @@ class AbstractAdminAlertService(ABC):
         """
         pass
 
+    @abstractmethod
+    def send_approval_notification(self, user_names: list) -> bool:
+        """
+        send one notification to admin for a batch of approved users.
+        """
+        pass
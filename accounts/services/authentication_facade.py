@@ -1,27 +1,63 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 
 from accounts.models import User
 from accounts.services.jwt_service_impl import JWTServiceImpl
+from accounts.services.missing_user_cache import missing_user_cache
+from accounts.services.password_hashing_executor import password_hashing_executor
 from accounts.services.signup_alert_service_impl import AdminAuthAlertService
+from accounts.services.token_cache_service import token_user_cache
 from accounts.services.user_validation_impl import UserValidationServiceImpl
 
 
+USERNAME_TAKEN_ERROR = "Please choose another username. This one is already taken."
+
+# Columns needed to decide a login and issue tokens; fetched in one indexed query.
+LOGIN_FIELDS = ("id", "user_name", "password", "is_active", "is_approved")
+
+
 class AuthenticationFacade:
     def __init__(self):
         self.jwt_service = JWTServiceImpl()
         self.user_validation = UserValidationServiceImpl()
         self.telegram_service = AdminAuthAlertService()
+        self.missing_users = missing_user_cache
 
     def signup(self, username: str, password: str) -> dict:
 
-        # Create the user with the username and password
-        user = User.objects.create_user(user_name=username, password=password)
+        # Create the user with the username and password; a taken name is
+        # reported by the unique index rather than a separate exists() query.
+        try:
+            user = User.objects.create_user_with_hash(
+                user_name=username, password_hash=make_password(password)
+            )
+        except IntegrityError:
+            return {"error": USERNAME_TAKEN_ERROR}
 
         # Send notification to Telegram bot about new signup
         self.telegram_service.send_signup_notification(user)
 
         return {"message": "Signup successful. Awaiting admin approval."}
 
+    async def asignup(self, username: str, password: str) -> dict:
+        """
+        Async signup: the password is hashed in the hashing executor's
+        process pool while the caller only awaits.
+        """
+        password_hash = await password_hashing_executor.make_password(password)
+        try:
+            user = await User.objects.acreate_user_with_hash(
+                user_name=username, password_hash=password_hash
+            )
+        except IntegrityError:
+            return {"error": USERNAME_TAKEN_ERROR}
+
+        await sync_to_async(self.telegram_service.send_signup_notification)(user)
+
+        return {"message": "Signup successful. Awaiting admin approval."}
+
     def approve_user(self, user_id: int) -> dict:
         try:
             user = User.objects.get(id=user_id)
@@ -31,8 +67,33 @@ class AuthenticationFacade:
         except User.DoesNotExist:
             return {"error": "User not found."}
 
+    def approve_users(self, users) -> dict:
+        """
+        Approve many users, given as a queryset or ids, with one UPDATE and
+        one admin notification. Users that are missing or already approved
+        are skipped.
+        """
+        approved = User.objects.approve_pending(users)
+        if approved:
+            # The bulk UPDATE bypasses post_save, so invalidate explicitly.
+            token_user_cache.invalidate_users([user_id for user_id, _ in approved])
+            self.telegram_service.send_approval_notification(
+                [user_name for _, user_name in approved]
+            )
+        return {
+            "message": f"{len(approved)} users approved successfully.",
+            "approved": [user_name for _, user_name in approved],
+        }
+
     def login(self, username: str, password: str) -> dict:
-        user = User.objects.get(user_name=username)
+        username = (username or "").lower()
+        if not username or self.missing_users.contains(username):
+            return {"error": "User not found."}
+
+        user = User.objects.filter(user_name=username).only(*LOGIN_FIELDS).first()
+        if user is None:
+            self.missing_users.add(username)
+            return {"error": "User not found."}
 
         # Check if user is approved
         if user.is_approved:
@@ -43,3 +104,27 @@ class AuthenticationFacade:
                 return {"error": "Invalid password"}
         else:
             return {"error": "User not approved by admin"}
+
+    async def alogin(self, username: str, password: str) -> dict:
+        """
+        Async login: same rules as login(), with the password check offloaded
+        to the hashing executor.
+        """
+        username = (username or "").lower()
+        if not username or await self.missing_users.acontains(username):
+            return {"error": "User not found."}
+
+        user = (
+            await User.objects.filter(user_name=username).only(*LOGIN_FIELDS).afirst()
+        )
+        if user is None:
+            await self.missing_users.aadd(username)
+            return {"error": "User not found."}
+
+        if not user.is_approved:
+            return {"error": "User not approved by admin"}
+
+        if await password_hashing_executor.check_password(user, password):
+            tokens = self.jwt_service.generate_token(user)
+            return {"tokens": tokens}
+        return {"error": "Invalid password"}
@@ -1,3 +1,4 @@
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -5,23 +6,32 @@ from accounts.services.abstracts.jwt_service import AbstractJWTService
 
 
 class JWTServiceImpl(AbstractJWTService):
+    # Claims copied from the user into both tokens, so read-only endpoints can
+    # build request.user without a database lookup (TokenClaimsJWTAuthentication).
+    USER_CLAIMS = ("user_name", "is_approved")
+
     def generate_token(self, user) -> dict:
         """
         Generate and return a pair of tokens (access and refresh) for the given user.
-        Uses DRF Simple JWT's RefreshToken.
+        Uses DRF Simple JWT's RefreshToken; USER_CLAIMS are embedded in both tokens.
         """
         refresh = RefreshToken.for_user(user)
+        for claim in self.USER_CLAIMS:
+            refresh[claim] = getattr(user, claim)
         return {"access": str(refresh.access_token), "refresh": str(refresh)}
 
     def verify_token(self, token: str):
         """
         Verify the JWT token.
         Uses DRF Simple JWT's JWTAuthentication to validate the token.
-        Returns the validated token (which includes claims) if valid.
+        Returns the validated token (which includes claims) if valid, raises
+        AuthenticationFailed (a 401 when raised inside a view) otherwise.
         """
         jwt_authenticator = JWTAuthentication()
         try:
             validated_token = jwt_authenticator.get_validated_token(token)
             return validated_token
         except Exception as e:
-            raise Exception("Invalid or expired token") from e
+            raise AuthenticationFailed(
+                "Invalid or expired token", code="token_not_valid"
+            ) from e
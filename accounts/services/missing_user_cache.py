@@ -0,0 +1,56 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class MissingUserCache:
+    """
+    Short-TTL Redis set of user names known not to exist.
+
+    Credential-stuffing traffic mostly targets names that are not registered;
+    remembering them for MISSING_USER_CACHE_TTL seconds turns repeated
+    attempts into a single cache read instead of a database query. A name is
+    forgotten as soon as a user with that name is created (accounts/signals.py).
+    """
+
+    @staticmethod
+    def _key(user_name):
+        return f"auth:missing-user:{user_name}"
+
+    def contains(self, user_name):
+        try:
+            return cache.get(self._key(user_name)) is not None
+        except Exception as e:
+            logger.warning(f"Missing-user cache unavailable: {e}")
+            return False
+
+    async def acontains(self, user_name):
+        try:
+            return await cache.aget(self._key(user_name)) is not None
+        except Exception as e:
+            logger.warning(f"Missing-user cache unavailable: {e}")
+            return False
+
+    def add(self, user_name):
+        try:
+            cache.set(self._key(user_name), 1, settings.MISSING_USER_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Could not cache missing user {user_name}: {e}")
+
+    async def aadd(self, user_name):
+        try:
+            await cache.aset(self._key(user_name), 1, settings.MISSING_USER_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Could not cache missing user {user_name}: {e}")
+
+    def discard(self, user_name):
+        try:
+            cache.delete(self._key(user_name))
+        except Exception as e:
+            logger.error(f"Could not clear missing-user entry for {user_name}: {e}")
+
+
+missing_user_cache = MissingUserCache()
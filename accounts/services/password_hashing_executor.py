@@ -0,0 +1,81 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def _init_worker():
+    # Only needed when the pool does not fork (spawn/forkserver start methods).
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+
+    django.setup()
+
+
+def _make_password(password):
+    return hashers.make_password(password)
+
+
+def _check_password(password, encoded):
+    """
+    Return (is_valid, new_encoded). new_encoded is set when the stored hash uses
+    outdated parameters and should be replaced, mirroring User.check_password.
+    """
+    if not hashers.check_password(password, encoded):
+        return False, None
+    if hashers.identify_hasher(encoded).must_update(encoded):
+        return True, hashers.make_password(password)
+    return True, None
+
+
+class PasswordHashingExecutor:
+    """
+    Runs password hashing (PBKDF2) in a bounded process pool.
+
+    Request handlers only await the result, so a burst of logins/signups is
+    capped at PASSWORD_HASHING_WORKERS CPU cores instead of pinning every
+    web worker.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or settings.PASSWORD_HASHING_WORKERS
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers, initializer=_init_worker
+                    )
+        return self._pool
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, func, *args)
+
+    async def make_password(self, password):
+        return await self._run(_make_password, password)
+
+    async def check_password(self, user, password):
+        is_valid, new_encoded = await self._run(
+            _check_password, password, user.password
+        )
+        if new_encoded:
+            user.password = new_encoded
+            await user.asave(update_fields=["password"])
+        return is_valid
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+password_hashing_executor = PasswordHashingExecutor()
@@ -12,3 +12,10 @@ class AdminAuthAlertService(AbstractAdminAlertService):
         alert_sender.send_notification(
             "admin receiver", f"some one has been sign up the user information {user}"
         )
+
+    def send_approval_notification(self, user_names):
+        alert_sender = notification_service_creator(NotificationType.TELEGRAM)
+        alert_sender.send_notification(
+            "admin receiver",
+            f"{len(user_names)} users have been approved: {', '.join(user_names)}",
+        )
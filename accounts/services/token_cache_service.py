@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.models import User
+
+logger = logging.getLogger(__name__)
+
+# Fields kept in a cached user snapshot. Everything else is deferred and
+# loaded lazily if a view ever touches it.
+SNAPSHOT_FIELDS = (
+    "id",
+    "user_name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "is_approved",
+)
+
+
+class _LocalLRU:
+    """
+    Small thread-safe LRU with a per-entry TTL, used as the in-process tier.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + min(ttl, self.ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_where(self, predicate):
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items() if predicate(v)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TokenUserCache:
+    """
+    Two-tier cache of verified access tokens: jti -> user snapshot.
+
+    Tier 1 is a per-process LRU whose entries live at most AUTH_TOKEN_LOCAL_TTL
+    seconds; tier 2 is the shared Redis cache, whose entries never outlive the
+    token's own `exp`. Each user has a generation marker in Redis; replacing it
+    (invalidate_users) makes every cached snapshot of that user stale at once.
+
+    Deactivating or deleting a user also records a revocation marker, the
+    time before which tokens issued to them must not be trusted from their
+    claims alone (TokenClaimsJWTAuthentication).
+    """
+
+    def __init__(self, maxsize=None, local_ttl=None):
+        self.local = _LocalLRU(
+            maxsize or settings.AUTH_TOKEN_LOCAL_CACHE_SIZE,
+            local_ttl or settings.AUTH_TOKEN_LOCAL_TTL,
+        )
+        self.local_revocations = _LocalLRU(
+            maxsize or settings.AUTH_TOKEN_LOCAL_CACHE_SIZE,
+            local_ttl or settings.AUTH_TOKEN_LOCAL_TTL,
+        )
+
+    @staticmethod
+    def _token_key(jti):
+        return f"auth:jwt:{jti}"
+
+    @staticmethod
+    def _generation_key(user_id):
+        return f"auth:jwt-user-gen:{user_id}"
+
+    @staticmethod
+    def _revocation_key(user_id):
+        return f"auth:jwt-user-revoked:{user_id}"
+
+    def get(self, jti, user_id):
+        """
+        Return (snapshot, generation). snapshot is None on a miss; pass the
+        generation back to set() so a concurrent invalidation is not lost.
+        """
+        snapshot = self.local.get(jti)
+        if snapshot is not None:
+            return snapshot, None
+
+        token_key, generation_key = self._token_key(jti), self._generation_key(user_id)
+        try:
+            values = cache.get_many([token_key, generation_key])
+        except Exception as e:
+            logger.warning(f"Token cache unavailable, falling back to DB: {e}")
+            return None, None
+
+        generation = values.get(generation_key, 0)
+        entry = values.get(token_key)
+        if entry and entry["generation"] == generation:
+            self.local.set(jti, entry["user"], settings.AUTH_TOKEN_LOCAL_TTL)
+            return entry["user"], generation
+        return None, generation
+
+    def set(self, jti, user, generation, expires_at):
+        ttl = min(int(expires_at - time.time()), settings.AUTH_TOKEN_CACHE_TTL)
+        if ttl <= 0:
+            return
+        snapshot = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+        self.local.set(jti, snapshot, ttl)
+        if generation is None:
+            return
+        try:
+            cache.set(
+                self._token_key(jti),
+                {"generation": generation, "user": snapshot},
+                ttl,
+            )
+        except Exception as e:
+            logger.warning(f"Could not store token snapshot for jti {jti}: {e}")
+
+    def invalidate_user(self, user_id):
+        self.invalidate_users([user_id])
+
+    def invalidate_users(self, user_ids):
+        """
+        Drop every cached snapshot of the given users with one Redis call.
+        Other processes stop using their local copies within
+        AUTH_TOKEN_LOCAL_TTL seconds.
+
+        A generation only has to differ from the one stored with each entry,
+        so a fresh nanosecond timestamp is written instead of an INCR per user.
+        It may expire with AUTH_TOKEN_CACHE_TTL because no entry outlives that.
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        self.local.discard_where(lambda snapshot: snapshot["id"] in user_ids)
+        generation = time.time_ns()
+        try:
+            cache.set_many(
+                {self._generation_key(user_id): generation for user_id in user_ids},
+                settings.AUTH_TOKEN_CACHE_TTL,
+            )
+        except Exception as e:
+            logger.error(f"Could not invalidate cached tokens for {user_ids}: {e}")
+
+    def revoked_at(self, user_id):
+        """
+        The `iat` up to which the user's tokens are revoked, 0 if they are not,
+        or None if the cache is unavailable. Other processes see a new marker
+        within AUTH_TOKEN_LOCAL_TTL seconds.
+        """
+        revoked_at = self.local_revocations.get(user_id)
+        if revoked_at is not None:
+            return revoked_at
+        try:
+            revoked_at = cache.get(self._revocation_key(user_id), 0)
+        except Exception as e:
+            logger.warning(f"Token cache unavailable, falling back to DB: {e}")
+            return None
+        self.local_revocations.set(user_id, revoked_at, settings.AUTH_TOKEN_LOCAL_TTL)
+        return revoked_at
+
+    def revoke_user(self, user_id):
+        """
+        Revoke every token issued to the user until now. The marker lives as
+        long as an access token, after which no such token is valid anyway.
+        """
+        self.local_revocations.discard(user_id)
+        try:
+            cache.set(
+                self._revocation_key(user_id),
+                int(time.time()),
+                int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()),
+            )
+        except Exception as e:
+            logger.error(f"Could not revoke tokens of user {user_id}: {e}")
+
+    @staticmethod
+    def to_user(snapshot):
+        """
+        Rebuild a User from a snapshot as if it came from the database, with
+        the remaining fields deferred.
+        """
+        field_names = [
+            field.attname
+            for field in User._meta.concrete_fields
+            if field.attname in snapshot
+        ]
+        return User.from_db(
+            "default", field_names, [snapshot[name] for name in field_names]
+        )
+
+
+token_user_cache = TokenUserCache()
@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from accounts.services.missing_user_cache import missing_user_cache
+from accounts.services.token_cache_service import token_user_cache
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_tokens(sender, instance, **kwargs):
+    """
+    Any change to a user (approval, deactivation, permission edits in the
+    admin) must be visible to the next authenticated request.
+    """
+    if kwargs.get("created"):
+        return
+    token_user_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def revoke_tokens_of_inactive_user(sender, instance, **kwargs):
+    """
+    Tokens authenticated from their claims alone must stop working as soon
+    as the user is deactivated or deleted, not when they expire.
+    """
+    if kwargs.get("created"):
+        return
+    if kwargs["signal"] is post_delete or not instance.is_active:
+        token_user_cache.revoke_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def forget_missing_user_name(sender, instance, created, **kwargs):
+    """
+    A newly created user must be able to log in immediately, even if their
+    name was cached as missing moments before.
+    """
+    if created:
+        missing_user_cache.discard(instance.user_name)
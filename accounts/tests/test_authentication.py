@@ -0,0 +1,124 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.authentication import (
+    CachedJWTAuthentication,
+    TokenClaimsJWTAuthentication,
+)
+from accounts.models import User
+from accounts.services.authentication_facade import AuthenticationFacade
+from accounts.services.jwt_service_impl import JWTServiceImpl
+from accounts.services.token_cache_service import token_user_cache
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        token_user_cache.local.clear()
+        token_user_cache.local_revocations.clear()
+        self.user = User.objects.create_user(
+            user_name="tokenuser", password="testpass123", is_approved=False
+        )
+        self.access = JWTServiceImpl().generate_token(self.user)["access"]
+        self.factory = APIRequestFactory()
+        self.authentication = CachedJWTAuthentication()
+
+    def authenticate(self, access=None):
+        request = self.factory.get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {access or self.access}"
+        )
+        return self.authentication.authenticate(request)
+
+    def test_second_request_skips_user_query(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.user_name, "tokenuser")
+
+    def test_redis_tier_serves_other_processes(self):
+        self.authenticate()
+        token_user_cache.local.clear()  # simulate a different worker
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_approve_user_invalidates_cached_snapshot(self):
+        self.authenticate()
+        AuthenticationFacade().approve_user(self.user.id)
+
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate()
+        self.assertTrue(user.is_approved)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_invalid_token_is_rejected(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate("not-a-token")
+
+
+class TokenClaimsJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        token_user_cache.local.clear()
+        token_user_cache.local_revocations.clear()
+        self.user = User.objects.create_user(
+            user_name="claimsuser", password="testpass123", is_approved=True
+        )
+        self.factory = APIRequestFactory()
+        self.authentication = TokenClaimsJWTAuthentication()
+
+    def authenticate(self, access):
+        request = self.factory.get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+        return self.authentication.authenticate(request)
+
+    def test_user_is_built_from_claims_without_queries(self):
+        access = JWTServiceImpl().generate_token(self.user)["access"]
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(access)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user.user_name, "claimsuser")
+            self.assertTrue(user.is_authenticated)
+
+    def test_deactivated_user_is_rejected(self):
+        access = JWTServiceImpl().generate_token(self.user)["access"]
+        self.authenticate(access)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+
+    def test_deleted_user_is_rejected(self):
+        access = JWTServiceImpl().generate_token(self.user)["access"]
+        self.user.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+
+    def test_token_without_claims_falls_back_to_lookup(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate(access)
+        self.assertEqual(user.user_name, "claimsuser")
+
+    def test_file_list_runs_without_auth_queries(self):
+        access = JWTServiceImpl().generate_token(self.user)["access"]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        # No files exist, so the list view only runs its COUNT(*).
+        with self.assertNumQueries(1):
+            response = client.get(reverse("files:list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -1,7 +1,10 @@
 from unittest.mock import MagicMock, patch
 
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework_simplejwt.tokens import AccessToken
 
 from accounts.models import User
@@ -14,6 +17,7 @@ from notification.models import NotificationType
 
 class TestAuthenticationFacade(TestCase):
     def setUp(self):
+        cache.clear()
         self.facade = AuthenticationFacade()
         self.username = "testuser"
         self.password = "testpass123"
@@ -74,9 +78,52 @@ class TestAuthenticationFacade(TestCase):
         result = self.facade.login(self.username, self.password)
         self.assertEqual(result, {"error": "User not approved by admin"})
 
-    # def test_login_user_not_found(self):
-    #     result = self.facade.login("nonexistent", self.password)
-    #     self.assertEqual(result, {"error": "User not found."})
+    async def test_alogin_success(self):
+        self.user.is_approved = True
+        await self.user.asave()
+        result = await self.facade.alogin(self.username, self.password)
+        self.assertIn("access", result["tokens"])
+
+    async def test_alogin_invalid_password(self):
+        self.user.is_approved = True
+        await self.user.asave()
+        result = await self.facade.alogin(self.username, "wrongpass")
+        self.assertEqual(result, {"error": "Invalid password"})
+
+    async def test_asignup_hashes_password_off_thread(self):
+        with patch.object(self.facade.telegram_service, "send_signup_notification"):
+            result = await self.facade.asignup("AsyncUser", self.password)
+        self.assertEqual(
+            result, {"message": "Signup successful. Awaiting admin approval."}
+        )
+        user = await User.objects.aget(user_name="asyncuser")
+        self.assertTrue(user.check_password(self.password))
+
+    def test_login_user_not_found(self):
+        result = self.facade.login("nonexistent", self.password)
+        self.assertEqual(result, {"error": "User not found."})
+
+    def test_login_caches_missing_user_names(self):
+        self.facade.login("nonexistent", self.password)
+        with self.assertNumQueries(0):
+            result = self.facade.login("nonexistent", self.password)
+        self.assertEqual(result, {"error": "User not found."})
+
+    def test_login_uses_single_query(self):
+        with self.assertNumQueries(1):
+            self.facade.login(self.username, self.password)
+
+    def test_signup_clears_cached_missing_user_name(self):
+        self.facade.login("latecomer", self.password)
+        with patch.object(self.facade.telegram_service, "send_signup_notification"):
+            self.facade.signup("latecomer", self.password)
+        result = self.facade.login("latecomer", self.password)
+        self.assertEqual(result, {"error": "User not approved by admin"})
+
+    def test_signup_taken_username(self):
+        with patch.object(self.facade.telegram_service, "send_signup_notification"):
+            result = self.facade.signup(self.username, self.password)
+        self.assertIn("error", result)
 
 
 class TestJWTServiceImpl(TestCase):
@@ -93,6 +140,8 @@ class TestJWTServiceImpl(TestCase):
         access_token = AccessToken(tokens["access"])
         self.assertEqual(access_token["user_id"], self.user.id)
         self.assertEqual(access_token["token_type"], "access")
+        self.assertEqual(access_token["user_name"], self.user.user_name)
+        self.assertEqual(access_token["is_approved"], self.user.is_approved)
 
     @patch(
         "rest_framework_simplejwt.authentication.JWTAuthentication.get_validated_token"
@@ -166,3 +215,58 @@ class TestUserValidationServiceImpl(TestCase):
         self.user.save()
         result = self.validation_service.has_user_access(self.user)
         self.assertFalse(result)
+
+
+class TestBulkApproveUsers(TestCase):
+    def setUp(self):
+        self.facade = AuthenticationFacade()
+        self.pending = [
+            User.objects.create_user(user_name=f"pending{i}", password="testpass123")
+            for i in range(5)
+        ]
+        self.approved = User.objects.create_user(
+            user_name="already", password="testpass123", is_approved=True
+        )
+
+    def approved_statements(self, queries):
+        return [
+            query["sql"].split()[0]
+            for query in queries
+            if "SAVEPOINT" not in query["sql"]
+        ]
+
+    def test_approve_users_single_update_and_notification(self):
+        ids = [user.id for user in self.pending] + [self.approved.id, 999]
+        with patch.object(
+            self.facade.telegram_service, "send_approval_notification"
+        ) as mock_notification:
+            with CaptureQueriesContext(connection) as queries:
+                result = self.facade.approve_users(ids)
+
+        self.assertEqual(self.approved_statements(queries), ["SELECT", "UPDATE"])
+
+        self.assertEqual(result["message"], "5 users approved successfully.")
+        self.assertCountEqual(
+            result["approved"], [user.user_name for user in self.pending]
+        )
+        mock_notification.assert_called_once()
+        self.assertEqual(
+            User.objects.filter(is_approved=True).count(), len(self.pending) + 1
+        )
+
+    def test_approve_users_from_queryset_reads_once(self):
+        queryset = User.objects.filter(user_name__in=["pending0", "already"])
+        with patch.object(self.facade.telegram_service, "send_approval_notification"):
+            with CaptureQueriesContext(connection) as queries:
+                result = self.facade.approve_users(queryset)
+
+        self.assertEqual(self.approved_statements(queries), ["SELECT", "UPDATE"])
+        self.assertEqual(result["approved"], ["pending0"])
+
+    def test_approve_users_nothing_pending_sends_nothing(self):
+        with patch.object(
+            self.facade.telegram_service, "send_approval_notification"
+        ) as mock_notification:
+            result = self.facade.approve_users([self.approved.id])
+        self.assertEqual(result["approved"], [])
+        mock_notification.assert_not_called()
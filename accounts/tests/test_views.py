@@ -0,0 +1,110 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from accounts.models import User
+from accounts.services.signup_alert_service_impl import AdminAuthAlertService
+from core.throttling import ScopedGCRAThrottle
+
+
+class UserLoginViewTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("accounts:login")
+        self.user = User.objects.create_user(
+            user_name="loginuser", password="testpass123", is_approved=True
+        )
+
+    def test_login_success_returns_tokens(self):
+        response = self.client.post(
+            self.url, {"username": "loginuser", "password": "testpass123"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data["tokens"])
+        self.assertIn("refresh", response.data["tokens"])
+
+    def test_login_invalid_password(self):
+        response = self.client.post(
+            self.url, {"username": "loginuser", "password": "wrongpass"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Invalid password"})
+
+    def test_login_user_not_approved(self):
+        self.user.is_approved = False
+        self.user.save()
+        response = self.client.post(
+            self.url, {"username": "loginuser", "password": "testpass123"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "User not approved by admin"})
+
+    def test_login_scope_is_throttled(self):
+        rates = {**ScopedGCRAThrottle.THROTTLE_RATES, "login": "2/min"}
+        with patch.object(ScopedGCRAThrottle, "THROTTLE_RATES", rates):
+            for _ in range(2):
+                response = self.client.post(
+                    self.url, {"username": "loginuser", "password": "wrongpass"}
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            response = self.client.post(
+                self.url, {"username": "loginuser", "password": "wrongpass"}
+            )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+
+
+class UserSignupViewTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("accounts:sign-up")
+
+    @patch.object(AdminAuthAlertService, "send_signup_notification")
+    def test_signup_creates_user_with_hashed_password(self, mock_notification):
+        response = self.client.post(
+            self.url, {"username": "newuser", "password": "testpass123"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(user_name="newuser")
+        self.assertTrue(user.check_password("testpass123"))
+        self.assertFalse(user.is_approved)
+        mock_notification.assert_called_once()
+
+    def test_signup_rejects_taken_username(self):
+        User.objects.create_user(user_name="taken", password="testpass123")
+        response = self.client.post(
+            self.url, {"username": "taken", "password": "testpass123"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("username", response.data)
+
+
+class AdminBulkApproveUsersViewTest(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("accounts:approve-users")
+        self.admin = User.objects.create_superuser(user_name="admin", password="pass")
+        self.pending = User.objects.create_user(user_name="pending", password="pass")
+
+    @patch.object(AdminAuthAlertService, "send_approval_notification")
+    def test_admin_can_bulk_approve(self, mock_notification):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(
+            self.url, {"user_ids": [self.pending.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["approved"], ["pending"])
+        self.pending.refresh_from_db()
+        self.assertTrue(self.pending.is_approved)
+
+    def test_non_admin_is_forbidden(self):
+        self.client.force_authenticate(user=self.pending)
+        response = self.client.post(
+            self.url, {"user_ids": [self.pending.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,10 +1,17 @@
 # accounts/urls.py
 from django.urls import path
 
-from .views import AdminApproveUserView, UserLoginView, UserSignupView
+from .views import (
+    AdminApproveUserView,
+    AdminBulkApproveUsersView,
+    UserLoginView,
+    UserSignupView,
+)
 
 app_name = "accounts"
 urlpatterns = [
     path("sign-up/", UserSignupView.as_view(), name="sign-up"),
     path("login/", UserLoginView.as_view(), name="login"),
+    path("approve/", AdminBulkApproveUsersView.as_view(), name="approve-users"),
+    path("approve/<int:user_id>/", AdminApproveUserView.as_view(), name="approve-user"),
 ]
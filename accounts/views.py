@@ -1,48 +1,74 @@
-from rest_framework import status
+from asgiref.sync import sync_to_async
+from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from accounts.serializers import UserSignupSerializer
+from accounts.serializers import BulkApproveUsersSerializer, UserSignupSerializer
 from accounts.services.authentication_facade import AuthenticationFacade
+from common.views.async_api_view import AsyncAPIView
 
 
-class UserSignupView(APIView):
+class UserSignupView(AsyncAPIView):
+    throttle_scope = "sign-up"
+
     def __init__(self):
         self.auth_facade = AuthenticationFacade()
 
-    def post(self, request):
+    async def post(self, request):
         serializer = UserSignupSerializer(data=request.data)
 
         # Validate the serializer
-        if serializer.is_valid():
+        if await sync_to_async(serializer.is_valid)():
             # Call the signup method with the valid data
             username = serializer.validated_data["username"]
             password = serializer.validated_data["password"]
-            result = self.auth_facade.signup(username, password)
+            result = await self.auth_facade.asignup(username, password)
+            if "error" in result:
+                return Response(
+                    {"username": [result["error"]]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
             return Response(result, status=status.HTTP_201_CREATED)
 
         # If validation fails, return the error response
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserLoginView(APIView):
+class UserLoginView(AsyncAPIView):
+    throttle_scope = "login"
+
     def __init__(self):
         self.auth_facade = AuthenticationFacade()
 
-    def post(self, request):
+    async def post(self, request):
         username = request.data.get("username")
         password = request.data.get("password")
 
-        result = self.auth_facade.login(username, password)
+        result = await self.auth_facade.alogin(username, password)
         if "tokens" in result:
             return Response(result, status=status.HTTP_200_OK)
         return Response(result, status=status.HTTP_400_BAD_REQUEST)
 
 
 class AdminApproveUserView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
     def __init__(self):
         self.auth_facade = AuthenticationFacade()
 
     def post(self, request, user_id):
         result = self.auth_facade.approve_user(user_id)
         return Response(result, status=status.HTTP_200_OK)
+
+
+class AdminBulkApproveUsersView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def __init__(self):
+        self.auth_facade = AuthenticationFacade()
+
+    def post(self, request):
+        serializer = BulkApproveUsersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = self.auth_facade.approve_users(serializer.validated_data["user_ids"])
+        return Response(result, status=status.HTTP_200_OK)
@@ -0,0 +1,111 @@
+# common/db/instrumentation.py
+import contextvars
+import functools
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+# Recorders active in the current context. Context variables follow a request
+# into the threads sync_to_async runs its queries in, which connection-level
+# state (connections are per thread) does not.
+_active_recorders = contextvars.ContextVar("active_query_recorders", default=())
+
+
+def normalize_sql(sql):
+    """
+    Reduce a statement to its shape so that the same query issued with
+    different parameters (the N+1 signature) collapses to one key.
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def _dispatch(execute, sql, params, many, context):
+    for recorder in _active_recorders.get():
+        execute = functools.partial(recorder, execute)
+    return execute(sql, params, many, context)
+
+
+def _install(connection, **kwargs):
+    # First in the list: execute_wrapper() pops the last wrapper on exit.
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _dispatch)
+
+
+connection_created.connect(_install)
+
+
+class QueryRecorder:
+    """
+    Records every statement executed on the given database aliases while active.
+
+    Uses a `connection.execute_wrapper` installed on every connection, so it
+    works with DEBUG off and costs one function call plus a `perf_counter()`
+    pair per query. The recorder is tracked in a context variable, so queries
+    an async request runs through sync_to_async, on other threads, are
+    recorded too, and concurrent requests do not see each other's queries.
+
+        with QueryRecorder() as recorder:
+            ...
+        recorder.count, recorder.duration_ms, recorder.repeated()
+    """
+
+    def __init__(self, using=None):
+        self.aliases = using or list(connections)
+        self.queries = []
+        self._token = None
+
+    def __enter__(self):
+        # Connections opened before this module was imported missed
+        # connection_created; hook this thread's now.
+        for alias in self.aliases:
+            _install(connections[alias])
+        self._token = _active_recorders.set(_active_recorders.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_recorders.reset(self._token)
+        self._token = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if context["connection"].alias not in self.aliases:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "sql": sql,
+                    "alias": context["connection"].alias,
+                    "duration_ms": (time.perf_counter() - start) * 1000,
+                }
+            )
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration_ms(self):
+        return round(sum(query["duration_ms"] for query in self.queries), 2)
+
+    def repeated(self, threshold=None):
+        """
+        Return {normalized_sql: count} for statement shapes executed at least
+        `threshold` times, which is how N+1 access patterns show up.
+        """
+        threshold = threshold or settings.QUERY_N_PLUS_ONE_THRESHOLD
+        shapes = Counter(normalize_sql(query["sql"]) for query in self.queries)
+        return {sql: count for sql, count in shapes.items() if count >= threshold}
@@ -0,0 +1,62 @@
+# common/db/middleware.py
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from common.db.instrumentation import QueryRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCountMiddleware:
+    """
+    Records query count and DB time per request and warns about N+1 patterns.
+
+    With DEBUG on the totals are also returned as X-DB-Queries / X-DB-Time-ms
+    response headers.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self._report(request, response, recorder)
+
+    async def __acall__(self, request):
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        return self._report(request, response, recorder)
+
+    def _report(self, request, response, recorder):
+        logger.info(
+            f"{request.method} {request.path}: {recorder.count} queries "
+            f"in {recorder.duration_ms}ms"
+        )
+        for sql, count in recorder.repeated().items():
+            logger.warning(
+                f"Possible N+1 on {request.method} {request.path}: "
+                f"{count}x {sql[:300]}"
+            )
+        if (
+            settings.QUERY_BUDGET_WARNING
+            and recorder.count > settings.QUERY_BUDGET_WARNING
+        ):
+            logger.warning(
+                f"{request.method} {request.path} exceeded the query budget: "
+                f"{recorder.count} > {settings.QUERY_BUDGET_WARNING}"
+            )
+
+        if settings.DEBUG:
+            response["X-DB-Queries"] = str(recorder.count)
+            response["X-DB-Time-ms"] = str(recorder.duration_ms)
+        return response
@@ -0,0 +1,41 @@
+# common/db/testing.py
+from contextlib import contextmanager
+
+from common.db.instrumentation import QueryRecorder
+
+
+class QueryBudgetMixin:
+    """
+    Assertion helpers for pinning per-endpoint query budgets in TestCase classes.
+
+        with self.assertMaxQueries(3):
+            self.client.get(url)
+
+        with self.assertNoNPlusOne():
+            self.client.get(url)
+    """
+
+    def _format_queries(self, recorder):
+        return "\n".join(
+            f"{index}. {query['sql']}"
+            for index, query in enumerate(recorder.queries, start=1)
+        )
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=None):
+        with QueryRecorder(using=using) as recorder:
+            yield recorder
+        if recorder.count > budget:
+            self.fail(
+                f"{recorder.count} queries executed, budget is {budget}:\n"
+                f"{self._format_queries(recorder)}"
+            )
+
+    @contextmanager
+    def assertNoNPlusOne(self, threshold=None, using=None):
+        with QueryRecorder(using=using) as recorder:
+            yield recorder
+        repeated = recorder.repeated(threshold)
+        if repeated:
+            details = "\n".join(f"{count}x {sql}" for sql, count in repeated.items())
+            self.fail(f"Repeated query shapes (possible N+1):\n{details}")
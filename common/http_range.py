@@ -0,0 +1,39 @@
+# common/http_range.py
+import re
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range `Range` header against a body of `size` bytes.
+
+    Returns (start, end) with `end` inclusive, or None to serve the whole
+    body: no header, a malformed one, or several ranges (which RFC 9110
+    allows a server to ignore). Raises RangeNotSatisfiable if the range
+    lies entirely past the end.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # Suffix range: the last N bytes.
+        suffix = int(last)
+        if suffix == 0:
+            raise RangeNotSatisfiable()
+        start, end = max(size - suffix, 0), size - 1
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, end
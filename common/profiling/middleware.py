@@ -0,0 +1,59 @@
+# common/profiling/middleware.py
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from common.profiling.sampler import profiler
+
+
+class ProfilingMiddleware:
+    """
+    Hooks request threads into the per-process profiler.
+
+    When nothing is armed the only cost is two attribute checks, so the
+    middleware can stay installed in production. On the async path the
+    tracked thread is the event loop's; sync code the request runs through
+    sync_to_async is not sampled.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if profiler.claim_cprofile(request.path):
+            return profiler.run_cprofile(self.get_response, request)
+
+        sampler = profiler.sampler
+        if sampler is None or not sampler.running:
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        sampler.track(thread_id)
+        try:
+            return self.get_response(request)
+        finally:
+            sampler.untrack(thread_id)
+            sampler.request_finished()
+
+    async def __acall__(self, request):
+        if profiler.claim_cprofile(request.path):
+            return await profiler.arun_cprofile(self.get_response, request)
+
+        sampler = profiler.sampler
+        if sampler is None or not sampler.running:
+            return await self.get_response(request)
+
+        thread_id = threading.get_ident()
+        sampler.track(thread_id)
+        try:
+            return await self.get_response(request)
+        finally:
+            sampler.untrack(thread_id)
+            sampler.request_finished()
@@ -0,0 +1,260 @@
+# common/profiling/sampler.py
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(code):
+    return f"{code.co_filename}:{code.co_name}:{code.co_firstlineno}"
+
+
+def _output_path(kind, extension):
+    """
+    Build a unique output path under PROFILE_DIR, e.g.
+    logs/profiles/20250418-094500-1234-sample.collapsed
+    """
+    profile_dir = settings.PROFILE_DIR
+    os.makedirs(profile_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(profile_dir, f"{stamp}-{os.getpid()}-{kind}.{extension}")
+
+
+def write_collapsed(stacks, kind):
+    """
+    Write a Counter of collapsed stacks ("outer;inner;leaf" -> weight) in the
+    format consumed by flamegraph.pl, speedscope and inferno.
+    """
+    path = _output_path(kind, "collapsed")
+    with open(path, "w", encoding="utf-8") as handle:
+        for stack, weight in stacks.most_common():
+            handle.write(f"{stack} {weight}\n")
+    logger.info(f"Wrote {len(stacks)} collapsed stacks to {path}")
+    return path
+
+
+class StackSampler:
+    """
+    Statistical profiler for request threads.
+
+    A daemon thread wakes every `interval` seconds and records the current
+    stack of every thread registered through `track()`. Registrations are
+    counted, so concurrent async requests can share the event loop's thread.
+    Cost on the request path is two counter updates; the sampling itself runs
+    off the request thread.
+    """
+
+    def __init__(self, interval=None, seconds=None, requests=None):
+        self.interval = interval or settings.PROFILE_SAMPLE_INTERVAL
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.remaining_requests = requests
+        self.samples = 0
+        self.output_path = None
+        self._stacks = Counter()
+        self._threads = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop sampling and wait for the collapsed stacks to be written.
+        """
+        self._stopped.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.output_path
+
+    @property
+    def running(self):
+        return not self._stopped.is_set()
+
+    def track(self, thread_id):
+        with self._lock:
+            self._threads[thread_id] += 1
+
+    def untrack(self, thread_id):
+        with self._lock:
+            self._threads[thread_id] -= 1
+            if self._threads[thread_id] <= 0:
+                del self._threads[thread_id]
+
+    def request_finished(self):
+        """
+        Count down the request budget; stops the sampler once it is spent.
+        """
+        if self.remaining_requests is None:
+            return
+        with self._lock:
+            self.remaining_requests -= 1
+            exhausted = self.remaining_requests <= 0
+        if exhausted:
+            self._stopped.set()
+
+    def _sample(self):
+        frames = sys._current_frames()
+        with self._lock:
+            thread_ids = list(self._threads)
+        for thread_id in thread_ids:
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            if self.deadline and time.monotonic() >= self.deadline:
+                break
+            self._sample()
+        self._stopped.set()
+        self.output_path = write_collapsed(self._stacks, "sample")
+
+
+def pstats_to_collapsed(stats):
+    """
+    Approximate collapsed stacks from a cProfile run.
+
+    cProfile only keeps caller -> callee edges, so each function's own time
+    is attributed to the chain built by following its most expensive caller
+    up to a root. Weights are in microseconds.
+    """
+    stacks = Counter()
+    for func, (_, _, own_time, _, _) in stats.stats.items():
+        if own_time <= 0:
+            continue
+        chain = [func]
+        seen = {func}
+        current = func
+        while True:
+            callers = stats.stats.get(current, (0, 0, 0, 0, {}))[4]
+            if not callers:
+                break
+            parent = max(callers, key=lambda caller: callers[caller][3])
+            if parent in seen:
+                break
+            chain.append(parent)
+            seen.add(parent)
+            current = parent
+        labels = [f"{filename}:{name}:{line}" for filename, line, name in chain]
+        stacks[";".join(reversed(labels))] += int(own_time * 1_000_000)
+    return stacks
+
+
+class ProfilingController:
+    """
+    Per-process profiling state, toggled by ProfilingView and consulted by
+    ProfilingMiddleware. Each worker process owns its own controller, so a
+    toggle only affects the worker that served it.
+    """
+
+    def __init__(self):
+        self.sampler = None
+        self.cprofile_path_prefix = None
+        self.last_outputs = []
+        self._lock = threading.Lock()
+
+    def start_sampling(self, seconds=None, requests=None, interval=None):
+        with self._lock:
+            if self.sampler and self.sampler.running:
+                raise ValueError("A sampling session is already running.")
+            if self.sampler:
+                self._remember(self.sampler.output_path)
+            self.sampler = StackSampler(
+                interval=interval, seconds=seconds, requests=requests
+            ).start()
+        logger.info(
+            f"Stack sampler started in pid {os.getpid()} "
+            f"(seconds={seconds}, requests={requests})"
+        )
+
+    def stop_sampling(self):
+        with self._lock:
+            sampler, self.sampler = self.sampler, None
+        if sampler is None:
+            return None
+        path = sampler.stop()
+        self._remember(path)
+        return path
+
+    def arm_cprofile(self, path_prefix="/"):
+        with self._lock:
+            self.cprofile_path_prefix = path_prefix
+
+    def claim_cprofile(self, path):
+        """
+        Return True exactly once, for the first request matching the armed prefix.
+        """
+        if self.cprofile_path_prefix is None:
+            return False
+        with self._lock:
+            prefix = self.cprofile_path_prefix
+            if prefix is None or not path.startswith(prefix):
+                return False
+            self.cprofile_path_prefix = None
+        return True
+
+    def run_cprofile(self, func, *args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._write_cprofile(profile)
+
+    async def arun_cprofile(self, func, *args, **kwargs):
+        """
+        Profile awaiting func(...). cProfile only sees the calling thread, so
+        this covers the event loop (including other requests it serves in the
+        meantime) but not work handed to sync_to_async threads.
+        """
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            profile.disable()
+            self._write_cprofile(profile)
+
+    def _write_cprofile(self, profile):
+        raw_path = _output_path("cprofile", "prof")
+        profile.dump_stats(raw_path)
+        stats = pstats.Stats(raw_path)
+        self._remember(raw_path)
+        self._remember(write_collapsed(pstats_to_collapsed(stats), "cprofile"))
+
+    def status(self):
+        sampler = self.sampler
+        return {
+            "pid": os.getpid(),
+            "sampling": bool(sampler and sampler.running),
+            "samples": sampler.samples if sampler else 0,
+            "remaining_requests": sampler.remaining_requests if sampler else None,
+            "sample_output": sampler.output_path if sampler else None,
+            "cprofile_armed_for": self.cprofile_path_prefix,
+            "last_outputs": list(self.last_outputs),
+        }
+
+    def _remember(self, path):
+        if path:
+            self.last_outputs = (self.last_outputs + [path])[-10:]
+
+
+profiler = ProfilingController()
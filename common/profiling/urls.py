@@ -0,0 +1,8 @@
+from django.urls import path
+
+from common.profiling.views import ProfilingView
+
+app_name = "profiling"
+urlpatterns = [
+    path("", ProfilingView.as_view(), name="profiling"),
+]
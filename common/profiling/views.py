@@ -0,0 +1,63 @@
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from common.profiling.sampler import profiler
+
+
+class ProfilingView(APIView):
+    """
+    Admin-only toggle for the in-process profiler of the worker serving the call.
+
+    POST {"mode": "sample", "seconds": 30}          sample every request thread for 30s
+    POST {"mode": "sample", "requests": 200}        sample the next 200 requests
+    POST {"mode": "cprofile", "path": "/api/files/upload/"}
+                                                    cProfile the next matching request
+    DELETE                                          stop sampling and flush the stacks
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(profiler.status())
+
+    def post(self, request):
+        mode = request.data.get("mode", "sample")
+
+        if mode == "cprofile":
+            profiler.arm_cprofile(request.data.get("path") or "/")
+            return Response(profiler.status(), status=status.HTTP_202_ACCEPTED)
+
+        if mode != "sample":
+            return Response(
+                {"error": "mode must be 'sample' or 'cprofile'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            seconds = (
+                int(request.data["seconds"]) if "seconds" in request.data else None
+            )
+            requests = (
+                int(request.data["requests"]) if "requests" in request.data else None
+            )
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "seconds and requests must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if (seconds or 0) < 0 or (requests or 0) < 0 or not (seconds or requests):
+            return Response(
+                {"error": "Provide a positive 'seconds' or 'requests' budget"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            profiler.start_sampling(seconds=seconds, requests=requests)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(profiler.status(), status=status.HTTP_202_ACCEPTED)
+
+    def delete(self, request):
+        path = profiler.stop_sampling()
+        return Response({"output": path, **profiler.status()})
@@ -0,0 +1,180 @@
+# common/pubsub.py
+import asyncio
+import json
+import logging
+import weakref
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _sync_client():
+    import redis
+
+    return redis.Redis.from_url(settings.PUBSUB_REDIS_URL)
+
+
+def publish(channel, message):
+    """
+    Publish a JSON-serialisable message. Best effort: a Redis outage must not
+    fail the write that triggered the event, so errors are only logged.
+
+    Without PUBSUB_REDIS_URL (tests, single-process development) messages are
+    delivered to subscribers in this process only.
+    """
+    data = json.dumps(message, cls=DjangoJSONEncoder)
+    if not settings.PUBSUB_REDIS_URL:
+        for hub in list(_hubs.values()):
+            hub.deliver_threadsafe(channel, data)
+        return
+    try:
+        _sync_client().publish(channel, data)
+    except Exception as e:
+        logger.warning(f"Could not publish to {channel}: {e}")
+
+
+class Subscription:
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, channel, data):
+        try:
+            self.queue.put_nowait((channel, json.loads(data)))
+        except asyncio.QueueFull:
+            # A stalled client must not grow memory without bound; it is told
+            # to reconnect and catch up from the database instead.
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """
+        Return the next (channel, message), or None after `timeout` seconds.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PubSubHub:
+    """
+    Fan-out of pub/sub channels to the coroutines of one event loop.
+
+    All subscribers in a process share a single Redis connection; channels are
+    SUBSCRIBEd while at least one local subscriber wants them. Each waiting
+    client therefore costs a queue and a coroutine, not a connection or thread.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self._subscribers = defaultdict(set)
+        self._pubsub = None
+        self._reader = None
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def subscribe(self, *channels, maxsize=100):
+        subscription = Subscription(maxsize)
+        await self._add(subscription, channels)
+        try:
+            yield subscription
+        finally:
+            await self._remove(subscription, channels)
+
+    def deliver_threadsafe(self, channel, data):
+        try:
+            self.loop.call_soon_threadsafe(self._dispatch, channel, data)
+        except RuntimeError:
+            pass  # the loop has been closed
+
+    def _dispatch(self, channel, data):
+        for subscription in list(self._subscribers.get(channel, ())):
+            subscription.put(channel, data)
+
+    async def _add(self, subscription, channels):
+        async with self._lock:
+            new_channels = [c for c in channels if not self._subscribers[c]]
+            for channel in channels:
+                self._subscribers[channel].add(subscription)
+            if new_channels and settings.PUBSUB_REDIS_URL:
+                await self._connect()
+                await self._pubsub.subscribe(*new_channels)
+
+    async def _remove(self, subscription, channels):
+        async with self._lock:
+            idle_channels = []
+            for channel in channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+                    idle_channels.append(channel)
+            if not idle_channels or self._pubsub is None:
+                return
+            if not self._subscribers:
+                # Last subscriber gone: drop the connection and its reader.
+                pubsub, self._pubsub = self._pubsub, None
+                self._reader.cancel()
+                self._reader = None
+                await self._close(pubsub)
+                return
+            try:
+                await self._pubsub.unsubscribe(*idle_channels)
+            except Exception as e:
+                logger.warning(f"Could not unsubscribe {idle_channels}: {e}")
+
+    async def _connect(self):
+        if self._pubsub is not None:
+            return
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(settings.PUBSUB_REDIS_URL)
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._reader = self.loop.create_task(self._read(self._pubsub))
+
+    @staticmethod
+    async def _close(pubsub):
+        try:
+            await pubsub.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing pub/sub connection: {e}")
+
+    async def _read(self, pubsub):
+        # Also stops on its own once the hub has dropped this connection, in
+        # case the cancellation is swallowed by a pending read.
+        while self._pubsub is pubsub:
+            try:
+                if not pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Pub/sub reader error, retrying: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message and message["type"] == "message":
+                self._dispatch(message["channel"].decode(), message["data"])
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """
+    Return the hub of the running event loop (one per uvicorn worker).
+    """
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = PubSubHub(loop)
+    return hub
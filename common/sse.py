@@ -0,0 +1,79 @@
+# common/sse.py
+import contextlib
+import json
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+# Tells EventSource clients how long to wait before reconnecting (ms).
+RETRY_MS = 3000
+
+
+def format_event(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    payload = json.dumps(data, cls=DjangoJSONEncoder)
+    lines.append(f"data: {payload}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+def keepalive():
+    # Comment lines are ignored by clients but keep proxies from timing out.
+    return b": keepalive\n\n"
+
+
+async def relay(subscription):
+    """
+    Yield (channel, message) from a pub/sub subscription, or None every
+    SSE_KEEPALIVE_INTERVAL seconds of silence. Ends after SSE_STREAM_TIMEOUT,
+    or early if the subscriber fell behind; either way the client reconnects
+    and catches up from the database.
+    """
+    deadline = time.monotonic() + settings.SSE_STREAM_TIMEOUT
+    while (remaining := deadline - time.monotonic()) > 0:
+        item = await subscription.get(min(remaining, settings.SSE_KEEPALIVE_INTERVAL))
+        if subscription.overflowed:
+            return
+        yield item
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets `Accept: text/event-stream` pass content negotiation. Streaming
+    views return their own StreamingHttpResponse; this only renders the
+    error responses raised before the stream starts (401, 404, 429...).
+    """
+
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_event(data, event="error")
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """
+    StreamingHttpResponse for an async iterator of SSE frames. Only ASGI
+    serves it incrementally; under WSGI Django buffers the whole stream.
+    """
+
+    def __init__(self, events):
+        async def stream():
+            # Closing `events` when the client disconnects runs its cleanup
+            # (e.g. leaving a pub/sub subscription) right away.
+            async with contextlib.aclosing(events):
+                yield f"retry: {RETRY_MS}\n\n".encode()
+                async for frame in events:
+                    yield frame
+
+        super().__init__(stream(), content_type="text/event-stream")
+        self["Cache-Control"] = "no-cache"
+        # Stop nginx from buffering the stream.
+        self["X-Accel-Buffering"] = "no"
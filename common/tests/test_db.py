@@ -0,0 +1,70 @@
+import asyncio
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from accounts.models import User
+from common.db.instrumentation import QueryRecorder
+from common.db.middleware import QueryCountMiddleware
+
+
+def count_users():
+    return User.objects.count()
+
+
+class QueryRecorderTest(TestCase):
+    def test_records_queries_of_this_context_only(self):
+        with QueryRecorder() as outer:
+            count_users()
+            with QueryRecorder() as inner:
+                count_users()
+        count_users()
+
+        self.assertEqual(outer.count, 2)
+        self.assertEqual(inner.count, 1)
+        self.assertIn("COUNT(*)", inner.queries[0]["sql"])
+
+    def test_records_queries_run_in_other_threads(self):
+        async def request():
+            with QueryRecorder() as recorder:
+                await sync_to_async(count_users, thread_sensitive=False)()
+            return recorder
+
+        recorder = asyncio.run(request())
+        self.assertEqual(recorder.count, 1)
+
+
+@override_settings(DEBUG=True)
+class QueryCountMiddlewareTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_sync_request_counts_queries(self):
+        def get_response(request):
+            count_users()
+            return HttpResponse("ok")
+
+        middleware = QueryCountMiddleware(get_response)
+        self.assertFalse(iscoroutinefunction(middleware))
+        response = middleware(self.factory.get("/"))
+        self.assertEqual(response["X-DB-Queries"], "1")
+
+    def test_async_requests_count_their_own_queries(self):
+        async def get_response(request):
+            for _ in range(int(request.GET["queries"])):
+                await sync_to_async(count_users, thread_sensitive=False)()
+            return HttpResponse("ok")
+
+        middleware = QueryCountMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        async def requests():
+            return await asyncio.gather(
+                middleware(self.factory.get("/", {"queries": 1})),
+                middleware(self.factory.get("/", {"queries": 3})),
+            )
+
+        first, second = asyncio.run(requests())
+        self.assertEqual(first["X-DB-Queries"], "1")
+        self.assertEqual(second["X-DB-Queries"], "3")
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from accounts.models import User
+from common.profiling.middleware import ProfilingMiddleware
+from common.profiling.sampler import ProfilingController, StackSampler
+
+
+class ProfileDirMixin:
+    def setUp(self):
+        super().setUp()
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir, ignore_errors=True)
+        settings_override = override_settings(PROFILE_DIR=self.profile_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class StackSamplerTest(ProfileDirMixin, SimpleTestCase):
+    def test_stop_writes_collapsed_stacks_of_tracked_threads(self):
+        sampler = StackSampler(interval=0.001)
+        sampler.track(threading.get_ident())
+        sampler.start()
+        self.assertTrue(sampler.running)
+        time.sleep(0.05)
+        path = sampler.stop()
+
+        self.assertFalse(sampler.running)
+        self.assertEqual(os.path.dirname(path), self.profile_dir)
+        self.assertTrue(path.endswith("-sample.collapsed"))
+        self.assertGreater(sampler.samples, 0)
+        with open(path, encoding="utf-8") as handle:
+            lines = handle.read().splitlines()
+        self.assertTrue(lines)
+        total = 0
+        for line in lines:
+            stack, weight = line.rsplit(" ", 1)
+            total += int(weight)
+            for frame in stack.split(";"):
+                filename, name, firstlineno = frame.rsplit(":", 2)
+                self.assertTrue(filename)
+                self.assertTrue(name)
+                self.assertTrue(firstlineno.isdigit())
+        self.assertEqual(total, sampler.samples)
+        self.assertTrue(
+            any(
+                "test_stop_writes_collapsed_stacks_of_tracked_threads" in line
+                for line in lines
+            )
+        )
+
+    def test_untracked_threads_are_not_sampled(self):
+        sampler = StackSampler(interval=0.001).start()
+        time.sleep(0.02)
+        path = sampler.stop()
+        self.assertEqual(sampler.samples, 0)
+        with open(path, encoding="utf-8") as handle:
+            self.assertEqual(handle.read(), "")
+
+    def test_request_budget_stops_the_sampler(self):
+        sampler = StackSampler(interval=0.001, requests=2).start()
+        sampler.request_finished()
+        self.assertTrue(sampler.running)
+        sampler.request_finished()
+        self.assertFalse(sampler.running)
+        self.assertIsNotNone(sampler.stop())
+
+    def test_second_sampling_session_is_rejected(self):
+        controller = ProfilingController()
+        controller.start_sampling(seconds=30, interval=0.001)
+        self.addCleanup(controller.stop_sampling)
+        with self.assertRaises(ValueError):
+            controller.start_sampling(seconds=30)
+
+
+class ProfilingMiddlewareTest(ProfileDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.controller = ProfilingController()
+        patcher = mock.patch("common.profiling.middleware.profiler", self.controller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.controller.stop_sampling)
+        self.factory = RequestFactory()
+        self.tracked = []
+
+    def get_response(self, request):
+        sampler = self.controller.sampler
+        self.tracked.append(
+            sampler is not None and threading.get_ident() in sampler._threads
+        )
+        return HttpResponse("ok")
+
+    def test_requests_are_not_profiled_unless_armed(self):
+        middleware = ProfilingMiddleware(self.get_response)
+        with mock.patch.object(self.controller, "run_cprofile") as run_cprofile:
+            response = middleware(self.factory.get("/api/files/"))
+        self.assertEqual(response.status_code, 200)
+        run_cprofile.assert_not_called()
+        self.assertEqual(self.tracked, [False])
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_sampling_tracks_request_threads_within_the_budget(self):
+        self.controller.start_sampling(requests=1, interval=0.001)
+        middleware = ProfilingMiddleware(self.get_response)
+
+        middleware(self.factory.get("/api/files/"))
+        middleware(self.factory.get("/api/files/"))
+
+        self.assertEqual(self.tracked, [True, False])
+        self.assertFalse(self.controller.status()["sampling"])
+
+    def test_cprofile_runs_once_for_the_armed_path(self):
+        self.controller.arm_cprofile("/api/files/")
+        middleware = ProfilingMiddleware(self.get_response)
+
+        middleware(self.factory.get("/api/notifications/"))
+        self.assertEqual(self.controller.last_outputs, [])
+
+        response = middleware(self.factory.get("/api/files/upload/"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.controller.cprofile_path_prefix)
+        outputs = self.controller.last_outputs
+        self.assertEqual(len(outputs), 2)
+        self.assertTrue(outputs[0].endswith("-cprofile.prof"))
+        self.assertTrue(outputs[1].endswith("-cprofile.collapsed"))
+
+        middleware(self.factory.get("/api/files/upload/"))
+        self.assertEqual(self.controller.last_outputs, outputs)
+
+
+class ProfilingViewTest(ProfileDirMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.controller = ProfilingController()
+        patcher = mock.patch("common.profiling.views.profiler", self.controller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.controller.stop_sampling)
+        self.client = APIClient()
+        self.url = reverse("profiling:profiling")
+        self.admin = User.objects.create_superuser(user_name="admin", password="pass")
+        self.user = User.objects.create_user(
+            user_name="regular", password="pass", is_approved=True
+        )
+
+    def test_anonymous_is_rejected(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_non_admin_is_forbidden(self):
+        self.client.force_authenticate(user=self.user)
+        for method in ("get", "post", "delete"):
+            response = getattr(self.client, method)(self.url)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIsNone(self.controller.sampler)
+        self.assertIsNone(self.controller.cprofile_path_prefix)
+
+    def test_admin_starts_and_stops_sampling(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(
+            self.url, {"mode": "sample", "seconds": 30}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(response.data["sampling"])
+
+        response = self.client.post(
+            self.url, {"mode": "sample", "seconds": 30}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["sampling"])
+        self.assertTrue(response.data["output"].startswith(self.profile_dir))
+
+    def test_admin_arms_cprofile(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(
+            self.url, {"mode": "cprofile", "path": "/api/files/"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["cprofile_armed_for"], "/api/files/")
+
+    def test_invalid_requests_are_rejected(self):
+        self.client.force_authenticate(user=self.admin)
+        for payload in (
+            {"mode": "trace"},
+            {"mode": "sample"},
+            {"mode": "sample", "seconds": "soon"},
+            {"mode": "sample", "requests": -1},
+        ):
+            response = self.client.post(self.url, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(self.controller.sampler)
+
+
+class AsyncProfilingMiddlewareTest(ProfileDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.controller = ProfilingController()
+        patcher = mock.patch("common.profiling.middleware.profiler", self.controller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.controller.stop_sampling)
+        self.factory = RequestFactory()
+        self.tracked = []
+
+    async def get_response(self, request):
+        sampler = self.controller.sampler
+        self.tracked.append(
+            sampler is not None and threading.get_ident() in sampler._threads
+        )
+        return HttpResponse("ok")
+
+    def test_middleware_is_async_for_async_handlers(self):
+        self.assertTrue(iscoroutinefunction(ProfilingMiddleware(self.get_response)))
+        self.assertFalse(iscoroutinefunction(ProfilingMiddleware(lambda r: None)))
+
+    async def test_sampling_tracks_the_event_loop_thread(self):
+        self.controller.start_sampling(requests=2, interval=0.001)
+        middleware = ProfilingMiddleware(self.get_response)
+
+        await asyncio.gather(
+            middleware(self.factory.get("/api/files/")),
+            middleware(self.factory.get("/api/files/")),
+        )
+
+        self.assertEqual(self.tracked, [True, True])
+        self.assertFalse(self.controller.status()["sampling"])
+        self.assertEqual(self.controller.sampler._threads, {})
+
+    async def test_cprofile_runs_for_the_armed_path(self):
+        self.controller.arm_cprofile("/api/files/")
+        middleware = ProfilingMiddleware(self.get_response)
+
+        response = await middleware(self.factory.get("/api/files/upload/"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.controller.last_outputs), 2)
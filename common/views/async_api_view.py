@@ -0,0 +1,71 @@
+# common/views/async_api_view.py
+import asyncio
+
+from asgiref.sync import sync_to_async
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from common.pagination import AsyncPageNumberPagination
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines (`async def get/post/...`).
+
+    DRF's dispatch is sync-only, so this runs the usual initial() steps
+    (authentication, permissions, throttling) through sync_to_async and awaits
+    the handler. Django marks the resulting view as async because every
+    handler is a coroutine, so under ASGI it never occupies a thread while
+    awaiting I/O.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncListAPIView(AsyncAPIView, GenericAPIView):
+    """
+    Async counterpart of generics.ListAPIView. `get_queryset()` stays sync (it
+    only builds a lazy queryset); evaluation goes through the async ORM, so
+    `pagination_class` must provide `apaginate_queryset`
+    (see common.pagination.AsyncPageNumberPagination).
+    """
+
+    pagination_class = AsyncPageNumberPagination
+
+    async def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = None
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer([obj async for obj in queryset], many=True)
+        return Response(serializer.data)
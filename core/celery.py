@@ -14,4 +14,21 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
-app.conf.beat_schedule = {}
+app.conf.beat_schedule = {
+    "requeue-expired-file-leases": {
+        "task": "files.task.requeue_expired_leases",
+        "schedule": 60.0,
+    },
+    "reconcile-stuck-uploads": {
+        "task": "files.task.reconcile_stuck_uploads",
+        "schedule": 900.0,
+    },
+    "collect-deleted-files": {
+        "task": "files.task.collect_deleted_files",
+        "schedule": 3600.0,
+    },
+    "expire-stale-uploads": {
+        "task": "files.task.expire_stale_uploads",
+        "schedule": 3600.0,
+    },
+}
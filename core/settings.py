@@ -41,12 +41,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "common.db.middleware.QueryCountMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "common.profiling.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "core.urls"
@@ -129,13 +131,21 @@ REST_FRAMEWORK = {
     ],
     # "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "core.throttling.AnonGCRAThrottle",
+        "core.throttling.UserGCRAThrottle",
+        "core.throttling.ScopedGCRAThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "1000/day", "user": "10000/day"},
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "1000/day",
+        "user": "10000/day",
+        "login": "20/min",
+        "sign-up": "10/hour",
+        "upload": "120/min",
+        "archive": "30/min",
+    },
     "DEFAULT_METADATA_CLASS": "core.metadata.CustomMetadata",
 }
 
@@ -174,6 +184,139 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
+# On-demand profiler (see common/profiling). Output is flamegraph-ready
+# collapsed stacks, written per worker process.
+PROFILE_DIR = os.path.join("logs", "profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# Query instrumentation (see common/db). A statement shape repeated this many
+# times in one request is reported as a possible N+1.
+QUERY_N_PLUS_ONE_THRESHOLD = 5
+QUERY_BUDGET_WARNING = 50
+
+# Size of the process pool that runs password hashing for login/signup
+# (accounts/services/password_hashing_executor.py).
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", "2"))
+
+# Verified-token cache used by accounts.authentication.CachedJWTAuthentication.
+# Redis entries never outlive the token; local entries bound cross-worker
+# staleness after an invalidation.
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", str(60 * 60)))
+AUTH_TOKEN_LOCAL_TTL = int(os.getenv("AUTH_TOKEN_LOCAL_TTL", "5"))
+AUTH_TOKEN_LOCAL_CACHE_SIZE = 1024
+
+# How long a user name that failed a login lookup is remembered as missing.
+MISSING_USER_CACHE_TTL = int(os.getenv("MISSING_USER_CACHE_TTL", "60"))
+
+# Redis used for pub/sub fan-out to streaming (SSE) endpoints. Unset means
+# events are only delivered inside the publishing process.
+PUBSUB_REDIS_URL = os.environ.get("PUBSUB_REDIS_URL", os.environ.get("CACHE_LOCATION"))
+# Streams are closed after this many seconds; clients reconnect and catch up.
+SSE_STREAM_TIMEOUT = int(os.getenv("SSE_STREAM_TIMEOUT", "300"))
+SSE_KEEPALIVE_INTERVAL = int(os.getenv("SSE_KEEPALIVE_INTERVAL", "15"))
+# Most notifications replayed to a reconnecting stream; older ones are left to
+# the paginated list endpoint.
+SSE_CATCH_UP_LIMIT = int(os.getenv("SSE_CATCH_UP_LIMIT", "100"))
+
+# Cached copy of each recipient's unread notification count; the
+# NotificationInbox table is the source of truth.
+NOTIFICATION_UNREAD_CACHE_TTL = int(os.getenv("NOTIFICATION_UNREAD_CACHE_TTL", "300"))
+
+# Resumable uploads: largest file accepted, and largest single PATCH chunk
+# (each chunk is held in memory while it is sent to S3 as one part).
+RESUMABLE_UPLOAD_MAX_SIZE = int(
+    os.getenv("RESUMABLE_UPLOAD_MAX_SIZE", str(5 * 1024**3))
+)
+RESUMABLE_UPLOAD_MAX_CHUNK_SIZE = int(
+    os.getenv("RESUMABLE_UPLOAD_MAX_CHUNK_SIZE", str(32 * 1024**2))
+)
+# Unfinished resumable uploads, and any multipart upload left in the bucket,
+# are aborted this long after they started (expire_stale_uploads task).
+RESUMABLE_UPLOAD_EXPIRY_SECONDS = int(
+    os.getenv("RESUMABLE_UPLOAD_EXPIRY_SECONDS", str(7 * 24 * 3600))
+)
+
+# FileUploadView streams uploads to S3 in parts of this size (S3's minimum
+# is 5 MiB). Under ASGI (the Docker image's default) Django first buffers the
+# whole request body, on local disk above FILE_UPLOAD_MAX_MEMORY_SIZE, so
+# uploads still pass through a temp file there; see "Uploads and local disk"
+# in the README.
+STREAMING_UPLOAD_PART_SIZE = int(
+    os.getenv("STREAMING_UPLOAD_PART_SIZE", str(8 * 1024**2))
+)
+
+# Opt-in zstd compression of uploads at FILE_COMPRESSION_LEVEL (1-22); files
+# whose type is compressed already (images, video, archives, ...) are stored
+# as they are. Downloads are decompressed for clients without zstd support.
+FILE_COMPRESSION_ENABLED = os.getenv("FILE_COMPRESSION_ENABLED", "False") == "True"
+FILE_COMPRESSION_LEVEL = int(os.getenv("FILE_COMPRESSION_LEVEL", "3"))
+
+# Threads writing the small files of one batch upload to S3 in parallel.
+FILE_BATCH_UPLOAD_WORKERS = int(os.getenv("FILE_BATCH_UPLOAD_WORKERS", "8"))
+
+# process_file_upload claims a file for this long and renews the claim every
+# third of it while the transfer runs; once a dead worker's lease runs out,
+# the sweeper hands the file to another worker.
+FILE_PROCESSING_LEASE_SECONDS = int(os.getenv("FILE_PROCESSING_LEASE_SECONDS", "900"))
+FILE_PROCESSING_BATCH_SIZE = int(os.getenv("FILE_PROCESSING_BATCH_SIZE", "100"))
+
+# Post-upload pipeline run by process_file_upload: the Stage classes, and
+# how the object is read once for all of them (chunk size, chunks buffered
+# per stage).
+FILE_PIPELINE_STAGES = [
+    "files.services.pipeline_stages.ChecksumStage",
+    "files.services.pipeline_stages.SizeStage",
+    "files.services.pipeline_stages.ContentTypeStage",
+    "files.services.pipeline_stages.PreviewStage",
+]
+FILE_PIPELINE_CHUNK_SIZE = int(os.getenv("FILE_PIPELINE_CHUNK_SIZE", str(1024**2)))
+FILE_PIPELINE_QUEUE_DEPTH = int(os.getenv("FILE_PIPELINE_QUEUE_DEPTH", "4"))
+
+# PreviewStage renders images and PDFs up to FILE_PREVIEW_MAX_SOURCE_SIZE
+# into WebP previews of at most FILE_PREVIEW_MAX_SIZE pixels per side, in a
+# pool of FILE_PREVIEW_WORKERS processes. A render still running after
+# FILE_PREVIEW_TIMEOUT seconds is killed along with the pool.
+FILE_PREVIEW_MAX_SIZE = int(os.getenv("FILE_PREVIEW_MAX_SIZE", "256"))
+FILE_PREVIEW_MAX_SOURCE_SIZE = int(
+    os.getenv("FILE_PREVIEW_MAX_SOURCE_SIZE", str(50 * 1024**2))
+)
+FILE_PREVIEW_WORKERS = int(os.getenv("FILE_PREVIEW_WORKERS", "2"))
+FILE_PREVIEW_TIMEOUT = int(os.getenv("FILE_PREVIEW_TIMEOUT", "60"))
+
+# FileDownloadView keeps hot objects in a local LRU cache when
+# FILE_DOWNLOAD_CACHE_DIR is set. FILE_DOWNLOAD_ACCEL_REDIRECT is the internal
+# nginx location aliasing that directory; when set, nginx sends cached files.
+FILE_DOWNLOAD_CACHE_DIR = os.getenv("FILE_DOWNLOAD_CACHE_DIR", "")
+FILE_DOWNLOAD_CACHE_MAX_BYTES = int(
+    os.getenv("FILE_DOWNLOAD_CACHE_MAX_BYTES", str(2 * 1024**3))
+)
+FILE_DOWNLOAD_CACHE_MAX_OBJECT_SIZE = int(
+    os.getenv("FILE_DOWNLOAD_CACHE_MAX_OBJECT_SIZE", str(256 * 1024**2))
+)
+FILE_DOWNLOAD_ACCEL_REDIRECT = os.getenv("FILE_DOWNLOAD_ACCEL_REDIRECT", "")
+
+# FileArchiveView streams ZIPs of up to FILE_ARCHIVE_MAX_FILES files, reading
+# objects in segments with FILE_ARCHIVE_PREFETCH range requests in flight;
+# memory per archive is about SEGMENT_SIZE * PREFETCH.
+FILE_ARCHIVE_MAX_FILES = int(os.getenv("FILE_ARCHIVE_MAX_FILES", "500"))
+FILE_ARCHIVE_SEGMENT_SIZE = int(
+    os.getenv("FILE_ARCHIVE_SEGMENT_SIZE", str(8 * 1024**2))
+)
+FILE_ARCHIVE_PREFETCH = int(os.getenv("FILE_ARCHIVE_PREFETCH", "4"))
+
+# reconcile_stuck_uploads requeues (or fails, if their object is missing)
+# PENDING/PROCESSING files older than the grace period, listing this many
+# user prefixes of the bucket in parallel.
+RECONCILE_GRACE_SECONDS = int(os.getenv("RECONCILE_GRACE_SECONDS", "3600"))
+RECONCILE_WORKERS = int(os.getenv("RECONCILE_WORKERS", "8"))
+
+# collect_deleted_files removes files deleted more than FILE_DELETE_GRACE_SECONDS
+# ago (and files of deleted users), reading FILE_GC_BATCH_SIZE rows at a time
+# and sending up to FILE_GC_WORKERS DeleteObjects requests at once.
+FILE_DELETE_GRACE_SECONDS = int(os.getenv("FILE_DELETE_GRACE_SECONDS", "86400"))
+FILE_GC_BATCH_SIZE = int(os.getenv("FILE_GC_BATCH_SIZE", "500"))
+FILE_GC_WORKERS = int(os.getenv("FILE_GC_WORKERS", "4"))
+
 # this part is added because when user asked url without back slash it returns 404 error
 APPEND_SLASH = False
 
@@ -234,6 +377,9 @@ AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME", "django-boilerpla
 AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL", "http://localhost:9000")
 AWS_S3_REGION_NAME = os.getenv("AWS_S3_REGION_NAME", "us-east-1")
 AWS_S3_USE_SSL = os.getenv("AWS_S3_USE_SSL", "False") == "True"
+# HTTP connections per boto3 client; bounds the useful thread count of
+# parallel S3 jobs (reconciliation, rekey_files).
+AWS_S3_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_S3_MAX_POOL_CONNECTIONS", "50"))
 
 DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
 MEDIA_URL = f"{AWS_S3_ENDPOINT_URL}/{AWS_STORAGE_BUCKET_NAME}/"
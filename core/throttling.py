@@ -0,0 +1,119 @@
+import logging
+
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
+
+logger = logging.getLogger(__name__)
+
+# Generic Cell Rate Algorithm. The only state per key is the "theoretical
+# arrival time" (TAT) of the next request, so every check is one O(1) atomic
+# script call instead of DRF's read-modify-write of a timestamp list.
+#
+# KEYS[1]  throttle key
+# ARGV[1]  emission interval in ms (duration / num_requests)
+# ARGV[2]  burst tolerance in ms (duration - interval: allows num_requests at once)
+# Returns {allowed, retry_after_ms}. Uses the Redis clock so all web workers agree.
+GCRA_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval
+local allow_at = new_tat - tolerance - interval
+if allow_at > now then
+    return {0, allow_at - now}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, 0}
+"""
+
+
+class GCRARateThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle backed by a GCRA Lua script in Redis.
+
+    Keys, scopes and rate strings are the same as DRF's throttles. If the
+    default cache is not django-redis (e.g. in tests) the same algorithm
+    runs through the cache API without atomicity. If Redis is unreachable
+    the request is allowed rather than failing the whole API.
+    """
+
+    cache_format = "throttle:gcra:%(scope)s:%(ident)s"
+    _script = None
+
+    @staticmethod
+    def _get_script():
+        if GCRARateThrottle._script is None:
+            from django_redis import get_redis_connection
+
+            GCRARateThrottle._script = get_redis_connection("default").register_script(
+                GCRA_LUA
+            )
+        return GCRARateThrottle._script
+
+    def _limits_ms(self):
+        interval = int(self.duration * 1000 / self.num_requests)
+        return interval, int(self.duration * 1000) - interval
+
+    def _check_redis(self, interval, tolerance):
+        allowed, retry_after_ms = self._get_script()(
+            keys=[self.key], args=[interval, tolerance]
+        )
+        return bool(allowed), int(retry_after_ms)
+
+    def _check_cache(self, interval, tolerance):
+        now = int(self.timer() * 1000)
+        tat = max(self.cache.get(self.key, now), now)
+        new_tat = tat + interval
+        allow_at = new_tat - tolerance - interval
+        if allow_at > now:
+            return False, allow_at - now
+        self.cache.set(self.key, new_tat, max(1, (new_tat - now) // 1000 + 1))
+        return True, 0
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        interval, tolerance = self._limits_ms()
+        try:
+            try:
+                allowed, retry_after_ms = self._check_redis(interval, tolerance)
+            except NotImplementedError:
+                allowed, retry_after_ms = self._check_cache(interval, tolerance)
+        except Exception as e:
+            logger.warning(f"Throttle backend unavailable, allowing request: {e}")
+            return True
+
+        self.retry_after = retry_after_ms / 1000
+        return allowed
+
+    def wait(self):
+        return getattr(self, "retry_after", None)
+
+
+class AnonGCRAThrottle(AnonRateThrottle, GCRARateThrottle):
+    """Per-IP limit for anonymous requests ("anon" rate)."""
+
+
+class UserGCRAThrottle(UserRateThrottle, GCRARateThrottle):
+    """Per-user limit ("user" rate); anonymous requests are keyed by IP."""
+
+
+class ScopedGCRAThrottle(ScopedRateThrottle, GCRARateThrottle):
+    """Per-endpoint limit taken from the view's `throttle_scope`."""
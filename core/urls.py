@@ -6,6 +6,7 @@ urlpatterns = [
     path("api/accounts/", include("accounts.urls", namespace="accounts")),
     path("api/notifications/", include("notification.urls", namespace="notification")),
     path("api/files/", include("files.urls", namespace="files")),
+    path("api/profiling/", include("common.profiling.urls", namespace="profiling")),
     # ---------------------------------------------------------------------------------
     #       SWAGGER AND DOCUMENTS URL PARTS
     # ---------------------------------------------------------------------------------
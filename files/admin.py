@@ -7,6 +7,7 @@ class FileAdmin(admin.ModelAdmin):
     list_display = ["original_name", "user_user_name", "uploaded_at", "status"]
     search_fields = ["original_name", "user__user_name"]
     list_filter = ["status"]
+    list_select_related = ["user"]
     readonly_fields = ["guid", "uploaded_at"]
     date_hierarchy = "uploaded_at"
     fieldsets = [
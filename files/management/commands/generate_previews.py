@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from files.models import File, FileStatus
+from files.services.previews import PREVIEWABLE_TYPES
+from files.task import generate_file_preview
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue preview rendering for completed images and PDFs that have no "
+        "preview yet, e.g. files uploaded before previews existed. Only file "
+        "pks are loaded, in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queued = 0
+        last_pk = 0
+        while True:
+            file_pks = list(
+                File.objects.filter(
+                    # Files processed before content types were sniffed are
+                    # checked by the preview stage itself.
+                    Q(content_type__in=PREVIEWABLE_TYPES)
+                    | Q(content_type__isnull=True),
+                    status=FileStatus.COMPLETED,
+                    preview_key__isnull=True,
+                    pk__gt=last_pk,
+                )
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not file_pks:
+                break
+            last_pk = file_pks[-1]
+            for file_pk in file_pks:
+                generate_file_preview.delay(file_pk)
+            queued += len(file_pks)
+        self.stdout.write(f"Queued {queued} previews.")
@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from accounts.models import User
+from accounts.services.jwt_service_impl import JWTServiceImpl
+
+ENDPOINTS = {
+    "files": lambda: reverse("files:list"),
+    "notifications": lambda: reverse("notification:in_app_notifications"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive a running server (runserver, gunicorn or uvicorn) with N "
+        "concurrent clients for a fixed time and report throughput and latency "
+        "percentiles. Run it once per deployment mode with the same worker "
+        "count to compare how much concurrency a single worker sustains."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--endpoint",
+            default="files",
+            help=f"One of {', '.join(ENDPOINTS)}, or a path starting with '/'.",
+        )
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument(
+            "--user",
+            default="loadtest_user",
+            help="User to authenticate as; created (approved) if missing.",
+        )
+
+    def handle(self, *args, **options):
+        endpoint = options["endpoint"]
+        if endpoint.startswith("/"):
+            path = endpoint
+        elif endpoint in ENDPOINTS:
+            path = ENDPOINTS[endpoint]()
+        else:
+            raise CommandError(f"Unknown endpoint {endpoint!r}.")
+
+        user = User.objects.filter(user_name=options["user"]).first()
+        if user is None:
+            user = User.objects.create_user(
+                user_name=options["user"], password=None, is_approved=True
+            )
+        access = JWTServiceImpl().generate_token(user)["access"]
+        url = options["base_url"].rstrip("/") + path
+        headers = {"Authorization": f"Bearer {access}"}
+
+        deadline = time.monotonic() + options["duration"]
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def client():
+            session = requests.Session()
+            own_latencies, own_errors = [], 0
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = session.get(url, headers=headers, timeout=30)
+                    ok = response.status_code == 200
+                except requests.RequestException:
+                    ok = False
+                own_latencies.append(time.perf_counter() - started)
+                own_errors += not ok
+            with lock:
+                latencies.extend(own_latencies)
+                errors.append(own_errors)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            for _ in range(options["concurrency"]):
+                pool.submit(client)
+        elapsed = time.perf_counter() - started
+
+        if not latencies:
+            raise CommandError("No requests completed.")
+        latencies.sort()
+
+        def percentile(p):
+            return 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        self.stdout.write(
+            f"{url} concurrency={options['concurrency']}: "
+            f"{len(latencies)} requests in {elapsed:.2f}s "
+            f"-> {len(latencies) / elapsed:.1f} req/s, errors={sum(errors)}"
+        )
+        self.stdout.write(
+            f"  p50={percentile(0.50):.1f}ms p95={percentile(0.95):.1f}ms "
+            f"p99={percentile(0.99):.1f}ms max={1000 * latencies[-1]:.1f}ms"
+        )
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from files.models import File, FileStatus, object_key
+from files.services.storage_service import S3StorageService
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completed files from the legacy files/<user_id>/<name> keys to "
+        "hashed, GUID-based keys. Objects are copied server-side in parallel, "
+        "the File row is switched to the new key only if it still points at "
+        "the old one, and the old object is deleted afterwards. Safe to stop "
+        "and re-run; presigned URLs issued for an old key stop working once "
+        "its file has moved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument(
+            "--keep-source",
+            action="store_true",
+            help="Leave the objects under the old keys in place.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the files that would be moved.",
+        )
+
+    def handle(self, *args, **options):
+        storage_service = S3StorageService()
+        moved = failed = pending = 0
+        last_pk = 0
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            while True:
+                batch = list(
+                    File.objects.filter(status=FileStatus.COMPLETED, pk__gt=last_pk)
+                    .order_by("pk")
+                    .values_list("pk", "guid", "original_name", "file")[
+                        : options["batch_size"]
+                    ]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+
+                todo = [
+                    (pk, old_key, object_key(guid, original_name))
+                    for pk, guid, original_name, old_key in batch
+                    if old_key != object_key(guid, original_name)
+                ]
+                if options["dry_run"]:
+                    pending += len(todo)
+                    continue
+
+                copied = pool.map(
+                    lambda item: storage_service.copy_object(item[1], item[2]), todo
+                )
+                obsolete = []
+                for (pk, old_key, new_key), ok in zip(todo, copied):
+                    if not ok:
+                        failed += 1
+                        continue
+                    # Conditional: a file deleted or changed meanwhile keeps
+                    # its row, and the copy is the orphan instead.
+                    if File.objects.filter(pk=pk, file=old_key).update(file=new_key):
+                        moved += 1
+                        if not options["keep_source"]:
+                            obsolete.append(old_key)
+                    else:
+                        obsolete.append(new_key)
+                if obsolete:
+                    storage_service.delete_objects(obsolete)
+                self.stdout.write(f"Moved {moved} files (up to pk {last_pk})")
+
+        if options["dry_run"]:
+            self.stdout.write(f"{pending} files would be moved.")
+            return
+        self.stdout.write(f"Moved {moved} files; {failed} copies failed.")
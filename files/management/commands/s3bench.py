@@ -0,0 +1,126 @@
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from files.models import object_key
+
+LAYOUTS = {
+    # Legacy layout: every object of a heavy user lands under one prefix.
+    "user": lambda run: f"files/{run}/{uuid.uuid4()}.bin",
+    "hashed": lambda run: object_key(uuid.uuid4(), "bench.bin"),
+}
+THROTTLE_CODES = ("SlowDown", "503", "ServiceUnavailable")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure sustained PUT then GET rates against the configured bucket "
+        "for each key layout: N threads write small objects for a fixed time, "
+        "then read random ones back. Reports ops/s, latency percentiles and "
+        "throttled requests (503 SlowDown). Objects are written under "
+        "--prefix and deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--layout", choices=[*LAYOUTS, "both"], default="both")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--object-size", type=int, default=4096)
+        parser.add_argument("--prefix", default="bench/")
+
+    def handle(self, *args, **options):
+        client = boto3.client(
+            "s3",
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name=settings.AWS_S3_REGION_NAME,
+            config=boto3.session.Config(
+                signature_version="s3v4",
+                max_pool_connections=options["concurrency"],
+                retries={"max_attempts": 1},
+            ),
+        )
+        layouts = list(LAYOUTS) if options["layout"] == "both" else [options["layout"]]
+        for layout in layouts:
+            self._bench_layout(client, layout, options)
+
+    def _bench_layout(self, client, layout, options):
+        bucket = settings.AWS_STORAGE_BUCKET_NAME
+        run = uuid.uuid4().hex[:8]
+        body = os.urandom(options["object_size"])
+        written = []
+
+        def put():
+            key = options["prefix"] + LAYOUTS[layout](run)
+            client.put_object(Bucket=bucket, Key=key, Body=body)
+            written.append(key)
+
+        def get():
+            client.get_object(Bucket=bucket, Key=random.choice(written))["Body"].read()
+
+        try:
+            self._report(layout, "PUT", self._drive(put, options))
+            if written:
+                self._report(layout, "GET", self._drive(get, options))
+        finally:
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+                for start in range(0, len(written), 1000):
+                    chunk = written[start : start + 1000]
+                    pool.submit(
+                        client.delete_objects,
+                        Bucket=bucket,
+                        Delete={"Objects": [{"Key": key} for key in chunk]},
+                    )
+
+    def _drive(self, operation, options):
+        deadline = time.monotonic() + options["duration"]
+        latencies = []
+        errors = {"throttled": 0, "other": 0}
+        lock = threading.Lock()
+
+        def worker():
+            own_latencies = []
+            own_errors = {"throttled": 0, "other": 0}
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    operation()
+                    own_latencies.append(time.perf_counter() - started)
+                except ClientError as e:
+                    code = e.response.get("Error", {}).get("Code")
+                    kind = "throttled" if code in THROTTLE_CODES else "other"
+                    own_errors[kind] += 1
+            with lock:
+                latencies.extend(own_latencies)
+                for kind, count in own_errors.items():
+                    errors[kind] += count
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            for _ in range(options["concurrency"]):
+                pool.submit(worker)
+        return sorted(latencies), errors, time.perf_counter() - started
+
+    def _report(self, layout, operation, result):
+        latencies, errors, elapsed = result
+        if not latencies:
+            self.stdout.write(f"{layout:<7} {operation}: no successful requests")
+            return
+
+        def percentile(p):
+            return 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        self.stdout.write(
+            f"{layout:<7} {operation}: {len(latencies) / elapsed:8.1f} ops/s "
+            f"p50={percentile(0.50):.1f}ms p99={percentile(0.99):.1f}ms "
+            f"throttled={errors['throttled']} errors={errors['other']}"
+        )
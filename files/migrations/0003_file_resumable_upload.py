@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("files", "0002_alter_file_options_file_error_message_file_status_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="file",
+            name="size",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="file",
+            name="upload_id",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="file",
+            name="upload_offset",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="file",
+            name="upload_parts",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("files", "0003_file_resumable_upload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="file",
+            name="checksum",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:17
+
+import files.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("files", "0005_file_processing_lease"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="file",
+            name="file",
+            field=models.FileField(
+                max_length=320, upload_to=files.models.File.object_key_path
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("files", "0006_file_object_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="file",
+            name="compression",
+            field=models.CharField(blank=True, max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name="file",
+            name="stored_size",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
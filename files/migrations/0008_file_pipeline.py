@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("files", "0007_file_compression"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="file",
+            name="content_type",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="file",
+            name="processing_timings",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
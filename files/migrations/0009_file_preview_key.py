@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("files", "0008_file_pipeline"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="file",
+            name="preview_key",
+            field=models.CharField(blank=True, max_length=320, null=True),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import hashlib
 import uuid
 
 from django.conf import settings
@@ -10,19 +11,50 @@ class FileStatus(models.TextChoices):
     PROCESSING = "PROCESSING", _("Processing")
     COMPLETED = "COMPLETED", _("Completed")
     FAILED = "FAILED", _("Failed")
+    DELETED = "DELETED", _("Deleted")
+
+
+def object_key(guid, filename):
+    """
+    S3 key of a file's content: `files/<shard>/<guid>/<filename>`.
+
+    The shard is a hash of the GUID, so writes spread evenly over 65536
+    prefixes instead of piling onto one prefix per user, and the GUID makes
+    every key immutable: uploading the same name again never overwrites an
+    existing object.
+    """
+    return f"files/{_shard(guid)}/{guid}/{filename}"
+
+
+def preview_key(guid):
+    """S3 key of a file's preview image, derived from its GUID."""
+    return f"previews/{_shard(guid)}/{guid}.webp"
+
+
+def _shard(guid):
+    return hashlib.sha256(guid.bytes).hexdigest()[:4]
 
 
 class File(models.Model):
     def user_directory_path(instance, filename):
+        # Legacy `files/<user_id>/<filename>` layout; still referenced by old
+        # migrations. `rekey_files` moves existing objects off it.
         return f"files/{instance.user.id}/{filename}"
 
+    def object_key_path(instance, filename):
+        return object_key(instance.guid, filename)
+
     guid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     original_name = models.CharField(max_length=255)
-    file = models.FileField(upload_to=user_directory_path)
+    file = models.FileField(upload_to=object_key_path, max_length=320)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Deleting a user detaches their files with one UPDATE instead of
+    # deleting rows whose objects would be orphaned; collect_deleted_files
+    # removes the objects and the rows afterwards.
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE,
+        on_delete=models.SET_NULL,
+        null=True,
         related_name="files",
     )
     status = models.CharField(
@@ -32,10 +64,57 @@ class File(models.Model):
         db_index=True,
     )
     error_message = models.TextField(null=True, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    # Set when the object is stored compressed (e.g. "zstd"); `size` and
+    # `checksum` always describe the original content and `stored_size` the
+    # object in S3.
+    compression = models.CharField(max_length=16, null=True, blank=True)
+    stored_size = models.BigIntegerField(null=True, blank=True)
+    # Hex SHA-256 of the content, computed while the upload streams to S3.
+    checksum = models.CharField(max_length=64, null=True, blank=True)
+    # Media type sniffed from the content by the post-upload pipeline, and
+    # the wall time (ms) each of its stages took.
+    content_type = models.CharField(max_length=255, null=True, blank=True)
+    processing_timings = models.JSONField(default=dict, blank=True)
+    # Key of the preview image rendered for images and PDFs, if any.
+    preview_key = models.CharField(max_length=320, null=True, blank=True)
+    # Resumable uploads: the S3 multipart upload being filled, the number of
+    # bytes acknowledged so far and the parts ({"PartNumber", "ETag"}) they
+    # were stored in.
+    upload_id = models.CharField(max_length=255, null=True, blank=True)
+    upload_offset = models.BigIntegerField(default=0)
+    upload_parts = models.JSONField(default=list, blank=True)
+    # Set when a worker claims the file for processing; a PROCESSING file
+    # whose lease has passed was abandoned and may be claimed again.
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    # Set with the DELETED status; the objects are removed once the grace
+    # period has passed.
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.original_name} ({self.get_status_display()})"
 
     class Meta:
-        unique_together = ("user", "original_name")
         ordering = ["-uploaded_at"]
+        constraints = [
+            # Deleted files do not keep their name taken until collected.
+            models.UniqueConstraint(
+                fields=["user", "original_name"],
+                condition=~models.Q(status=FileStatus.DELETED),
+                name="file_user_original_name_uniq",
+            ),
+        ]
+        indexes = [
+            # Only in-flight rows are indexed, so the lease sweeper never
+            # scans completed files.
+            models.Index(
+                fields=["lease_expires_at"],
+                condition=models.Q(status=FileStatus.PROCESSING),
+                name="file_processing_lease_idx",
+            ),
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(status=FileStatus.DELETED),
+                name="file_deleted_idx",
+            ),
+        ]
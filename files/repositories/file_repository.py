@@ -1,6 +1,25 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
 from files.models import File, FileStatus
 
 
+def _lease_expired(now):
+    # A PROCESSING row without a lease (e.g. set by hand or by an older
+    # worker) would otherwise never be picked up again.
+    return Q(lease_expires_at__lt=now) | Q(lease_expires_at__isnull=True)
+
+
+def _processable():
+    # Not resumable uploads still receiving parts, nor files deleted (or
+    # whose user was) since they were queued: processing them would bring
+    # them back, and the collector would never remove them.
+    return Q(upload_id__isnull=True, deleted_at__isnull=True, user__isnull=False)
+
+
 class FileRepository:
     def get_user_files(self, user):
         return File.objects.filter(user=user, status=FileStatus.COMPLETED)
@@ -11,6 +30,58 @@ class FileRepository:
         except File.DoesNotExist:
             return None
 
+    async def aget_file_by_guid(self, guid, user):
+        return await File.objects.filter(
+            guid=guid, user=user, status=FileStatus.COMPLETED
+        ).afirst()
+
+    async def aget_tracked_file(self, guid, user):
+        # Any status: status streams follow files that are still processing.
+        return (
+            await File.objects.filter(guid=guid, user=user)
+            .exclude(status=FileStatus.DELETED)
+            .afirst()
+        )
+
+    async def aget_in_progress_files(self, user):
+        queryset = File.objects.filter(
+            user=user, status__in=[FileStatus.PENDING, FileStatus.PROCESSING]
+        )
+        return [file_instance async for file_instance in queryset]
+
+    async def aget_archive_files(
+        self,
+        user,
+        limit,
+        guids=None,
+        name_contains=None,
+        uploaded_after=None,
+        uploaded_before=None,
+    ):
+        """
+        Completed files of `user` matching every given criterion, ordered by
+        name; at most `limit` + 1 so callers can tell the limit was exceeded.
+        """
+        queryset = self.get_user_files(user)
+        if guids is not None:
+            queryset = queryset.filter(guid__in=guids)
+        if name_contains:
+            queryset = queryset.filter(original_name__icontains=name_contains)
+        if uploaded_after:
+            queryset = queryset.filter(uploaded_at__gte=uploaded_after)
+        if uploaded_before:
+            queryset = queryset.filter(uploaded_at__lt=uploaded_before)
+        queryset = queryset.only(
+            "guid",
+            "original_name",
+            "file",
+            "size",
+            "compression",
+            "stored_size",
+            "uploaded_at",
+        ).order_by("original_name")
+        return [file_instance async for file_instance in queryset[: limit + 1]]
+
     def get_file_by_name(self, user, original_name):
         try:
             return File.objects.get(
@@ -19,6 +90,175 @@ class FileRepository:
         except File.DoesNotExist:
             return None
 
+    def get_user_file_by_name(self, user, original_name):
+        # Any status but DELETED: names are unique per user among those.
+        return (
+            File.objects.filter(user=user, original_name=original_name)
+            .exclude(status=FileStatus.DELETED)
+            .first()
+        )
+
+    def get_upload(self, guid, user):
+        return (
+            File.objects.filter(guid=guid, user=user)
+            .exclude(status=FileStatus.DELETED)
+            .first()
+        )
+
+    def lock_upload(self, file_pk):
+        """
+        Lock an unfinished upload's row for the rest of the transaction.
+        Raises DatabaseError at once if another request holds the lock.
+        """
+        return (
+            File.objects.select_for_update(nowait=True)
+            .filter(pk=file_pk, upload_id__isnull=False)
+            .first()
+        )
+
+    def get_stale_uploads(self, created_before):
+        return list(
+            File.objects.filter(upload_id__isnull=False, uploaded_at__lt=created_before)
+        )
+
+    def advance_upload(self, file_instance, offset, new_offset, parts):
+        """
+        Move the acknowledged offset forward only if it is still `offset`.
+        """
+        updated = File.objects.filter(pk=file_instance.pk, upload_offset=offset).update(
+            upload_offset=new_offset, upload_parts=parts
+        )
+        if updated:
+            file_instance.upload_offset = new_offset
+            file_instance.upload_parts = parts
+        return bool(updated)
+
+    def claim_file(self, file_pk, lease_seconds, include_failed=False):
+        """
+        Take the processing lease on one file. Returns the claimed file, or
+        None if it is missing, finished, or leased by another worker (its row
+        lock is skipped instead of waited on).
+        """
+        now = timezone.now()
+        claimable = Q(status=FileStatus.PENDING) | (
+            Q(status=FileStatus.PROCESSING) & _lease_expired(now)
+        )
+        if include_failed:
+            claimable |= Q(status=FileStatus.FAILED)
+        with transaction.atomic():
+            file_instance = (
+                File.objects.select_for_update(skip_locked=True)
+                .filter(claimable, _processable(), pk=file_pk)
+                .first()
+            )
+            if file_instance is None:
+                return None
+            file_instance.status = FileStatus.PROCESSING
+            file_instance.error_message = None
+            file_instance.lease_expires_at = now + timedelta(seconds=lease_seconds)
+            file_instance.save(
+                update_fields=["status", "error_message", "lease_expires_at"]
+            )
+        return file_instance
+
+    def claim_pending_files(self, batch_size, lease_seconds, file_pks=None):
+        """
+        Claim up to `batch_size` PENDING files (only among `file_pks` if
+        given), oldest first, skipping rows that other workers are claiming
+        at the same moment.
+        """
+        pending = File.objects.select_for_update(skip_locked=True).filter(
+            _processable(), status=FileStatus.PENDING
+        )
+        if file_pks is not None:
+            pending = pending.filter(pk__in=file_pks)
+        with transaction.atomic():
+            claimed = list(pending.order_by("uploaded_at")[:batch_size])
+            if not claimed:
+                return []
+            lease_expires_at = timezone.now() + timedelta(seconds=lease_seconds)
+            File.objects.filter(pk__in=[f.pk for f in claimed]).update(
+                status=FileStatus.PROCESSING,
+                error_message=None,
+                lease_expires_at=lease_expires_at,
+            )
+        for file_instance in claimed:
+            file_instance.status = FileStatus.PROCESSING
+            file_instance.error_message = None
+            file_instance.lease_expires_at = lease_expires_at
+        return claimed
+
+    def renew_lease(self, file_pk, lease_seconds):
+        """
+        Extend the lease on a file that is still PROCESSING. Returns False
+        once it has finished or been deleted.
+        """
+        return bool(
+            File.objects.filter(pk=file_pk, status=FileStatus.PROCESSING).update(
+                lease_expires_at=timezone.now() + timedelta(seconds=lease_seconds)
+            )
+        )
+
+    def release_expired_leases(self, batch_size):
+        """
+        Reset up to `batch_size` PROCESSING files whose lease has expired, or
+        that have none, to PENDING and return their pks.
+        """
+        with transaction.atomic():
+            file_pks = list(
+                File.objects.select_for_update(skip_locked=True)
+                .filter(_lease_expired(timezone.now()), status=FileStatus.PROCESSING)
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            File.objects.filter(pk__in=file_pks).update(
+                status=FileStatus.PENDING, lease_expires_at=None
+            )
+        return file_pks
+
+    def get_existing_names(self, user, names):
+        """The subset of `names` the user already has files for, in one query."""
+        return set(
+            File.objects.filter(user=user, original_name__in=names)
+            .exclude(status=FileStatus.DELETED)
+            .values_list("original_name", flat=True)
+        )
+
+    def bulk_create_files(self, files):
+        return File.objects.bulk_create(files)
+
+    async def asoft_delete_file(self, guid, user):
+        """
+        Mark one of the user's files DELETED; its objects are removed later
+        by collect_deleted_files. Returns False if there is no such file.
+        """
+        updated = (
+            await File.objects.filter(guid=guid, user=user)
+            .exclude(status=FileStatus.DELETED)
+            .aupdate(status=FileStatus.DELETED, deleted_at=timezone.now())
+        )
+        return bool(updated)
+
+    def get_garbage_files(self, deleted_before, after_pk, batch_size):
+        """
+        The next `batch_size` files to collect by ascending pk, as (pk, file,
+        preview_key, upload_id) tuples: files deleted before `deleted_before`
+        and files whose user was deleted.
+        """
+        return list(
+            File.objects.filter(
+                Q(status=FileStatus.DELETED, deleted_at__lt=deleted_before)
+                | Q(user__isnull=True),
+                pk__gt=after_pk,
+            )
+            .order_by("pk")
+            .values_list("pk", "file", "preview_key", "upload_id")[:batch_size]
+        )
+
+    def delete_files(self, file_pks):
+        # File has no delete signals or dependent rows, so Django issues a
+        # single DELETE without fetching the rows first.
+        File.objects.filter(pk__in=file_pks).delete()
+
     def save_file(self, file_instance):
         file_instance.save()
         return file_instance
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from .models import File
@@ -16,4 +17,22 @@ class FileUploadSerializer(serializers.ModelSerializer):
 class FileSerializer(serializers.ModelSerializer):
     class Meta:
         model = File
-        fields = ["guid", "original_name", "uploaded_at"]
+        fields = ["guid", "original_name", "uploaded_at", "content_type"]
+
+
+class FileArchiveSerializer(serializers.Serializer):
+    """Selects the files to archive: explicit GUIDs, or a filter (or both)."""
+
+    guids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, allow_empty=False
+    )
+    name_contains = serializers.CharField(required=False, max_length=255)
+    uploaded_after = serializers.DateTimeField(required=False)
+    uploaded_before = serializers.DateTimeField(required=False)
+
+    def validate_guids(self, value):
+        if len(value) > settings.FILE_ARCHIVE_MAX_FILES:
+            raise serializers.ValidationError(
+                f"At most {settings.FILE_ARCHIVE_MAX_FILES} files per archive."
+            )
+        return list(dict.fromkeys(value))
@@ -3,5 +3,16 @@ from abc import ABC, abstractmethod
 
 class StorageService(ABC):
     @abstractmethod
-    def generate_presigned_url(self, file_path, expires_in=3600):
+    def generate_presigned_url(
+        self, file_path, expires_in=3600, content_encoding=None, content_type=None
+    ):
         pass
+
+    async def agenerate_presigned_url(
+        self, file_path, expires_in=3600, content_encoding=None, content_type=None
+    ):
+        # Presigning is a local HMAC computation with no network round trip,
+        # so async views can call it inline instead of via a thread.
+        return self.generate_presigned_url(
+            file_path, expires_in, content_encoding, content_type
+        )
@@ -0,0 +1,98 @@
+# files/services/compression.py
+import mimetypes
+
+import zstandard
+from django.conf import settings
+
+ZSTD = "zstd"
+
+# Formats that are compressed already; zstd would only spend CPU on them.
+COMPRESSED_TYPE_PREFIXES = ("image/", "video/", "audio/", "font/woff")
+COMPRESSED_TYPES = {
+    "application/gzip",
+    "application/pdf",
+    "application/vnd.rar",
+    "application/x-7z-compressed",
+    "application/x-bzip2",
+    "application/x-gzip",
+    "application/x-rar-compressed",
+    "application/x-xz",
+    "application/zip",
+    "application/zstd",
+}
+COMPRESSED_EXTENSIONS = {
+    ".7z",
+    ".br",
+    ".bz2",
+    ".docx",
+    ".gz",
+    ".jar",
+    ".lz4",
+    ".pptx",
+    ".rar",
+    ".tgz",
+    ".xlsx",
+    ".xz",
+    ".zip",
+    ".zst",
+}
+UNCOMPRESSED_MEDIA = {"image/bmp", "image/svg+xml", "image/x-ms-bmp", "audio/x-wav"}
+
+# Compressed input fed to a decompressor per call, so a chunk that expands
+# 10x still yields a bounded amount of output at a time.
+DECOMPRESS_SLICE = 256 * 1024
+
+
+def should_compress(name, content_type=None):
+    """True if FILE_COMPRESSION_ENABLED and the file is not compressed already."""
+    if not settings.FILE_COMPRESSION_ENABLED:
+        return False
+    lowered = name.lower()
+    if any(lowered.endswith(extension) for extension in COMPRESSED_EXTENSIONS):
+        return False
+    guessed, encoding = mimetypes.guess_type(lowered)
+    if encoding:  # .gz, .bz2, .xz ...
+        return False
+    for media_type in filter(None, (guessed, content_type)):
+        if media_type in UNCOMPRESSED_MEDIA:
+            continue
+        if media_type in COMPRESSED_TYPES or media_type.startswith(
+            COMPRESSED_TYPE_PREFIXES
+        ):
+            return False
+    return True
+
+
+def compressor():
+    """A streaming zstd compressor: compress(data) per chunk, then flush()."""
+    return zstandard.ZstdCompressor(level=settings.FILE_COMPRESSION_LEVEL).compressobj()
+
+
+def decompressor(codec):
+    if codec != ZSTD:
+        raise ValueError(f"Unsupported compression codec {codec!r}")
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def decompress_chunk(decompressor, data):
+    """Yield the output for one chunk of compressed input, slice by slice."""
+    for start in range(0, len(data), DECOMPRESS_SLICE):
+        output = decompressor.decompress(data[start : start + DECOMPRESS_SLICE])
+        if output:
+            yield output
+
+
+def accepts_encoding(accept_encoding, codec):
+    """True if an Accept-Encoding header allows `codec` (q > 0)."""
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() != codec:
+            continue
+        params = params.replace(" ", "")
+        if not params.startswith("q="):
+            return True
+        try:
+            return float(params[2:]) > 0
+        except ValueError:
+            return False
+    return False
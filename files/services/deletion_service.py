@@ -0,0 +1,79 @@
+# files/services/deletion_service.py
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from files.repositories.file_repository import FileRepository
+from files.services.storage_service import S3StorageService
+
+logger = logging.getLogger(__name__)
+
+
+class DeletedFileCollector:
+    """
+    Removes the objects of deleted files from S3, then their rows.
+
+    Collected are files soft-deleted more than FILE_DELETE_GRACE_SECONDS ago
+    and files detached from a deleted user. Rows are read by ascending pk,
+    FILE_GC_BATCH_SIZE at a time and only as (pk, keys) tuples, so even a
+    user with millions of files never sits in memory at once. Each batch's
+    keys (content and preview) go out in DeleteObjects requests of up to
+    1000 keys, with FILE_GC_WORKERS batches in flight. A row is deleted
+    once all of its objects are gone; files whose objects could not be
+    deleted stay for the next run.
+    """
+
+    def __init__(self, storage_service=None, file_repository=None):
+        self.storage_service = storage_service or S3StorageService()
+        self.file_repository = file_repository or FileRepository()
+
+    def run(self):
+        deleted_before = timezone.now() - timedelta(
+            seconds=settings.FILE_DELETE_GRACE_SECONDS
+        )
+        workers = settings.FILE_GC_WORKERS
+        collected = failed = 0
+        last_pk = 0
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                batch = self.file_repository.get_garbage_files(
+                    deleted_before, last_pk, settings.FILE_GC_BATCH_SIZE
+                )
+                if batch:
+                    last_pk = batch[-1][0]
+                    in_flight.append(
+                        (len(batch), pool.submit(self._delete_objects, batch))
+                    )
+                # Rows are deleted here rather than in the workers, which
+                # would each need a database connection.
+                while in_flight and (len(in_flight) >= workers or not batch):
+                    batch_size, future = in_flight.popleft()
+                    file_pks = future.result()
+                    self.file_repository.delete_files(file_pks)
+                    collected += len(file_pks)
+                    failed += batch_size - len(file_pks)
+                if not batch:
+                    break
+        if collected or failed:
+            logger.info(f"Collected {collected} deleted files; {failed} failed")
+        return {"collected": collected, "failed": failed}
+
+    def _delete_objects(self, batch):
+        """Delete the objects of `batch`; returns the pks of files now gone."""
+        keys = []
+        for _, key, preview, upload_id in batch:
+            if upload_id:
+                # A resumable upload that never completed: free its parts.
+                self.storage_service.abort_multipart_upload(key, upload_id)
+            keys.extend(k for k in (key, preview) if k)
+        failed = set(self.storage_service.delete_objects(keys)) if keys else set()
+        return [
+            pk
+            for pk, key, preview, _ in batch
+            if key not in failed and preview not in failed
+        ]
@@ -0,0 +1,124 @@
+# files/services/download_cache.py
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadCache:
+    """
+    Size-bounded on-disk LRU cache of object bodies for FileDownloadView.
+
+    Entries are keyed by S3 key. Keys are never reused (see
+    files.models.object_key), so an entry can never go stale and needs no
+    invalidation. A file's mtime records its last use: hits bump it, and
+    after each new entry the least recently used files are removed until the
+    directory fits in `max_bytes`. Entries are written to a temp file and
+    renamed into place, so every worker process on the host can share one
+    directory.
+    """
+
+    def __init__(self, directory, max_bytes, max_object_size):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_object_size = max_object_size
+
+    @classmethod
+    def from_settings(cls):
+        """The configured cache, or None if FILE_DOWNLOAD_CACHE_DIR is unset."""
+        if not settings.FILE_DOWNLOAD_CACHE_DIR:
+            return None
+        return cls(
+            settings.FILE_DOWNLOAD_CACHE_DIR,
+            settings.FILE_DOWNLOAD_CACHE_MAX_BYTES,
+            settings.FILE_DOWNLOAD_CACHE_MAX_OBJECT_SIZE,
+        )
+
+    def relative_path(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return f"{digest[:2]}/{digest}"
+
+    def path(self, key):
+        return os.path.join(self.directory, self.relative_path(key))
+
+    def admits(self, size):
+        return size <= self.max_object_size
+
+    def open(self, key):
+        """
+        Open a cached entry for reading and mark it used, or return None on
+        a miss. An open handle stays readable even if the entry is evicted.
+        """
+        path = self.path(key)
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return handle
+
+    def writer(self, key):
+        return CacheWriter(self, key)
+
+    def evict(self):
+        entries = []
+        total = 0
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+class CacheWriter:
+    """Fills one cache entry; nothing is visible until commit()."""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.path = cache.path(key)
+        shard = os.path.dirname(self.path)
+        os.makedirs(shard, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=shard, prefix=".tmp-", delete=False)
+
+    def write(self, chunk):
+        self.file.write(chunk)
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.file.name, self.path)
+        try:
+            self.cache.evict()
+        except OSError as e:
+            logger.warning(f"Download cache eviction failed: {e}")
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.unlink(self.file.name)
+        except FileNotFoundError:
+            pass
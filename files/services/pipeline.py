@@ -0,0 +1,249 @@
+# files/services/pipeline.py
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from files.services import compression
+from files.services.storage_service import S3StorageService
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class StageError(Exception):
+    """Raised by a stage to fail the file with a message."""
+
+
+class Stage:
+    """
+    One step of post-upload processing.
+
+    Subclasses set `name`, list the names of the stages whose results they
+    need in `requires`, and implement run(context). run returns a dict of
+    File fields to update, which is also the result dependent stages find
+    in context.results.
+
+    Stages with `reads_content` get the file's content (decompressed if it
+    is stored compressed) as context.chunks, an iterator of bytes they may
+    stop reading at any point. They all share one read of the object, so
+    they cannot require other stages. The failure of an `optional` stage is
+    logged instead of failing the file.
+    """
+
+    name = None
+    requires = ()
+    reads_content = False
+    optional = False
+
+    def run(self, context):
+        raise NotImplementedError
+
+
+class StageContext:
+    def __init__(self, file_instance, results, storage_service, chunks=None):
+        self.file = file_instance
+        self.results = results
+        self.storage_service = storage_service
+        self.chunks = chunks
+
+
+class PipelineResult:
+    def __init__(self, updates, timings, errors):
+        self.updates = updates
+        self.timings = timings
+        self.errors = errors
+
+    @property
+    def error_message(self):
+        return "; ".join(f"{name}: {error}" for name, error in self.errors.items())
+
+
+class _ContentFeed:
+    """One stage's share of the object read: a bounded queue of chunks."""
+
+    def __init__(self, depth):
+        self.queue = queue.Queue(maxsize=depth)
+        self.closed = threading.Event()
+
+    def put(self, item):
+        # A stage that stopped reading closes its feed, so the reader never
+        # blocks on a queue nobody drains.
+        while not self.closed.is_set():
+            try:
+                self.queue.put(item, timeout=0.05)
+                return
+            except queue.Full:
+                pass
+
+    def __iter__(self):
+        while (item := self.queue.get()) is not _END:
+            if isinstance(item, Exception):
+                raise StageError(f"Reading the content failed ({item})")
+            yield item
+
+
+class Pipeline:
+    """
+    Runs post-upload stages over one file.
+
+    Stages start as soon as the stages they require have finished, each in
+    its own thread, so independent stages run concurrently. The object is
+    read from S3 once, in chunks of FILE_PIPELINE_CHUNK_SIZE, and every
+    chunk is handed to all content-reading stages through queues of
+    FILE_PIPELINE_QUEUE_DEPTH chunks: memory stays bounded and the slowest
+    stage paces the read. The read stops early once no stage wants more.
+
+    Each stage's wall time is recorded in PipelineResult.timings, in
+    milliseconds; for content stages it includes waiting for the read.
+    """
+
+    def __init__(self, stages, storage_service=None):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ImproperlyConfigured(f"Duplicate pipeline stage {stage.name!r}")
+            self.stages[stage.name] = stage
+        self._check_requirements()
+        self.storage_service = storage_service or S3StorageService()
+        self.chunk_size = settings.FILE_PIPELINE_CHUNK_SIZE
+        self.queue_depth = settings.FILE_PIPELINE_QUEUE_DEPTH
+
+    @classmethod
+    def from_settings(cls, storage_service=None):
+        """The pipeline of the stage classes listed in FILE_PIPELINE_STAGES."""
+        stages = [import_string(path)() for path in settings.FILE_PIPELINE_STAGES]
+        return cls(stages, storage_service)
+
+    def _check_requirements(self):
+        for stage in self.stages.values():
+            for requirement in stage.requires:
+                if requirement not in self.stages:
+                    raise ImproperlyConfigured(
+                        f"Stage {stage.name!r} requires unknown stage {requirement!r}"
+                    )
+            if stage.reads_content and stage.requires:
+                raise ImproperlyConfigured(
+                    f"Stage {stage.name!r} reads the content, so it cannot "
+                    f"require other stages"
+                )
+        ordered = set()
+        visiting = set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ImproperlyConfigured(f"Pipeline stage {name!r} is in a cycle")
+            visiting.add(name)
+            for requirement in self.stages[name].requires:
+                visit(requirement)
+            visiting.discard(name)
+            ordered.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def run(self, file_instance):
+        results, timings, errors = {}, {}, {}
+        feeds = {
+            name: _ContentFeed(self.queue_depth)
+            for name, stage in self.stages.items()
+            if stage.reads_content
+        }
+        waiting = dict(self.stages)
+        running = {}
+        with ThreadPoolExecutor(
+            max_workers=len(self.stages) + 1, thread_name_prefix="pipeline"
+        ) as executor:
+            if feeds:
+                executor.submit(self._read, file_instance, list(feeds.values()))
+            while waiting or running:
+                for name, stage in list(waiting.items()):
+                    failed = [r for r in stage.requires if r in errors]
+                    if failed:
+                        del waiting[name]
+                        errors[name] = f"skipped because {failed[0]} failed"
+                    elif all(r in results for r in stage.requires):
+                        del waiting[name]
+                        context = StageContext(
+                            file_instance,
+                            {r: results[r] for r in stage.requires},
+                            self.storage_service,
+                            feeds.get(name),
+                        )
+                        future = executor.submit(
+                            self._run_stage, stage, context, timings
+                        )
+                        running[future] = name
+                if not running:
+                    continue  # only skips happened; re-check their dependents
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result() or {}
+                    except Exception as e:
+                        logger.warning(
+                            f"Pipeline stage {name} failed for {file_instance.file.name}: {e}"
+                        )
+                        errors[name] = str(e) or type(e).__name__
+
+        updates = {}
+        for name in self.stages:
+            updates.update(results.get(name, {}))
+        required_errors = {
+            name: error
+            for name, error in errors.items()
+            if not self.stages[name].optional
+        }
+        return PipelineResult(updates, timings, required_errors)
+
+    def _run_stage(self, stage, context, timings):
+        started = time.perf_counter()
+        try:
+            return stage.run(context)
+        finally:
+            timings[stage.name] = round((time.perf_counter() - started) * 1000, 1)
+            if context.chunks is not None:
+                context.chunks.closed.set()
+
+    def _read(self, file_instance, feeds):
+        s3_key = file_instance.file.name
+        try:
+            s3_object = self.storage_service.get_object(s3_key)
+            if s3_object is None:
+                raise IOError(f"Failed to read {s3_key}")
+            decompressor = (
+                compression.decompressor(file_instance.compression)
+                if file_instance.compression
+                else None
+            )
+            body = s3_object["Body"]
+            try:
+                while not all(feed.closed.is_set() for feed in feeds):
+                    chunk = body.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if decompressor is not None:
+                        chunks = compression.decompress_chunk(decompressor, chunk)
+                    else:
+                        chunks = (chunk,)
+                    for data in chunks:
+                        for feed in feeds:
+                            feed.put(data)
+            finally:
+                body.close()
+        except Exception as e:
+            logger.error(f"Pipeline read of {s3_key} failed: {e}")
+            for feed in feeds:
+                feed.put(e)
+            return
+        for feed in feeds:
+            feed.put(_END)
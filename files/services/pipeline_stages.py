@@ -0,0 +1,151 @@
+# files/services/pipeline_stages.py
+import hashlib
+import io
+import mimetypes
+
+from django.conf import settings
+
+from files.models import preview_key
+from files.services.pipeline import Stage, StageError
+from files.services.previews import PREVIEWABLE_TYPES, generate_preview
+
+# Leading bytes of common formats, checked in order.
+SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+    (b"\x1f\x8b", "application/gzip"),
+    (b"(\xb5/\xfd", "application/zstd"),
+    (b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (b"Rar!\x1a\x07", "application/vnd.rar"),
+    (b"BZh", "application/x-bzip2"),
+    (b"\xfd7zXZ\x00", "application/x-xz"),
+    (b"OggS", "audio/ogg"),
+    (b"ID3", "audio/mpeg"),
+    (b"fLaC", "audio/flac"),
+    (b"\x1aE\xdf\xa3", "video/webm"),
+    (b"BM", "image/bmp"),
+]
+SNIFF_SIZE = 512
+
+
+def sniff_content_type(head, name):
+    """
+    The media type of content starting with `head`: a known signature,
+    else the type its name suggests, else text/plain if it decodes as
+    UTF-8 and application/octet-stream otherwise.
+    """
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] in (b"WEBP", b"WAVE"):
+        return "image/webp" if head[8:12] == b"WEBP" else "audio/wav"
+    if head[4:8] == b"ftyp":
+        return "video/mp4"
+    guessed, encoding = mimetypes.guess_type(name)
+    if head.startswith(b"PK\x03\x04"):
+        # Office documents, jars, ... are ZIPs too; trust the name for those.
+        return guessed if guessed and not encoding else "application/zip"
+    if guessed and not encoding:
+        return guessed
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sample is fine.
+        if e.start < len(head) - 3:
+            return "application/octet-stream"
+    return "text/plain"
+
+
+class ChecksumStage(Stage):
+    """SHA-256 of the content; fails the file if it differs from the upload's."""
+
+    name = "checksum"
+    reads_content = True
+
+    def run(self, context):
+        sha256 = hashlib.sha256()
+        for chunk in context.chunks:
+            sha256.update(chunk)
+        checksum = sha256.hexdigest()
+        if context.file.checksum and context.file.checksum != checksum:
+            raise StageError("Content does not match the uploaded checksum")
+        return {"checksum": checksum}
+
+
+class SizeStage(Stage):
+    """Counts the content's bytes; the stored object may be compressed."""
+
+    name = "size"
+    reads_content = True
+
+    def run(self, context):
+        return {"size": sum(len(chunk) for chunk in context.chunks)}
+
+
+class ContentTypeStage(Stage):
+    """Sniffs the media type from the first bytes, then stops reading."""
+
+    name = "content_type"
+    reads_content = True
+
+    def run(self, context):
+        head = b""
+        for chunk in context.chunks:
+            head += chunk
+            if len(head) >= SNIFF_SIZE:
+                break
+        return {
+            "content_type": sniff_content_type(
+                head[:SNIFF_SIZE], context.file.original_name
+            )
+        }
+
+
+class PreviewStage(Stage):
+    """
+    Renders a small preview of images and PDFs and stores it under
+    preview_key(guid). Other files are recognised from their first bytes and
+    not read further; sources above FILE_PREVIEW_MAX_SOURCE_SIZE get no
+    preview. A file without a preview is still usable, so failures here do
+    not fail it.
+    """
+
+    name = "preview"
+    reads_content = True
+    optional = True
+
+    def run(self, context):
+        limit = settings.FILE_PREVIEW_MAX_SOURCE_SIZE
+        if context.file.size is not None and context.file.size > limit:
+            return {}
+        data = bytearray()
+        content_type = None
+        for chunk in context.chunks:
+            data += chunk
+            if content_type is None and len(data) >= SNIFF_SIZE:
+                content_type = self._previewable_type(context.file, data)
+                if content_type is None:
+                    return {}
+            if len(data) > limit:
+                return {}
+        if content_type is None:
+            content_type = self._previewable_type(context.file, data)
+            if content_type is None:
+                return {}
+
+        preview = generate_preview(bytes(data), content_type)
+        key = preview_key(context.file.guid)
+        if not context.storage_service.upload_file_or_object(
+            key, file_object=io.BytesIO(preview)
+        ):
+            raise StageError(f"Failed to store the preview {key}")
+        return {"preview_key": key}
+
+    def _previewable_type(self, file_instance, data):
+        content_type = sniff_content_type(
+            bytes(data[:SNIFF_SIZE]), file_instance.original_name
+        )
+        return content_type if content_type in PREVIEWABLE_TYPES else None
@@ -0,0 +1,108 @@
+# files/services/previews.py
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+PREVIEWABLE_TYPES = {
+    "application/pdf",
+    "image/bmp",
+    "image/gif",
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+}
+PREVIEW_CONTENT_TYPE = "image/webp"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def render_preview(data, content_type, max_size):
+    """
+    A WebP of at most `max_size` pixels per side showing an image, or the
+    first page of a PDF. CPU-bound; runs in the preview process pool, so it
+    must not touch Django settings or models.
+    """
+    if content_type == "application/pdf":
+        import pypdfium2
+
+        document = pypdfium2.PdfDocument(data)
+        try:
+            page = document[0]
+            scale = max_size / max(page.get_size())
+            image = page.render(scale=scale).to_pil()
+        finally:
+            document.close()
+    else:
+        image = Image.open(io.BytesIO(data))
+        # JPEGs can be decoded at a fraction of their size directly.
+        image.draft("RGB", (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_size, max_size))
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    output = io.BytesIO()
+    image.save(output, "WEBP", quality=80)
+    return output.getvalue()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the pipeline calling this runs in
+            # threads, and forking a threaded process can deadlock the child.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.FILE_PREVIEW_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def generate_preview(data, content_type):
+    """
+    Render a preview of `data` in the process pool, keeping the CPU work
+    off the worker's threads. Raises what the renderer raised, or
+    TimeoutError after FILE_PREVIEW_TIMEOUT seconds.
+    """
+    global _pool
+    pool = _get_pool()
+    future = pool.submit(
+        render_preview, data, content_type, settings.FILE_PREVIEW_MAX_SIZE
+    )
+    try:
+        return future.result(timeout=settings.FILE_PREVIEW_TIMEOUT)
+    except TimeoutError:
+        # The renderer is stuck (e.g. on a hostile PDF) and would hold its
+        # process forever: kill the pool and start a fresh one.
+        _recycle_pool(pool, terminate=True)
+        raise
+    except BrokenProcessPool:
+        # A renderer crashed (e.g. out of memory); start a fresh pool for
+        # the next preview.
+        _recycle_pool(pool)
+        raise
+
+
+def _recycle_pool(pool, terminate=False):
+    """
+    Replace `pool` with a fresh one for the next preview, and optionally
+    kill its processes. Previews other threads are rendering in it fail
+    with BrokenProcessPool; the stage is optional, so their files do not.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    if terminate:
+        # shutdown() alone would wait for the stuck task to return. There is
+        # no public way to kill the workers before Python 3.14's
+        # terminate_workers().
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,168 @@
+# files/services/reconciliation_service.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce, Collate
+from django.utils import timezone
+
+from files.models import File, FileStatus
+from files.services.status_events import publish_status, status_payload
+from files.services.storage_service import S3StorageService
+
+logger = logging.getLogger(__name__)
+
+STUCK_STATUSES = (FileStatus.PENDING, FileStatus.PROCESSING)
+MISSING_OBJECT_ERROR = "Reconciliation: uploaded content not found in storage."
+
+
+def key_prefix(key):
+    """The `files/<segment>/` prefix a key is listed under."""
+    return "/".join(key.split("/", 2)[:2]) + "/"
+
+
+def merge_join(rows, objects):
+    """
+    Join two iterables sorted by key: `rows` of (key, pk, size) and
+    `objects` of (key, size). Yields (pk, expected_size, object_size or None)
+    for every row, holding only one item of each stream in memory.
+    """
+    objects = iter(objects)
+    current = next(objects, None)
+    for key, pk, size in rows:
+        while current is not None and current[0] < key:
+            current = next(objects, None)
+        if current is not None and current[0] == key:
+            yield pk, size, current[1]
+        else:
+            yield pk, size, None
+
+
+class UploadReconciler:
+    """
+    Repairs files left PENDING/PROCESSING when their Celery message was lost.
+
+    Only the prefixes holding stuck files are visited: `files/<shard>/`, or
+    `files/<user_id>/` for keys in the legacy layout. They are listed in
+    parallel, and each listing is merge-joined with the stuck rows under that
+    prefix, both streamed in key order. Files without an object are marked
+    FAILED in bulk. Files whose object is in the bucket are reset to PENDING
+    and handed to `requeue` in batches of FILE_PROCESSING_BATCH_SIZE pks:
+    their pipeline (checksum, size, preview...) never ran, so they are not
+    complete yet, and processing skips the transfer of content already in
+    place.
+    """
+
+    def __init__(self, storage_service=None, requeue=None):
+        self.storage_service = storage_service or S3StorageService()
+        self.requeue = requeue
+
+    def stuck_files(self, now):
+        cutoff = now - timedelta(seconds=settings.RECONCILE_GRACE_SECONDS)
+        return File.objects.filter(
+            # Resumable uploads in progress have no object yet by design, and
+            # a live lease means a worker is on it.
+            Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now),
+            status__in=STUCK_STATUSES,
+            uploaded_at__lt=cutoff,
+            upload_id__isnull=True,
+            # Files of deleted users are left to collect_deleted_files.
+            user__isnull=False,
+        )
+
+    def run(self):
+        now = timezone.now()
+        prefixes = sorted(
+            {
+                key_prefix(key)
+                for key in self.stuck_files(now)
+                .values_list("file", flat=True)
+                .iterator(chunk_size=1000)
+            }
+        )
+        if not prefixes:
+            return {"prefixes": 0, "requeued": 0, "failed": 0}
+
+        with ThreadPoolExecutor(max_workers=settings.RECONCILE_WORKERS) as pool:
+            results = list(pool.map(lambda p: self._scan_prefix(p, now), prefixes))
+
+        found = [pk for prefix_found, _ in results for pk in prefix_found]
+        missing = [pk for _, prefix_missing in results for pk in prefix_missing]
+        requeued = self._repair(
+            found, now, status=FileStatus.PENDING, error_message=None
+        )
+        failed = self._repair(
+            missing, now, status=FileStatus.FAILED, error_message=MISSING_OBJECT_ERROR
+        )
+        if self.requeue:
+            batch_size = settings.FILE_PROCESSING_BATCH_SIZE
+            for start in range(0, len(requeued), batch_size):
+                self.requeue(requeued[start : start + batch_size])
+        logger.info(
+            f"Reconciled {len(prefixes)} prefixes: {len(requeued)} files requeued, {len(failed)} failed"
+        )
+        return {
+            "prefixes": len(prefixes),
+            "requeued": len(requeued),
+            "failed": len(failed),
+        }
+
+    def _scan_prefix(self, prefix, now):
+        try:
+            ordering = "file"
+            if connection.vendor == "postgresql":
+                # S3 lists keys in byte order; match it regardless of locale.
+                ordering = Collate("file", "C")
+            rows = (
+                self.stuck_files(now)
+                .filter(file__startswith=prefix)
+                .order_by(ordering)
+                .values_list("file", "pk", Coalesce("stored_size", "size"))
+                .iterator(chunk_size=1000)
+            )
+            objects = self.storage_service.iter_objects(prefix)
+            found, missing = [], []
+            for pk, expected_size, object_size in merge_join(rows, objects):
+                if object_size is None:
+                    missing.append(pk)
+                elif expected_size in (None, object_size):
+                    found.append(pk)
+                # A size mismatch is left alone: the object may still be
+                # being written.
+            return found, missing
+        except Exception as e:
+            logger.error(f"Could not reconcile files under {prefix}: {e}")
+            return [], []
+        finally:
+            connection.close()  # worker threads do not reuse connections
+
+    def _repair(self, pks, now, **fields):
+        """Set `fields` on the files of `pks` still stuck; returns their pks."""
+        if not pks:
+            return []
+        with transaction.atomic():
+            # Re-check under lock: a worker may have claimed a file since the
+            # listing, and its outcome wins.
+            repaired = list(
+                self.stuck_files(now)
+                .select_for_update(skip_locked=True)
+                .filter(pk__in=pks)
+                .only("pk", "user", "guid", "original_name")
+            )
+            File.objects.filter(pk__in=[f.pk for f in repaired]).update(
+                lease_expires_at=None, **fields
+            )
+            # update() sends no post_save, so publish the status events here.
+            for file_instance in repaired:
+                for name, value in fields.items():
+                    setattr(file_instance, name, value)
+                payload = status_payload(file_instance)
+                transaction.on_commit(
+                    lambda user_id=file_instance.user_id, payload=payload: (
+                        publish_status(user_id, payload)
+                    )
+                )
+        return [f.pk for f in repaired]
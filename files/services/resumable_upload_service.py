@@ -0,0 +1,253 @@
+# files/services/resumable_upload_service.py
+import io
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+
+from files.models import File, FileStatus, object_key
+from files.repositories.file_repository import FileRepository
+from files.services.storage_service import S3StorageService
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects multipart uploads whose non-final parts are smaller than this.
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class ResumableUploadService:
+    """
+    Resumable uploads (tus-style creation, offset PATCH, HEAD and
+    termination) written straight into an S3 multipart upload.
+
+    Every PATCH becomes one multipart part, so the acknowledged offset on the
+    File record always ends on a part boundary: a dropped connection loses at
+    most the chunk in flight, and the client resumes from `upload_offset`.
+    Nothing is written to local disk; memory per request is bounded by
+    RESUMABLE_UPLOAD_MAX_CHUNK_SIZE. Uploads not finished within
+    RESUMABLE_UPLOAD_EXPIRY_SECONDS are aborted by expire_stale_uploads().
+
+    A finished upload stays PENDING and its pk is handed to `process` once
+    the transaction commits, so it goes through the post-upload pipeline
+    like every other upload.
+    """
+
+    def __init__(self, file_repository=None, storage_service=None, process=None):
+        self.file_repository = file_repository or FileRepository()
+        self.storage_service = storage_service or S3StorageService()
+        self.process = process
+
+    def create(self, user, original_name, length):
+        """
+        Start an upload of `length` bytes, or return the unfinished upload of
+        the same file so the client can resume it. Returns (file, created).
+        """
+        if length > settings.RESUMABLE_UPLOAD_MAX_SIZE:
+            raise UploadError(
+                "Upload exceeds the maximum size.",
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        existing = self.file_repository.get_user_file_by_name(user, original_name)
+        if existing:
+            if existing.upload_id and existing.size == length:
+                return existing, False
+            raise UploadError(
+                "A file with this name already exists.", status.HTTP_409_CONFLICT
+            )
+
+        file_instance = File(original_name=original_name, user=user, size=length)
+        file_instance.file.name = object_key(file_instance.guid, original_name)
+        s3_key = file_instance.file.name
+
+        if length == 0:
+            if not self.storage_service.upload_file_or_object(
+                s3_key, file_object=io.BytesIO()
+            ):
+                raise UploadError(
+                    "Failed to store the file.", status.HTTP_502_BAD_GATEWAY
+                )
+        else:
+            file_instance.upload_id = self.storage_service.create_multipart_upload(
+                s3_key
+            )
+            if not file_instance.upload_id:
+                raise UploadError(
+                    "Failed to start the upload.", status.HTTP_502_BAD_GATEWAY
+                )
+
+        try:
+            with transaction.atomic():
+                self.file_repository.save_file(file_instance)
+                if length == 0:
+                    self._queue(file_instance)
+        except IntegrityError:
+            if file_instance.upload_id:
+                self.storage_service.abort_multipart_upload(
+                    s3_key, file_instance.upload_id
+                )
+            raise UploadError(
+                "A file with this name already exists.", status.HTTP_409_CONFLICT
+            )
+        logger.info(
+            f"Resumable upload {file_instance.guid} created for {s3_key} ({length} bytes)"
+        )
+        return file_instance, True
+
+    def append(self, file_instance, offset, stream, content_length):
+        """
+        Store the chunk at `offset` as the next multipart part and advance
+        the acknowledged offset; completes the upload on the final chunk.
+        """
+        if not file_instance.upload_id:
+            raise UploadError("Upload is not in progress.", status.HTTP_409_CONFLICT)
+        if offset != file_instance.upload_offset:
+            raise UploadError(
+                f"Upload-Offset must be {file_instance.upload_offset}.",
+                status.HTTP_409_CONFLICT,
+            )
+
+        remaining = file_instance.size - offset
+        if content_length > remaining:
+            raise UploadError("Chunk exceeds the declared Upload-Length.")
+        if content_length > settings.RESUMABLE_UPLOAD_MAX_CHUNK_SIZE:
+            raise UploadError(
+                "Chunk is larger than the maximum chunk size.",
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        final = content_length == remaining
+        if not final and content_length < MIN_PART_SIZE:
+            raise UploadError(
+                f"Chunks other than the last must be at least {MIN_PART_SIZE} bytes."
+            )
+
+        body = stream.read(content_length) if stream else b""
+        if len(body) != content_length:
+            raise UploadError("Chunk body is shorter than its Content-Length.")
+
+        # The row stays locked while the part is stored, so two PATCHes for
+        # the same offset cannot both upload the next part number.
+        with transaction.atomic():
+            try:
+                locked = self.file_repository.lock_upload(file_instance.pk)
+            except DatabaseError:
+                raise UploadError(
+                    "Another chunk of this upload is in progress.",
+                    status.HTTP_409_CONFLICT,
+                )
+            if locked is None:
+                raise UploadError(
+                    "Upload is not in progress.", status.HTTP_409_CONFLICT
+                )
+            if locked.upload_offset != offset:
+                raise UploadError(
+                    f"Upload-Offset must be {locked.upload_offset}.",
+                    status.HTTP_409_CONFLICT,
+                )
+            file_instance = locked
+
+            s3_key = file_instance.file.name
+            part_number = len(file_instance.upload_parts) + 1
+            etag = self.storage_service.upload_part(
+                s3_key, file_instance.upload_id, part_number, body
+            )
+            if not etag:
+                raise UploadError(
+                    "Failed to store the chunk.", status.HTTP_502_BAD_GATEWAY
+                )
+
+            parts = file_instance.upload_parts + [
+                {"PartNumber": part_number, "ETag": etag}
+            ]
+            self.file_repository.advance_upload(
+                file_instance, offset, offset + content_length, parts
+            )
+
+        if final:
+            self._complete(file_instance)
+        return file_instance
+
+    def terminate(self, file_instance):
+        if not file_instance.upload_id:
+            raise UploadError("Upload is not in progress.", status.HTTP_409_CONFLICT)
+        self.storage_service.abort_multipart_upload(
+            file_instance.file.name, file_instance.upload_id
+        )
+        file_instance.delete()
+
+    def expire_stale_uploads(self):
+        """
+        Abort uploads started more than RESUMABLE_UPLOAD_EXPIRY_SECONDS ago:
+        unfinished resumable uploads lose their File row, and every multipart
+        upload of that age left in the bucket (also those of crashed streaming
+        uploads, which have no row) is aborted so S3 frees its parts.
+        """
+        created_before = timezone.now() - timedelta(
+            seconds=settings.RESUMABLE_UPLOAD_EXPIRY_SECONDS
+        )
+        stale = self.file_repository.get_stale_uploads(created_before)
+        for file_instance in stale:
+            self.storage_service.abort_multipart_upload(
+                file_instance.file.name, file_instance.upload_id
+            )
+        self.file_repository.delete_files([f.pk for f in stale])
+
+        aborted = 0
+        uploads = self.storage_service.iter_multipart_uploads()
+        for s3_key, upload_id, initiated in uploads:
+            if (
+                initiated < created_before
+                and self.storage_service.abort_multipart_upload(s3_key, upload_id)
+            ):
+                aborted += 1
+        if stale or aborted:
+            logger.warning(
+                f"Expired {len(stale)} resumable uploads, aborted {aborted} "
+                f"multipart uploads"
+            )
+        return {"expired": len(stale), "aborted": aborted}
+
+    def _complete(self, file_instance):
+        completed = self.storage_service.complete_multipart_upload(
+            file_instance.file.name,
+            file_instance.upload_id,
+            file_instance.upload_parts,
+        )
+        if completed:
+            file_instance.error_message = None
+            file_instance.upload_id = None
+            file_instance.upload_parts = []
+        else:
+            file_instance.status = FileStatus.FAILED
+            file_instance.error_message = "S3 multipart completion failed."
+        with transaction.atomic():
+            file_instance.save(
+                update_fields=["status", "error_message", "upload_id", "upload_parts"]
+            )
+            if completed:
+                self._queue(file_instance)
+        if not completed:
+            raise UploadError(
+                "Failed to assemble the upload.", status.HTTP_502_BAD_GATEWAY
+            )
+        logger.info(
+            f"Resumable upload {file_instance.guid} completed ({file_instance.size} bytes); queued for processing"
+        )
+
+    def _queue(self, file_instance):
+        if self.process is None:
+            return
+        file_pk = file_instance.pk
+        # robust: a broker outage is logged, not raised into the response;
+        # reconcile_stuck_uploads picks up files left PENDING.
+        transaction.on_commit(lambda: self.process(file_pk), robust=True)
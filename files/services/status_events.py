@@ -0,0 +1,22 @@
+# files/services/status_events.py
+from common.pubsub import publish
+from files.models import FileStatus
+
+TERMINAL_STATUSES = (FileStatus.COMPLETED, FileStatus.FAILED)
+
+
+def status_channel(user_id):
+    return f"files:status:{user_id}"
+
+
+def status_payload(file_instance):
+    return {
+        "guid": str(file_instance.guid),
+        "original_name": file_instance.original_name,
+        "status": file_instance.status,
+        "error_message": file_instance.error_message,
+    }
+
+
+def publish_status(user_id, payload):
+    publish(status_channel(user_id), payload)
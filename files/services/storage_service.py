@@ -1,6 +1,7 @@
 # files/services/storage_service.py
 import logging
 import os
+from functools import lru_cache
 
 import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
@@ -10,6 +11,29 @@ from files.services.abstract_storage_service import StorageService
 
 logger = logging.getLogger(__name__)
 
+# Most keys S3 accepts in one DeleteObjects request.
+DELETE_OBJECTS_MAX_KEYS = 1000
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """
+    One boto3 client per process. Clients are thread-safe and creating one
+    costs several milliseconds, so views must not build a new one per request.
+    """
+    return boto3.client(
+        "s3",
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_S3_REGION_NAME,
+        config=boto3.session.Config(
+            signature_version="s3v4",
+            # Background jobs share this client across worker threads.
+            max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS,
+        ),
+    )
+
 
 class S3StorageService(StorageService):
     """
@@ -22,14 +46,7 @@ class S3StorageService(StorageService):
         Initializes the S3 client using settings from django.conf.
         """
         try:
-            self.s3_client = s3_client or boto3.client(
-                "s3",
-                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME,
-                config=boto3.session.Config(signature_version="s3v4"),
-            )
+            self.s3_client = s3_client or get_s3_client()
             self.bucket_name = settings.AWS_STORAGE_BUCKET_NAME
             logger.debug("S3 client initialized successfully.")
         except NoCredentialsError:
@@ -43,13 +60,19 @@ class S3StorageService(StorageService):
             self.s3_client = None
             self.bucket_name = None
 
-    def generate_presigned_url(self, file_path, expires_in=3600):
+    def generate_presigned_url(
+        self, file_path, expires_in=3600, content_encoding=None, content_type=None
+    ):
         """
         Generates a presigned URL for downloading an object from S3.
 
         Args:
             file_path (str): The key (path) of the file in the S3 bucket.
             expires_in (int): Expiration time for the URL in seconds. Default is 3600 (1 hour).
+            content_encoding (str, optional): Content-Encoding S3 should send
+                with the object, e.g. "zstd" for compressed files.
+            content_type (str, optional): Content-Type S3 should send instead
+                of the one stored with the object.
 
         Returns:
             str: The presigned URL, or None if an error occurred.
@@ -58,10 +81,13 @@ class S3StorageService(StorageService):
             logger.error("S3 client not initialized. Cannot generate presigned URL.")
             return None
         try:
+            params = {"Bucket": self.bucket_name, "Key": file_path}
+            if content_encoding:
+                params["ResponseContentEncoding"] = content_encoding
+            if content_type:
+                params["ResponseContentType"] = content_type
             url = self.s3_client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": self.bucket_name, "Key": file_path},
-                ExpiresIn=expires_in,
+                "get_object", Params=params, ExpiresIn=expires_in
             )
             logger.info(f"Generated presigned URL for {file_path}")
             return url
@@ -147,6 +173,236 @@ class S3StorageService(StorageService):
 
         return False  # Should not be reached ideally
 
+    def head_object(self, s3_key):
+        """
+        Fetches an object's metadata without transferring its body.
+
+        Returns:
+            dict: The HeadObject response (ContentLength, ETag, ...), or None
+            if the object does not exist or an error occurred.
+        """
+        if not self.s3_client or not self.bucket_name:
+            logger.error("S3 client not initialized. Cannot head object.")
+            return None
+        try:
+            return self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                logger.error(f"Error reading metadata of {s3_key}: {e}")
+            return None
+
+    def get_object(self, s3_key, byte_range=None):
+        """
+        Opens an object (or the inclusive (start, end) `byte_range` of it)
+        for streaming.
+
+        Returns:
+            dict: The GetObject response; read the content from its "Body"
+            stream and close it when done. None if the object does not exist
+            or an error occurred.
+        """
+        if not self.s3_client or not self.bucket_name:
+            logger.error("S3 client not initialized. Cannot get object.")
+            return None
+        params = {"Bucket": self.bucket_name, "Key": s3_key}
+        if byte_range is not None:
+            params["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+        try:
+            return self.s3_client.get_object(**params)
+        except ClientError as e:
+            logger.error(f"Error reading {s3_key}: {e}")
+            return None
+
+    def iter_objects(self, prefix):
+        """
+        Lists the objects under `prefix`, one ListObjectsV2 page (up to 1000
+        keys) at a time.
+
+        Yields:
+            tuple: (key, size) in ascending UTF-8 byte order of the key.
+
+        Raises:
+            ClientError: If a page cannot be listed. A partial listing must
+            not be mistaken for missing objects, so errors are not swallowed.
+        """
+        if not self.s3_client or not self.bucket_name:
+            raise RuntimeError("S3 client not initialized. Cannot list objects.")
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["Size"]
+
+    def create_multipart_upload(self, s3_key):
+        """
+        Starts an S3 multipart upload.
+
+        Returns:
+            str: The UploadId, or None if an error occurred.
+        """
+        if not self.s3_client or not self.bucket_name:
+            logger.error("S3 client not initialized. Cannot start multipart upload.")
+            return None
+        try:
+            response = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket_name, Key=s3_key
+            )
+            logger.info(f"Started multipart upload for {s3_key}")
+            return response["UploadId"]
+        except ClientError as e:
+            logger.error(f"Error starting multipart upload for {s3_key}: {e}")
+            return None
+
+    def upload_part(self, s3_key, upload_id, part_number, body):
+        """
+        Uploads one part of a multipart upload. Every part but the last must
+        be at least 5 MiB.
+
+        Returns:
+            str: The part's ETag, or None if an error occurred.
+        """
+        if not self.s3_client or not self.bucket_name:
+            logger.error("S3 client not initialized. Cannot upload part.")
+            return None
+        try:
+            response = self.s3_client.upload_part(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body,
+            )
+            return response["ETag"]
+        except ClientError as e:
+            logger.error(f"Error uploading part {part_number} of {s3_key}: {e}")
+            return None
+
+    def complete_multipart_upload(self, s3_key, upload_id, parts):
+        """
+        Completes a multipart upload from a list of
+        {"PartNumber": int, "ETag": str} dicts.
+
+        Returns:
+            bool: True if the object was assembled, False otherwise.
+        """
+        if not self.s3_client or not self.bucket_name:
+            logger.error("S3 client not initialized. Cannot complete upload.")
+            return False
+        try:
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+            logger.info(f"Completed multipart upload of {len(parts)} parts to {s3_key}")
+            return True
+        except ClientError as e:
+            logger.error(f"Error completing multipart upload for {s3_key}: {e}")
+            return False
+
+    def abort_multipart_upload(self, s3_key, upload_id):
+        """
+        Aborts a multipart upload so S3 frees its stored parts.
+        """
+        if not self.s3_client or not self.bucket_name:
+            return False
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id
+            )
+            logger.info(f"Aborted multipart upload for {s3_key}")
+            return True
+        except ClientError as e:
+            logger.error(f"Error aborting multipart upload for {s3_key}: {e}")
+            return False
+
+    def iter_multipart_uploads(self):
+        """
+        Lists the multipart uploads that were started and neither completed
+        nor aborted, one page (up to 1000 uploads) at a time.
+
+        Yields:
+            tuple: (key, upload_id, initiated), initiated being an aware
+            datetime.
+        """
+        if not self.s3_client or not self.bucket_name:
+            raise RuntimeError("S3 client not initialized. Cannot list uploads.")
+        paginator = self.s3_client.get_paginator("list_multipart_uploads")
+        for page in paginator.paginate(Bucket=self.bucket_name):
+            for upload in page.get("Uploads", []):
+                yield upload["Key"], upload["UploadId"], upload["Initiated"]
+
+    def copy_object(self, source_key, dest_key):
+        """
+        Copies an object within the bucket without downloading it. Uses the
+        managed transfer, which switches to multipart UploadPartCopy for
+        objects above the 5 GB CopyObject limit.
+
+        Returns:
+            bool: True if the copy succeeded, False otherwise.
+        """
+        if not self.s3_client or not self.bucket_name:
+            logger.error("S3 client not initialized. Cannot copy object.")
+            return False
+        try:
+            self.s3_client.copy(
+                {"Bucket": self.bucket_name, "Key": source_key},
+                self.bucket_name,
+                dest_key,
+            )
+            logger.debug(f"Copied {source_key} to {dest_key}")
+            return True
+        except ClientError as e:
+            logger.error(f"Error copying {source_key} to {dest_key}: {e}")
+            return False
+
+    def delete_object(self, s3_key):
+        """
+        Deletes an object. Deleting a missing key succeeds.
+
+        Returns:
+            bool: True if the object is gone, False if an error occurred.
+        """
+        if not self.s3_client or not self.bucket_name:
+            logger.error("S3 client not initialized. Cannot delete object.")
+            return False
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=s3_key)
+            logger.debug(f"Deleted {s3_key}")
+            return True
+        except ClientError as e:
+            logger.error(f"Error deleting {s3_key}: {e}")
+            return False
+
+    def delete_objects(self, s3_keys):
+        """
+        Deletes objects with DeleteObjects, up to 1000 keys per request.
+        Deleting a missing key succeeds.
+
+        Returns:
+            list: The keys that could not be deleted.
+        """
+        if not self.s3_client or not self.bucket_name:
+            logger.error("S3 client not initialized. Cannot delete objects.")
+            return list(s3_keys)
+        failed = []
+        for start in range(0, len(s3_keys), DELETE_OBJECTS_MAX_KEYS):
+            batch = s3_keys[start : start + DELETE_OBJECTS_MAX_KEYS]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+            except ClientError as e:
+                logger.error(f"Error deleting {len(batch)} objects: {e}")
+                failed.extend(batch)
+                continue
+            for error in response.get("Errors", []):
+                logger.error(f"Error deleting {error['Key']}: {error.get('Message')}")
+                failed.append(error["Key"])
+        logger.debug(f"Deleted {len(s3_keys) - len(failed)} objects")
+        return failed
+
     # Keep the old method signature for potential compatibility, but make it use the new one
     def upload_file(self, local_file_path, s3_key):
         """
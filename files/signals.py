@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from files.models import File
+from files.services.status_events import publish_status, status_payload
+
+
+@receiver(post_save, sender=File)
+def publish_status_transition(sender, instance, created, update_fields, **kwargs):
+    """
+    Tell status streams about every FileStatus transition, once the change
+    is committed so that a client re-reading the row sees the same status.
+    """
+    if not created and update_fields is not None and "status" not in update_fields:
+        return
+    user_id, payload = instance.user_id, status_payload(instance)
+    transaction.on_commit(lambda: publish_status(user_id, payload))
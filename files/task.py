@@ -1,140 +1,233 @@
+import contextlib
 import logging
+import threading
 
 from celery import shared_task
+from django.conf import settings
 from django.core.files.storage import default_storage
-from django.db import transaction
-from django.shortcuts import get_object_or_404
+from django.db import connection, transaction
 
 from .models import File, FileStatus
+from .repositories.file_repository import FileRepository
+from .services.deletion_service import DeletedFileCollector
+from .services.pipeline import Pipeline, StageError
+from .services.pipeline_stages import PreviewStage
+from .services.reconciliation_service import UploadReconciler
+from .services.resumable_upload_service import ResumableUploadService
 from .services.storage_service import S3StorageService
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60)
-def process_file_upload(self, file_pk):
+def finish_file(file_pk, status, error_message=None, if_processing=False, **fields):
     """
-    Celery task to process the file upload asynchronously.
-    - Sets status to PROCESSING.
-    - Opens the file content and uploads it to S3 using upload_fileobj.
-    - Updates the File model status to COMPLETED or FAILED.
-    - Stores error message on failure.
+    Set a processed file's final status, plus any other `fields`, in one
+    save so that status streams see the finished row. Its lease is cleared.
+    With `if_processing`, a file some step has already finished is left
+    as it is.
+    """
+    with transaction.atomic():
+        file_instance = File.objects.select_for_update().get(pk=file_pk)  # Re-fetch
+        if file_instance.status == FileStatus.DELETED or file_instance.user_id is None:
+            # Deleted while being processed: leave it to the collector.
+            logger.info(f"File PK: {file_pk} was deleted; not setting it {status}")
+            return file_instance
+        if if_processing and file_instance.status != FileStatus.PROCESSING:
+            return file_instance
+        file_instance.status = status
+        file_instance.error_message = error_message
+        file_instance.lease_expires_at = None
+        for field, value in fields.items():
+            setattr(file_instance, field, value)
+        file_instance.save(
+            update_fields=["status", "error_message", "lease_expires_at", *fields]
+        )
+    return file_instance
+
+
+@contextlib.contextmanager
+def keep_lease(file_pk, lease_seconds=None):
+    """
+    Renew a claimed file's lease every third of its length while the body
+    runs, so that requeue_expired_leases does not hand a long transfer to a
+    second worker. A worker that dies stops renewing and the lease expires.
     """
+    lease_seconds = lease_seconds or settings.FILE_PROCESSING_LEASE_SECONDS
+    done = threading.Event()
 
-    file_instance = None
+    def renew():
+        try:
+            while not done.wait(lease_seconds / 3):
+                if not FileRepository().renew_lease(file_pk, lease_seconds):
+                    return
+        except Exception as e:
+            logger.warning(f"Could not renew the lease on File PK: {file_pk}: {e}")
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=renew, name=f"lease-{file_pk}", daemon=True)
+    thread.start()
     try:
-        with transaction.atomic():
-            file_instance = get_object_or_404(File, pk=file_pk)
-
-            if file_instance.status in [FileStatus.COMPLETED, FileStatus.FAILED]:
-                logger.warning(
-                    f"File PK: {file_pk} already processed with status: {file_instance.status}. Skipping."
-                )
-                return
-
-            file_instance.status = FileStatus.PROCESSING
-            file_instance.error_message = None
-            file_instance.save(update_fields=["status", "error_message"])
-            logger.info(
-                f"Set status to PROCESSING for File PK: {file_pk} (GUID: {file_instance.guid})"
-            )
+        yield
+    finally:
+        done.set()
+        thread.join()
 
-        logger.info(f"Starting S3 upload processing for File: {file_instance.guid}")
 
-        if not file_instance.file or not file_instance.file.name:
-            logger.error(
-                f"File reference (file.name) not found for File PK: {file_pk}."
+def store_claimed_file(file_instance, storage_service):
+    """
+    Make sure a claimed file's content is in S3. Returns the fields to
+    record; raises after marking the file FAILED if the content cannot be
+    stored.
+    """
+    file_pk = file_instance.pk
+    s3_key = file_instance.file.name
+
+    # Uploads streamed by FileUploadView (and retries of an upload that
+    # already reached S3) are in place: one HeadObject instead of
+    # downloading the object and re-uploading it under the same key.
+    head = storage_service.head_object(s3_key)
+    expected_size = (
+        file_instance.size
+        if file_instance.stored_size is None
+        else file_instance.stored_size
+    )
+    if head is not None and expected_size in (None, head["ContentLength"]):
+        logger.info(
+            f"{s3_key} is already in the bucket for File PK: {file_pk}; not transferring it"
+        )
+        return {"size": head["ContentLength"]} if file_instance.size is None else {}
+
+    try:
+        with file_instance.file.open("rb") as file_obj:
+            logger.info(f"Opened file object for {s3_key}. Attempting upload...")
+            upload_successful = storage_service.upload_file_or_object(
+                s3_key=s3_key,
+                file_object=file_obj,
             )
-            with transaction.atomic():
-                file_instance = File.objects.get(pk=file_pk)  # Re-fetch
-                file_instance.status = FileStatus.FAILED
-                file_instance.error_message = (
-                    "Processing error: File reference missing."
-                )
-                file_instance.save(update_fields=["status", "error_message"])
-            raise ValueError("File reference missing in model instance.")
+    except FileNotFoundError:
+        logger.error(
+            f"File not found in storage backend for {s3_key} (PK: {file_pk}) when trying to open."
+        )
+        finish_file(
+            file_pk,
+            FileStatus.FAILED,
+            "Processing error: Underlying file not found in storage.",
+        )
+        raise
+    except Exception as open_err:
+        logger.exception(
+            f"Error opening file {s3_key} (PK: {file_pk}) from storage: {open_err}"
+        )
+        finish_file(
+            file_pk,
+            FileStatus.FAILED,
+            f"Processing error: Cannot read file from storage ({type(open_err).__name__}).",
+        )
+        raise
 
-        s3_key = file_instance.file.name
+    if not upload_successful:
+        logger.error(
+            f"S3 upload failed for {s3_key}. Status set to FAILED for File PK: {file_pk}"
+        )
+        finish_file(
+            file_pk, FileStatus.FAILED, "S3 upload failed (service returned False)."
+        )
+        raise ConnectionError("S3 Upload failed (service returned False)")
+    logger.info(f"Successfully uploaded {s3_key} to S3 for File PK: {file_pk}")
+    return {}
 
-        storage_service = S3StorageService()
-        upload_successful = False
 
-        try:
-            # !!! KEY CHANGE: Open the file from storage instead of getting path !!!
-            with file_instance.file.open("rb") as file_obj:
-                logger.info(f"Opened file object for {s3_key}. Attempting upload...")
-                upload_successful = storage_service.upload_file_or_object(
-                    s3_key=s3_key,
-                    file_object=file_obj,
-                )
-        except FileNotFoundError:
-            logger.error(
-                f"File not found in storage backend for {s3_key} (PK: {file_pk}) when trying to open."
+def transfer_claimed_file(file_instance, pipeline=None):
+    """
+    Move a claimed (PROCESSING) file's content into S3, run the post-upload
+    pipeline (FILE_PIPELINE_STAGES) over it and set its final status along
+    with what the stages found. Raises after marking the file FAILED if
+    either step fails.
+    """
+    file_pk = file_instance.pk
+    logger.info(f"Starting S3 upload processing for File: {file_instance.guid}")
+
+    if not file_instance.file or not file_instance.file.name:
+        logger.error(f"File reference (file.name) not found for File PK: {file_pk}.")
+        finish_file(
+            file_pk, FileStatus.FAILED, "Processing error: File reference missing."
+        )
+        raise ValueError("File reference missing in model instance.")
+
+    storage_service = S3StorageService()
+    try:
+        with keep_lease(file_pk):
+            fields = store_claimed_file(file_instance, storage_service)
+            result = (pipeline or Pipeline.from_settings(storage_service)).run(
+                file_instance
             )
-            with transaction.atomic():
-                file_instance = File.objects.get(pk=file_pk)  # Re-fetch
-                file_instance.status = FileStatus.FAILED
-                file_instance.error_message = (
-                    "Processing error: Underlying file not found in storage."
-                )
-                file_instance.save(update_fields=["status", "error_message"])
-            raise  # Re-raise FileNotFoundError
-        except Exception as open_err:
-            logger.exception(
-                f"Error opening file {s3_key} (PK: {file_pk}) from storage: {open_err}"
+    except Exception as e:
+        # store_claimed_file records its own failures; anything else (e.g. a
+        # misconfigured pipeline) must not leave the file PROCESSING.
+        finish_file(
+            file_pk,
+            FileStatus.FAILED,
+            f"Unexpected processing error: {str(e)[:255]}",
+            if_processing=True,
+        )
+        raise
+    fields.update(result.updates, processing_timings=result.timings)
+    if result.errors:
+        finish_file(
+            file_pk,
+            FileStatus.FAILED,
+            f"Processing error: {result.error_message}"[:1000],
+            processing_timings=result.timings,
+        )
+        raise StageError(result.error_message)
+
+    finish_file(file_pk, FileStatus.COMPLETED, **fields)
+    logger.info(
+        f"Processed {file_instance.file.name} for File PK: {file_pk} in {result.timings} ms; set status to COMPLETED"
+    )
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def process_file_upload(self, file_pk):
+    """
+    Celery task to process the file upload asynchronously.
+    - Claims the file (PROCESSING plus a lease) with SELECT ... FOR UPDATE
+      SKIP LOCKED, so duplicate deliveries and manual re-queues skip it.
+    - Opens the file content and uploads it to S3 using upload_fileobj.
+    - Runs the post-upload pipeline (checksum, size, content type, ...).
+    - Updates the File model status to COMPLETED or FAILED.
+    - Stores error message on failure.
+    Failures are recorded by transfer_claimed_file; this task only retries.
+    """
+
+    try:
+        file_instance = FileRepository().claim_file(
+            file_pk,
+            settings.FILE_PROCESSING_LEASE_SECONDS,
+            # A FAILED file is only reprocessed by this task's own retries.
+            include_failed=bool(self.request.retries),
+        )
+        if file_instance is None:
+            logger.warning(
+                f"File PK: {file_pk} is missing, already processed or claimed by another worker. Skipping."
             )
-            with transaction.atomic():
-                file_instance = File.objects.get(pk=file_pk)  # Re-fetch
-                file_instance.status = FileStatus.FAILED
-                file_instance.error_message = f"Processing error: Cannot read file from storage ({type(open_err).__name__})."
-                file_instance.save(update_fields=["status", "error_message"])
-            raise  # Re-raise the exception
-
-        # --- Update status based on upload result ---
-        with transaction.atomic():
-            file_instance = File.objects.get(pk=file_pk)  # Re-fetch before final update
-            if upload_successful:
-                file_instance.status = FileStatus.COMPLETED
-                file_instance.error_message = None
-                file_instance.save(update_fields=["status", "error_message"])
-                logger.info(
-                    f"Successfully uploaded {s3_key} to S3. Set status to COMPLETED for File PK: {file_pk}"
-                )
-
-            else:
-                # Ensure status is FAILED if upload returned False
-                if file_instance.status != FileStatus.FAILED:
-                    file_instance.status = FileStatus.FAILED
-                    file_instance.error_message = (
-                        "S3 upload failed (service returned False)."
-                    )
-                    file_instance.save(update_fields=["status", "error_message"])
-                logger.error(
-                    f"S3 upload failed for {s3_key}. Status set to FAILED for File PK: {file_pk}"
-                )
-                raise ConnectionError("S3 Upload failed (service returned False)")
+            return
+        logger.info(
+            f"Claimed File PK: {file_pk} (GUID: {file_instance.guid}) until {file_instance.lease_expires_at}"
+        )
+
+        transfer_claimed_file(file_instance)
 
     except File.DoesNotExist:
         logger.error(f"File with PK {file_pk} not found for processing.")
         return
     except Exception as e:
+        # transfer_claimed_file has already marked the file FAILED (unless it
+        # was deleted meanwhile).
         logger.exception(
             f"Unhandled error processing file upload for PK {file_pk}: {e}"
         )
-        if file_instance:
-            try:
-                with transaction.atomic():
-                    file_instance = File.objects.get(pk=file_pk)
-                    if file_instance.status != FileStatus.COMPLETED:
-                        file_instance.status = FileStatus.FAILED
-                        file_instance.error_message = (
-                            f"Unexpected processing error: {str(e)[:255]}"
-                        )
-                        file_instance.save(update_fields=["status", "error_message"])
-            except Exception as update_err:
-                logger.error(
-                    f"Failed to update file status to FAILED for PK {file_pk} during error handling: {update_err}"
-                )
 
         # Retry the task based on decorator config
         try:
@@ -144,3 +237,105 @@ def process_file_upload(self, file_pk):
             logger.error(
                 f"Max retries exceeded for processing file PK {file_pk}. Final status should be FAILED."
             )
+
+
+@shared_task
+def process_pending_files(batch_size=None):
+    """
+    Claim a batch of PENDING files and process them in this worker. Any
+    number of workers can run this concurrently: SKIP LOCKED hands each of
+    them a disjoint batch.
+    """
+    claimed = FileRepository().claim_pending_files(
+        batch_size or settings.FILE_PROCESSING_BATCH_SIZE,
+        settings.FILE_PROCESSING_LEASE_SECONDS,
+    )
+    for file_instance in claimed:
+        try:
+            transfer_claimed_file(file_instance)
+        except Exception as e:
+            # transfer_claimed_file has already marked the file FAILED.
+            logger.error(f"Batch processing failed for File PK {file_instance.pk}: {e}")
+    return len(claimed)
+
+
+@shared_task
+def process_file_batch(file_pks):
+    """
+    Process the files of one batch upload (FileBatchUploadView) in a single
+    task instead of one task per file. Files claimed elsewhere are skipped.
+    """
+    claimed = FileRepository().claim_pending_files(
+        len(file_pks), settings.FILE_PROCESSING_LEASE_SECONDS, file_pks=file_pks
+    )
+    for file_instance in claimed:
+        try:
+            transfer_claimed_file(file_instance)
+        except Exception as e:
+            # transfer_claimed_file has already marked the file FAILED.
+            logger.error(f"Batch processing failed for File PK {file_instance.pk}: {e}")
+    return len(claimed)
+
+
+@shared_task
+def requeue_expired_leases(batch_size=None):
+    """
+    Periodic sweeper: a worker that died mid-upload leaves its file
+    PROCESSING with a lease in the past. Such files are reset to PENDING and
+    queued again. Only the partial index over PROCESSING rows is read.
+    """
+    file_pks = FileRepository().release_expired_leases(
+        batch_size or settings.FILE_PROCESSING_BATCH_SIZE
+    )
+    for file_pk in file_pks:
+        process_file_upload.delay(file_pk)
+    if file_pks:
+        logger.warning(f"Re-queued {len(file_pks)} files with expired leases")
+    return len(file_pks)
+
+
+@shared_task
+def reconcile_stuck_uploads():
+    """
+    Periodic safety net for files whose process_file_upload message never
+    reached a worker: compares stuck files against a listing of the bucket,
+    queues the ones found for processing again and marks the others FAILED.
+    """
+    return UploadReconciler(requeue=process_file_batch.delay).run()
+
+
+@shared_task
+def collect_deleted_files():
+    """
+    Periodic garbage collection: deletes the objects of soft-deleted files
+    (after FILE_DELETE_GRACE_SECONDS) and of deleted users' files with
+    batched DeleteObjects requests, then their rows.
+    """
+    return DeletedFileCollector().run()
+
+
+@shared_task
+def expire_stale_uploads():
+    """
+    Periodic cleanup of abandoned uploads: aborts multipart uploads started
+    more than RESUMABLE_UPLOAD_EXPIRY_SECONDS ago, so S3 stops storing (and
+    billing) their parts.
+    """
+    return ResumableUploadService().expire_stale_uploads()
+
+
+@shared_task
+def generate_file_preview(file_pk):
+    """
+    Render the preview of a file completed before previews existed (or whose
+    preview failed). Runs only the preview stage of the pipeline.
+    """
+    file_instance = File.objects.filter(pk=file_pk, status=FileStatus.COMPLETED).first()
+    if file_instance is None:
+        logger.warning(f"File PK: {file_pk} is missing or not completed. Skipping.")
+        return None
+    result = Pipeline([PreviewStage()]).run(file_instance)
+    key = result.updates.get("preview_key")
+    if key:
+        File.objects.filter(pk=file_pk).update(preview_key=key)
+    return key
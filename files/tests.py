@@ -1,3 +1,1671 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import zipfile
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import pypdfium2
+import zstandard
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from accounts.services.jwt_service_impl import JWTServiceImpl
+from common.db.testing import QueryBudgetMixin
+from files.models import File, FileStatus, object_key, preview_key
+from files.repositories.file_repository import FileRepository
+from files.services import previews
+from files.services.deletion_service import DeletedFileCollector
+from files.services.download_cache import DownloadCache
+from files.services.pipeline import Pipeline, Stage, StageError
+from files.services.pipeline_stages import ChecksumStage, PreviewStage, SizeStage
+from files.services.reconciliation_service import merge_join
+from files.services.resumable_upload_service import ResumableUploadService
+from files.services.status_events import publish_status
+from files.services.storage_service import S3StorageService
+from files.task import (
+    finish_file,
+    generate_file_preview,
+    keep_lease,
+    process_file_batch,
+    process_file_upload,
+    process_pending_files,
+    reconcile_stuck_uploads,
+    requeue_expired_leases,
+    transfer_claimed_file,
+)
+from files.upload_handlers import S3BatchUploadHandler
+
+
+class FileListViewQueryBudgetTest(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(user_name="fileowner", password="pass")
+        for index in range(5):
+            File.objects.create(
+                original_name=f"report_{index}.csv",
+                file=f"files/{self.user.id}/report_{index}.csv",
+                user=self.user,
+                status=FileStatus.COMPLETED,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("files:list")
+
+    def test_list_files_query_budget(self):
+        # One COUNT(*) for pagination plus one page SELECT.
+        with self.assertMaxQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 5)
+
+
+class FileAdminQueryTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser(user_name="admin", password="pass")
+        for index in range(3):
+            owner = User.objects.create_user(user_name=f"owner{index}", password="pass")
+            for file_index in range(3):
+                File.objects.create(
+                    original_name=f"doc_{file_index}.txt",
+                    file=f"files/{owner.id}/doc_{file_index}.txt",
+                    user=owner,
+                )
+        self.client.force_login(self.admin)
+
+    def test_changelist_has_no_n_plus_one(self):
+        with self.assertNoNPlusOne(threshold=3):
+            response = self.client.get(reverse("admin:files_file_changelist"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class FileUrlViewTest(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(user_name="urlowner", password="pass")
+        self.other = User.objects.create_user(user_name="stranger", password="pass")
+        self.file = File.objects.create(
+            original_name="photo.png",
+            file=f"files/{self.user.id}/photo.png",
+            user=self.user,
+            status=FileStatus.COMPLETED,
+        )
+        self.url = reverse("files:file-url", kwargs={"guid": self.file.guid})
+
+    def test_owner_gets_presigned_url(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(f"files/{self.user.id}/photo.png", response.data["url"])
+
+    def test_other_user_gets_404(self):
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_compressed_file_url_depends_on_accept_encoding(self):
+        File.objects.filter(pk=self.file.pk).update(compression="zstd")
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, headers={"Accept-Encoding": "gzip, br"})
+        self.assertEqual(
+            response.data,
+            {
+                "url": "http://testserver"
+                + reverse("files:file-download", kwargs={"guid": self.file.guid})
+            },
+        )
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+        response = self.client.get(self.url, headers={"Accept-Encoding": "gzip, zstd"})
+        self.assertEqual(response.data["content_encoding"], "zstd")
+        self.assertIn("response-content-encoding=zstd", response.data["url"])
+
+
+class FileListViewPaginationTest(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(user_name="pager", password="pass")
+        for index in range(12):
+            File.objects.create(
+                original_name=f"page_{index}.txt",
+                file=f"files/{self.user.id}/page_{index}.txt",
+                user=self.user,
+                status=FileStatus.COMPLETED,
+            )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("files:list")
+
+    def test_second_page(self):
+        response = self.client.get(self.url, {"page": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 12)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["next"])
+
+    def test_out_of_range_page_is_404(self):
+        response = self.client.get(self.url, {"page": 5})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(SSE_STREAM_TIMEOUT=5, SSE_KEEPALIVE_INTERVAL=1)
+class FileStatusStreamViewTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            user_name="streamer", password="pass", is_approved=True
+        )
+        self.pending = File.objects.create(
+            original_name="big.iso", file="files/big.iso", user=self.user
+        )
+        self.completed = File.objects.create(
+            original_name="done.txt",
+            file="files/done.txt",
+            user=self.user,
+            status=FileStatus.COMPLETED,
+        )
+        access = JWTServiceImpl().generate_token(self.user)["access"]
+        self.headers = {
+            "Authorization": f"Bearer {access}",
+            "Accept": "text/event-stream",
+        }
+
+    async def open_stream(self, file_instance=None):
+        if file_instance is None:
+            url = reverse("files:status-stream")
+        else:
+            url = reverse(
+                "files:file-status-stream", kwargs={"guid": file_instance.guid}
+            )
+        return await self.async_client.get(url, headers=self.headers)
+
+    async def test_finished_file_sends_status_and_closes(self):
+        response = await self.open_stream(self.completed)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertIn(b"event: status", body)
+        self.assertIn(b'"status": "COMPLETED"', body)
+
+    async def test_transition_is_pushed_and_ends_stream(self):
+        response = await self.open_stream(self.pending)
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+        self.assertIn(b'"status": "PENDING"', await anext(stream))
+
+        publish_status(
+            self.user.id, {"guid": str(self.completed.guid), "status": "FAILED"}
+        )
+        publish_status(
+            self.user.id, {"guid": str(self.pending.guid), "status": "COMPLETED"}
+        )
+        event = await anext(stream)
+        self.assertIn(str(self.pending.guid).encode(), event)
+        self.assertIn(b'"status": "COMPLETED"', event)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+    async def test_user_stream_starts_with_in_progress_files(self):
+        response = await self.open_stream()
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        first = await anext(stream)
+        self.assertIn(str(self.pending.guid).encode(), first)
+        self.assertEqual(await anext(stream), b": keepalive\n\n")
+        await stream.aclose()
+
+    async def test_unknown_file_is_404(self):
+        User = get_user_model()
+        other = await User.objects.acreate(user_name="peeker", is_approved=True)
+        access = JWTServiceImpl().generate_token(other)["access"]
+        self.headers["Authorization"] = f"Bearer {access}"
+        response = await self.open_stream(self.pending)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(response.content.startswith(b"event: error"))
+
+
+class FileStatusSignalTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(user_name="signaler", password="pass")
+        self.file = File.objects.create(
+            original_name="a.txt", file="files/a.txt", user=self.user
+        )
+
+    def test_status_change_is_published_on_commit(self):
+        self.file.status = FileStatus.PROCESSING
+        with mock.patch("files.signals.publish_status") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.file.save(update_fields=["status", "error_message"])
+        publish.assert_called_once()
+        user_id, payload = publish.call_args.args
+        self.assertEqual(user_id, self.user.id)
+        self.assertEqual(payload["status"], FileStatus.PROCESSING)
+
+    def test_unrelated_update_is_not_published(self):
+        with mock.patch("files.signals.publish_status") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.file.save(update_fields=["original_name"])
+        publish.assert_not_called()
+
+
+class InMemoryMultipartStorage:
+    """Stands in for S3StorageService's multipart API."""
+
+    def __init__(self):
+        self.uploads = {}
+        self.initiated = {}
+        self.objects = {}
+
+    def create_multipart_upload(self, s3_key):
+        upload_id = f"upload-{len(self.initiated) + 1}"
+        self.uploads[upload_id] = {}
+        self.initiated[upload_id] = (s3_key, timezone.now())
+        return upload_id
+
+    def upload_part(self, s3_key, upload_id, part_number, body):
+        self.uploads[upload_id][part_number] = body
+        return f"etag-{part_number}"
+
+    def complete_multipart_upload(self, s3_key, upload_id, parts):
+        chunks = self.uploads.pop(upload_id)
+        self.objects[s3_key] = b"".join(chunks[p["PartNumber"]] for p in parts)
+        return True
+
+    def abort_multipart_upload(self, s3_key, upload_id):
+        self.uploads.pop(upload_id, None)
+        return True
+
+    def iter_multipart_uploads(self):
+        for upload_id in list(self.uploads):
+            s3_key, initiated = self.initiated[upload_id]
+            yield s3_key, upload_id, initiated
+
+    def upload_file_or_object(self, s3_key, local_file_path=None, file_object=None):
+        self.objects[s3_key] = file_object.read()
+        return True
+
+    def head_object(self, s3_key):
+        if s3_key not in self.objects:
+            return None
+        return {"ContentLength": len(self.objects[s3_key])}
+
+    def iter_objects(self, prefix):
+        for key in sorted(k for k in self.objects if k.startswith(prefix)):
+            yield key, len(self.objects[key])
+
+    def get_object(self, s3_key, byte_range=None):
+        if s3_key not in self.objects:
+            return None
+        content = self.objects[s3_key]
+        if byte_range is not None:
+            content = content[byte_range[0] : byte_range[1] + 1]
+        return {"Body": io.BytesIO(content), "ContentLength": len(content)}
+
+    def copy_object(self, source_key, dest_key):
+        if source_key not in self.objects:
+            return False
+        self.objects[dest_key] = self.objects[source_key]
+        return True
+
+    def delete_object(self, s3_key):
+        self.objects.pop(s3_key, None)
+        return True
+
+    def delete_objects(self, s3_keys):
+        for key in s3_keys:
+            self.objects.pop(key, None)
+        return []
+
+
+class FakeStorageMixin:
+    """
+    Creates `self.storage`, an InMemoryMultipartStorage that S3StorageService
+    returns in each module of `storage_modules`, and `self.user` named
+    `user_name` (with `user_fields`) unless that is None.
+    """
+
+    user_name = None
+    user_fields = {}
+    storage_modules = ()
+
+    def setUp(self):
+        super().setUp()
+        if self.user_name is not None:
+            self.user = get_user_model().objects.create_user(
+                user_name=self.user_name, password="pass", **self.user_fields
+            )
+        self.storage = InMemoryMultipartStorage()
+        for module in self.storage_modules:
+            patcher = mock.patch(
+                f"{module}.S3StorageService", return_value=self.storage
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+@mock.patch("files.services.resumable_upload_service.MIN_PART_SIZE", 4)
+class ResumableUploadTest(FakeStorageMixin, APITestCase):
+    user_name = "resumer"
+    storage_modules = ["files.services.resumable_upload_service", "files.task"]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+        patcher = mock.patch("files.views.process_file_upload")
+        self.task = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create(self, name="video.mp4", length=10):
+        encoded = base64.b64encode(name.encode()).decode()
+        return self.client.post(
+            reverse("files:resumable-uploads"),
+            HTTP_UPLOAD_LENGTH=str(length),
+            HTTP_UPLOAD_METADATA=f"filename {encoded}",
+        )
+
+    def patch(self, location, offset, body):
+        return self.client.generic(
+            "PATCH",
+            location,
+            body,
+            content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_upload_in_chunks_with_resume(self):
+        response = self.create()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["Tus-Resumable"], "1.0.0")
+        location = response["Location"]
+
+        response = self.patch(location, 0, b"01234")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response["Upload-Offset"], "5")
+
+        # The client lost the acknowledgement: HEAD tells it where to resume.
+        response = self.client.head(location)
+        self.assertEqual(response["Upload-Offset"], "5")
+        self.assertEqual(response["Upload-Length"], "10")
+        self.assertEqual(self.patch(location, 0, b"01234").status_code, 409)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.patch(location, 5, b"56789")
+        self.assertEqual(response["Upload-Offset"], "10")
+        file_instance = File.objects.get()
+        self.assertEqual(file_instance.status, FileStatus.PENDING)
+        self.assertIsNone(file_instance.upload_id)
+        self.assertEqual(self.storage.objects[file_instance.file.name], b"0123456789")
+        self.task.delay.assert_called_once_with(file_instance.pk)
+
+    def test_finished_upload_goes_through_the_pipeline(self):
+        self.task.delay.side_effect = lambda pk: process_file_upload.apply(args=[pk])
+        content = image_bytes((40, 30))
+        location = self.create(name="photo.png", length=len(content))["Location"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patch(location, 0, content)
+        file_instance = File.objects.get()
+        self.assertEqual(file_instance.status, FileStatus.COMPLETED)
+        self.assertEqual(file_instance.checksum, hashlib.sha256(content).hexdigest())
+        self.assertEqual(file_instance.content_type, "image/png")
+        self.assertEqual(file_instance.preview_key, preview_key(file_instance.guid))
+        self.assertEqual(
+            set(file_instance.processing_timings),
+            {"checksum", "size", "content_type", "preview"},
+        )
+
+    def test_creating_again_resumes_the_unfinished_upload(self):
+        first = self.create()
+        self.patch(first["Location"], 0, b"0123")
+        again = self.create()
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again["Location"], first["Location"])
+        self.assertEqual(again["Upload-Offset"], "4")
+
+    def test_small_non_final_chunk_is_rejected(self):
+        location = self.create()["Location"]
+        response = self.patch(location, 0, b"01")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(File.objects.get().upload_offset, 0)
+
+    def test_chunk_past_declared_length_is_rejected(self):
+        location = self.create(length=4)["Location"]
+        response = self.patch(location, 0, b"01234")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_wrong_content_type_is_415(self):
+        location = self.create()["Location"]
+        response = self.client.patch(location, {"a": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_terminate_aborts_multipart_upload(self):
+        location = self.create()["Location"]
+        self.assertEqual(len(self.storage.uploads), 1)
+        response = self.client.delete(location)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.storage.uploads, {})
+        self.assertFalse(File.objects.exists())
+
+    def test_empty_file_is_queued_immediately(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.create(name="empty.txt", length=0)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        file_instance = File.objects.get()
+        self.assertEqual(file_instance.status, FileStatus.PENDING)
+        self.task.delay.assert_called_once_with(file_instance.pk)
+
+    def test_missing_filename_is_rejected(self):
+        response = self.client.post(
+            reverse("files:resumable-uploads"), HTTP_UPLOAD_LENGTH="10"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chunk_is_rejected_while_another_is_being_stored(self):
+        location = self.create()["Location"]
+        with mock.patch.object(
+            FileRepository, "lock_upload", side_effect=DatabaseError("locked")
+        ):
+            response = self.patch(location, 0, b"01234")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.storage.uploads, {"upload-1": {}})
+        self.assertEqual(File.objects.get().upload_offset, 0)
+
+    def test_expire_stale_uploads(self):
+        location = self.create()["Location"]
+        self.patch(location, 0, b"01234")
+        fresh = self.create(name="fresh.mp4")["Location"]
+        # A streaming upload that crashed before it saved a File row.
+        self.storage.create_multipart_upload("files/orphan")
+        week_ago = timezone.now() - timedelta(days=8)
+        File.objects.exclude(original_name="fresh.mp4").update(uploaded_at=week_ago)
+        for upload_id in ("upload-1", "upload-3"):
+            s3_key, _ = self.storage.initiated[upload_id]
+            self.storage.initiated[upload_id] = (s3_key, week_ago)
+
+        result = ResumableUploadService(
+            storage_service=self.storage
+        ).expire_stale_uploads()
+
+        self.assertEqual(result, {"expired": 1, "aborted": 1})
+        self.assertEqual(list(self.storage.uploads), ["upload-2"])
+        self.assertEqual(
+            list(File.objects.values_list("original_name", flat=True)), ["fresh.mp4"]
+        )
+        self.assertEqual(self.client.head(fresh).status_code, 200)
+        self.assertEqual(self.client.head(location).status_code, 404)
+
+    def test_other_users_cannot_see_upload(self):
+        location = self.create()["Location"]
+        User = get_user_model()
+        self.client.force_authenticate(
+            user=User.objects.create_user(user_name="intruder", password="pass")
+        )
+        self.assertEqual(self.client.head(location).status_code, 404)
+        self.assertEqual(self.patch(location, 0, b"0123").status_code, 404)
+
+
+class StreamingUploadTest(FakeStorageMixin, APITestCase):
+    user_name = "streamup"
+    storage_modules = ["files.upload_handlers"]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+        task_patcher = mock.patch("files.views.process_file_upload")
+        self.task = task_patcher.start()
+        self.addCleanup(task_patcher.stop)
+        self.url = reverse("files:file-upload")
+
+    def upload(self, name, content):
+        return self.client.post(
+            self.url, {"file": SimpleUploadedFile(name, content)}, format="multipart"
+        )
+
+    def test_small_file_is_stored_with_one_put(self):
+        response = self.upload("notes.txt", b"hello world")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        file_instance = File.objects.get()
+        key = object_key(file_instance.guid, "notes.txt")
+        self.assertEqual(file_instance.file.name, key)
+        self.assertEqual(self.storage.objects[key], b"hello world")
+        self.assertEqual(file_instance.size, 11)
+        self.assertEqual(
+            file_instance.checksum, hashlib.sha256(b"hello world").hexdigest()
+        )
+        self.task.delay.assert_called_once_with(file_instance.pk)
+
+    @override_settings(STREAMING_UPLOAD_PART_SIZE=64 * 1024)
+    def test_large_file_is_sent_as_multipart_parts(self):
+        content = bytes(range(256)) * 1024  # 256 KiB -> 4 parts
+        with mock.patch.object(
+            self.storage, "upload_part", wraps=self.storage.upload_part
+        ) as upload_part:
+            response = self.upload("big.bin", content)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(upload_part.call_count, 4)
+        file_instance = File.objects.get()
+        self.assertEqual(self.storage.objects[file_instance.file.name], content)
+        self.assertEqual(self.storage.uploads, {})
+
+    def test_duplicate_of_completed_file_is_not_stored(self):
+        existing = File.objects.create(
+            original_name="dup.txt",
+            file=f"files/{self.user.id}/dup.txt",
+            user=self.user,
+            status=FileStatus.COMPLETED,
+        )
+        response = self.upload("dup.txt", b"new content")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["file"]["guid"], str(existing.guid))
+        self.assertEqual(self.storage.objects, {})
+
+    def test_duplicate_of_pending_file_is_conflict(self):
+        File.objects.create(
+            original_name="busy.txt", file="files/busy.txt", user=self.user
+        )
+        response = self.upload("busy.txt", b"data")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.storage.objects, {})
+
+    def test_name_is_checked_once(self):
+        with mock.patch.object(
+            FileRepository,
+            "get_user_file_by_name",
+            wraps=FileRepository().get_user_file_by_name,
+        ) as lookup, mock.patch.object(FileRepository, "get_file_by_name") as second:
+            response = self.upload("once.txt", b"data")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        lookup.assert_called_once()
+        second.assert_not_called()
+
+    def test_other_file_fields_go_to_the_default_handlers(self):
+        response = self.client.post(
+            self.url,
+            {
+                "file": SimpleUploadedFile("main.txt", b"main"),
+                "attachment": SimpleUploadedFile("extra.txt", b"extra"),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(list(self.storage.objects.values()), [b"main"])
+
+    @override_settings(FILE_COMPRESSION_ENABLED=True)
+    def test_compressible_file_is_stored_compressed(self):
+        content = b"line of text\n" * 1000
+        response = self.upload("log.txt", content)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        file_instance = File.objects.get()
+        stored = self.storage.objects[file_instance.file.name]
+        self.assertEqual(file_instance.compression, "zstd")
+        self.assertEqual(file_instance.size, len(content))
+        self.assertEqual(file_instance.stored_size, len(stored))
+        self.assertLess(len(stored), len(content))
+        self.assertEqual(
+            zstandard.ZstdDecompressor().decompressobj().decompress(stored), content
+        )
+        self.assertEqual(file_instance.checksum, hashlib.sha256(content).hexdigest())
+
+    @override_settings(FILE_COMPRESSION_ENABLED=True)
+    def test_compressed_formats_are_stored_as_is(self):
+        for name in ["photo.png", "bundle.zip", "data.csv.gz"]:
+            self.upload(name, b"already compressed")
+        for file_instance in File.objects.all():
+            self.assertIsNone(file_instance.compression)
+            self.assertEqual(
+                self.storage.objects[file_instance.file.name], b"already compressed"
+            )
+
+    def test_storage_failure_is_502(self):
+        with mock.patch.object(
+            self.storage, "upload_file_or_object", return_value=False
+        ):
+            response = self.upload("broken.txt", b"data")
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertFalse(File.objects.exists())
+
+
+class ProcessFileUploadTest(FakeStorageMixin, TestCase):
+    user_name = "worker"
+    storage_modules = ["files.task"]
+
+    def make_file(self, **kwargs):
+        return File.objects.create(
+            original_name="in-place.txt",
+            file=f"files/{self.user.id}/in-place.txt",
+            user=self.user,
+            **kwargs,
+        )
+
+    def test_object_already_in_bucket_is_not_transferred(self):
+        file_instance = self.make_file(size=5)
+        self.storage.objects[file_instance.file.name] = b"12345"
+        with mock.patch.object(self.storage, "upload_file_or_object") as upload:
+            with mock.patch("django.db.models.fields.files.FieldFile.open") as opened:
+                process_file_upload.apply(args=[file_instance.pk])
+        upload.assert_not_called()
+        opened.assert_not_called()
+        file_instance.refresh_from_db()
+        self.assertEqual(file_instance.status, FileStatus.COMPLETED)
+
+    def test_size_mismatch_falls_back_to_upload(self):
+        file_instance = self.make_file(size=10)
+        self.storage.objects[file_instance.file.name] = b"12345"
+        with mock.patch(
+            "django.db.models.fields.files.FieldFile.open",
+            return_value=mock.MagicMock(),
+        ):
+            with mock.patch.object(
+                self.storage, "upload_file_or_object", return_value=True
+            ) as upload:
+                process_file_upload.apply(args=[file_instance.pk])
+        upload.assert_called_once()
+        file_instance.refresh_from_db()
+        self.assertEqual(file_instance.status, FileStatus.COMPLETED)
+
+    def test_file_deleted_mid_processing_stays_deleted(self):
+        file_instance = self.make_file(size=5)
+
+        def delete_then_fail(claimed):
+            File.objects.filter(pk=claimed.pk).update(
+                status=FileStatus.DELETED, deleted_at=timezone.now()
+            )
+            raise ConnectionError("S3 went away")
+
+        with mock.patch(
+            "files.task.transfer_claimed_file", side_effect=delete_then_fail
+        ) as transfer:
+            process_file_upload.apply(args=[file_instance.pk])
+        transfer.assert_called_once()  # the retries find nothing to claim
+        file_instance.refresh_from_db()
+        self.assertEqual(file_instance.status, FileStatus.DELETED)
+        self.assertIsNotNone(file_instance.deleted_at)
+
+    def test_deleted_files_are_not_claimed(self):
+        repository = FileRepository()
+        failed = self.make_file(status=FileStatus.FAILED, deleted_at=timezone.now())
+        self.assertIsNone(repository.claim_file(failed.pk, 60, include_failed=True))
+        orphan = File.objects.create(original_name="orphan.txt", file="files/o")
+        self.assertIsNone(repository.claim_file(orphan.pk, 60))
+        self.assertEqual(repository.claim_pending_files(5, 60), [])
+
+    def test_unexpected_error_is_recorded_by_the_transfer(self):
+        file_instance = self.make_file(size=5)
+        self.storage.objects[file_instance.file.name] = b"12345"
+        with mock.patch(
+            "files.task.Pipeline.from_settings",
+            side_effect=ImproperlyConfigured("no such stage"),
+        ), mock.patch.object(process_file_upload, "retry", side_effect=Exception):
+            process_file_upload.apply(args=[file_instance.pk])
+        file_instance.refresh_from_db()
+        self.assertEqual(file_instance.status, FileStatus.FAILED)
+        self.assertIn("no such stage", file_instance.error_message)
+        self.assertIsNone(file_instance.lease_expires_at)
+
+
+class RecordingStage(Stage):
+    def __init__(self, name, requires=(), optional=False, fail=False):
+        self.name = name
+        self.requires = requires
+        self.optional = optional
+        self.fail = fail
+
+    def run(self, context):
+        if self.fail:
+            raise StageError("broken")
+        return {self.name: sorted(context.results)}
+
+
+def image_bytes(size, format="PNG"):
+    output = io.BytesIO()
+    Image.effect_noise(size, 64).convert("RGB").save(output, format)
+    return output.getvalue()
+
+
+@override_settings(FILE_PIPELINE_CHUNK_SIZE=1024, FILE_PIPELINE_QUEUE_DEPTH=2)
+class PipelineTest(FakeStorageMixin, TestCase):
+    content = image_bytes((300, 200))
+    user_name = "piper"
+    storage_modules = ["files.task"]
+
+    def make_file(self, stored=None, **kwargs):
+        file_instance = File.objects.create(
+            original_name="picture.bin",
+            file=f"files/ab12/{uuid.uuid4()}/picture.bin",
+            user=self.user,
+            **kwargs,
+        )
+        self.storage.objects[file_instance.file.name] = stored or self.content
+        return file_instance
+
+    def test_default_stages_share_one_read(self):
+        file_instance = self.make_file()
+        with mock.patch.object(
+            self.storage, "get_object", wraps=self.storage.get_object
+        ) as get_object:
+            process_file_upload.apply(args=[file_instance.pk])
+        get_object.assert_called_once_with(file_instance.file.name)
+        file_instance.refresh_from_db()
+        self.assertEqual(file_instance.status, FileStatus.COMPLETED)
+        self.assertEqual(
+            file_instance.checksum, hashlib.sha256(self.content).hexdigest()
+        )
+        self.assertEqual(file_instance.size, len(self.content))
+        self.assertEqual(file_instance.content_type, "image/png")
+        self.assertEqual(
+            set(file_instance.processing_timings),
+            {"checksum", "size", "content_type", "preview"},
+        )
+        self.assertEqual(file_instance.preview_key, preview_key(file_instance.guid))
+        with Image.open(
+            io.BytesIO(self.storage.objects[file_instance.preview_key])
+        ) as preview:
+            self.assertEqual(preview.format, "WEBP")
+            self.assertEqual(preview.size, (256, 171))
+
+    def test_compressed_content_is_processed_decompressed(self):
+        stored = zstandard.ZstdCompressor().compress(self.content)
+        file_instance = self.make_file(
+            stored=stored,
+            size=len(self.content),
+            compression="zstd",
+            stored_size=len(stored),
+        )
+        process_file_upload.apply(args=[file_instance.pk])
+        file_instance.refresh_from_db()
+        self.assertEqual(file_instance.status, FileStatus.COMPLETED)
+        self.assertEqual(file_instance.size, len(self.content))
+        self.assertEqual(
+            file_instance.checksum, hashlib.sha256(self.content).hexdigest()
+        )
+
+    def test_checksum_mismatch_fails_the_file(self):
+        file_instance = self.make_file(checksum="0" * 64)
+        process_file_upload.apply(args=[file_instance.pk])
+        file_instance.refresh_from_db()
+        self.assertEqual(file_instance.status, FileStatus.FAILED)
+        self.assertIn("checksum", file_instance.error_message)
+
+    def test_stages_run_after_their_requirements(self):
+        pipeline = Pipeline(
+            [
+                RecordingStage("report", requires=("a", "b")),
+                RecordingStage("a"),
+                RecordingStage("b", requires=("a",)),
+                SizeStage(),
+            ],
+            storage_service=self.storage,
+        )
+        result = pipeline.run(self.make_file())
+        self.assertEqual(result.errors, {})
+        self.assertEqual(result.updates["report"], ["a", "b"])
+        self.assertEqual(result.updates["b"], ["a"])
+        self.assertEqual(result.updates["size"], len(self.content))
+        self.assertEqual(set(result.timings), {"report", "a", "b", "size"})
+
+    def test_failures_skip_dependents_unless_optional(self):
+        pipeline = Pipeline(
+            [
+                RecordingStage("broken", fail=True),
+                RecordingStage("after", requires=("broken",)),
+                RecordingStage("extra", optional=True, fail=True),
+                ChecksumStage(),
+            ],
+            storage_service=self.storage,
+        )
+        result = pipeline.run(self.make_file())
+        self.assertEqual(set(result.errors), {"broken", "after"})
+        self.assertIn("checksum", result.updates)
+
+    def test_invalid_stage_graphs_are_rejected(self):
+        for stages in [
+            [RecordingStage("a", requires=("missing",))],
+            [
+                RecordingStage("a", requires=("b",)),
+                RecordingStage("b", requires=("a",)),
+            ],
+            [RecordingStage("a"), RecordingStage("a")],
+            [RecordingStage("a"), type("Late", (SizeStage,), {"requires": ("a",)})()],
+        ]:
+            with self.assertRaises(ImproperlyConfigured):
+                Pipeline(stages, storage_service=self.storage)
+
+    def test_read_failure_fails_content_stages(self):
+        pipeline = Pipeline([SizeStage()], storage_service=self.storage)
+        with mock.patch.object(self.storage, "get_object", return_value=None):
+            result = pipeline.run(self.make_file())
+        self.assertIn("size", result.errors)
+
+
+@override_settings(FILE_PREVIEW_MAX_SIZE=64)
+class PreviewTest(FakeStorageMixin, TestCase):
+    user_name = "previewer"
+    user_fields = {"is_approved": True}
+
+    def setUp(self):
+        super().setUp()
+        self.pipeline = Pipeline([PreviewStage()], storage_service=self.storage)
+
+    def make_file(self, name, content):
+        file_instance = File.objects.create(
+            original_name=name,
+            file=object_key(uuid.uuid4(), name),
+            user=self.user,
+            status=FileStatus.COMPLETED,
+        )
+        self.storage.objects[file_instance.file.name] = content
+        return file_instance
+
+    def preview_of(self, file_instance):
+        result = self.pipeline.run(file_instance)
+        key = result.updates.get("preview_key")
+        return key and Image.open(io.BytesIO(self.storage.objects[key]))
+
+    def test_pdf_first_page_is_rendered(self):
+        document = pypdfium2.PdfDocument.new()
+        document.new_page(400, 200)
+        output = io.BytesIO()
+        document.save(output)
+        document.close()
+        preview = self.preview_of(self.make_file("doc.pdf", output.getvalue()))
+        self.assertEqual(preview.size, (64, 32))
+
+    def test_jpeg_is_rendered(self):
+        preview = self.preview_of(
+            self.make_file("photo.jpg", image_bytes((640, 480), "JPEG"))
+        )
+        self.assertEqual(preview.size, (64, 48))
+
+    def test_other_files_get_no_preview(self):
+        with mock.patch(
+            "files.services.pipeline_stages.generate_preview"
+        ) as generate_preview:
+            self.assertIsNone(self.preview_of(self.make_file("a.txt", b"text" * 500)))
+            with self.settings(FILE_PREVIEW_MAX_SOURCE_SIZE=1000):
+                self.assertIsNone(
+                    self.preview_of(self.make_file("big.png", image_bytes((100, 100))))
+                )
+        generate_preview.assert_not_called()
+
+    def test_known_size_above_the_limit_is_not_read(self):
+        file_instance = self.make_file("big.png", image_bytes((10, 10)))
+        file_instance.size = 2000
+        with mock.patch(
+            "files.services.pipeline_stages.generate_preview"
+        ) as generate_preview, self.settings(FILE_PREVIEW_MAX_SOURCE_SIZE=1000):
+            self.assertIsNone(self.preview_of(file_instance))
+        generate_preview.assert_not_called()
+
+    @override_settings(FILE_PREVIEW_TIMEOUT=0)
+    def test_timeout_replaces_the_pool(self):
+        pool = previews._get_pool()
+        # A render that never finishes.
+        with mock.patch.object(pool, "submit", return_value=Future()):
+            with mock.patch.object(pool, "shutdown") as shutdown:
+                with self.assertRaises(TimeoutError):
+                    previews.generate_preview(b"", "image/png")
+        shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        pool.shutdown()
+        self.assertIsNot(previews._get_pool(), pool)
+
+    def test_broken_image_does_not_fail_the_file(self):
+        result = self.pipeline.run(
+            self.make_file("broken.png", b"\x89PNG\r\n\x1a\n" + b"0" * 100)
+        )
+        self.assertEqual(result.errors, {})
+        self.assertNotIn("preview_key", result.updates)
+
+    def test_task_renders_preview_of_completed_file(self):
+        file_instance = self.make_file("old.png", image_bytes((80, 80)))
+        with mock.patch(
+            "files.services.pipeline.S3StorageService", return_value=self.storage
+        ):
+            generate_file_preview.apply(args=[file_instance.pk])
+        file_instance.refresh_from_db()
+        self.assertEqual(file_instance.preview_key, preview_key(file_instance.guid))
+
+    def test_preview_view_returns_url(self):
+        file_instance = self.make_file("photo.png", b"")
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        url = reverse("files:file-preview", kwargs={"guid": file_instance.guid})
+        self.assertEqual(client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+        file_instance.preview_key = preview_key(file_instance.guid)
+        file_instance.save(update_fields=["preview_key"])
+        response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(file_instance.preview_key, response.data["url"])
+        self.assertIn("response-content-type=image%2Fwebp", response.data["url"])
+
+
+class FileClaimTest(FakeStorageMixin, TestCase):
+    user_name = "claimer"
+    storage_modules = ["files.task"]
+
+    def setUp(self):
+        super().setUp()
+        self.repository = FileRepository()
+        self.files = [
+            File.objects.create(
+                original_name=f"queued_{index}.txt",
+                file=f"files/{self.user.id}/queued_{index}.txt",
+                user=self.user,
+            )
+            for index in range(3)
+        ]
+
+    def test_file_can_only_be_claimed_once_per_lease(self):
+        pk = self.files[0].pk
+        claimed = self.repository.claim_file(pk, 60)
+        self.assertEqual(claimed.status, FileStatus.PROCESSING)
+        self.assertIsNotNone(claimed.lease_expires_at)
+        self.assertIsNone(self.repository.claim_file(pk, 60))
+
+    def test_expired_lease_can_be_claimed_again(self):
+        pk = self.files[0].pk
+        self.repository.claim_file(pk, 60)
+        File.objects.filter(pk=pk).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertIsNotNone(self.repository.claim_file(pk, 60))
+
+    def test_failed_file_is_only_claimed_for_retries(self):
+        pk = self.files[0].pk
+        File.objects.filter(pk=pk).update(status=FileStatus.FAILED)
+        self.assertIsNone(self.repository.claim_file(pk, 60))
+        self.assertIsNotNone(self.repository.claim_file(pk, 60, include_failed=True))
+
+    def test_claim_pending_batch_takes_oldest_first(self):
+        claimed = self.repository.claim_pending_files(2, 60)
+        self.assertEqual([f.pk for f in claimed], [f.pk for f in self.files[:2]])
+        self.assertEqual(File.objects.filter(status=FileStatus.PROCESSING).count(), 2)
+        self.assertEqual(
+            [f.pk for f in self.repository.claim_pending_files(5, 60)],
+            [self.files[2].pk],
+        )
+
+    def test_sweeper_requeues_only_expired_leases(self):
+        expired, active, _ = self.files
+        self.repository.claim_file(expired.pk, 60)
+        self.repository.claim_file(active.pk, 60)
+        File.objects.filter(pk=expired.pk).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        with mock.patch.object(process_file_upload, "delay") as delay:
+            self.assertEqual(requeue_expired_leases(), 1)
+        delay.assert_called_once_with(expired.pk)
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, FileStatus.PENDING)
+        self.assertIsNone(expired.lease_expires_at)
+
+    def test_process_pending_files_transfers_claimed_batch(self):
+        for file_instance in self.files:
+            self.storage.objects[file_instance.file.name] = b"data"
+        self.assertEqual(process_pending_files(batch_size=10), 3)
+        self.assertEqual(File.objects.filter(status=FileStatus.COMPLETED).count(), 3)
+
+    def test_resumable_upload_in_progress_is_not_claimed(self):
+        File.objects.filter(pk=self.files[0].pk).update(upload_id="mpu-1")
+        self.assertIsNone(self.repository.claim_file(self.files[0].pk, 60))
+        self.assertEqual(
+            [f.pk for f in self.repository.claim_pending_files(5, 60)],
+            [f.pk for f in self.files[1:]],
+        )
+
+    def test_processing_file_without_lease_is_released(self):
+        pk = self.files[0].pk
+        File.objects.filter(pk=pk).update(status=FileStatus.PROCESSING)
+        self.assertEqual(self.repository.release_expired_leases(10), [pk])
+
+    def test_lease_is_renewed_until_the_file_is_finished(self):
+        pk = self.files[0].pk
+        claimed = self.repository.claim_file(pk, 60)
+        self.assertTrue(self.repository.renew_lease(pk, 600))
+        renewed = File.objects.get(pk=pk).lease_expires_at
+        self.assertGreater(renewed, claimed.lease_expires_at)
+        finish_file(pk, FileStatus.COMPLETED)
+        self.assertIsNone(File.objects.get(pk=pk).lease_expires_at)
+        self.assertFalse(self.repository.renew_lease(pk, 600))
+
+    def test_lease_is_kept_while_the_transfer_runs(self):
+        renewed = threading.Event()
+        with mock.patch.object(
+            FileRepository, "renew_lease", side_effect=lambda *args: renewed.set()
+        ) as renew_lease:
+            with keep_lease(self.files[0].pk, lease_seconds=0.03):
+                self.assertTrue(renewed.wait(5))
+        renew_lease.assert_called_with(self.files[0].pk, 0.03)
+
+    def test_task_skips_file_claimed_by_another_worker(self):
+        pk = self.files[0].pk
+        self.repository.claim_file(pk, 60)
+        with mock.patch("files.task.transfer_claimed_file") as transfer:
+            process_file_upload.apply(args=[pk])
+        transfer.assert_not_called()
+
+
+@override_settings(RECONCILE_GRACE_SECONDS=60, RECONCILE_WORKERS=2)
+class ReconcileStuckUploadsTest(FakeStorageMixin, TransactionTestCase):
+    # Users are scanned in worker threads, which only see committed rows.
+
+    storage_modules = ["files.services.reconciliation_service"]
+
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.users = [
+            User.objects.create_user(user_name=f"reconciled_{index}", password="pass")
+            for index in range(2)
+        ]
+
+    def make_file(self, user, name, age=120, stored=None, **kwargs):
+        file_instance = File.objects.create(
+            original_name=name, file=f"files/{user.id}/{name}", user=user, **kwargs
+        )
+        File.objects.filter(pk=file_instance.pk).update(
+            uploaded_at=timezone.now() - timedelta(seconds=age)
+        )
+        if stored is not None:
+            self.storage.objects[file_instance.file.name] = stored
+        return file_instance
+
+    def status_of(self, file_instance):
+        file_instance.refresh_from_db()
+        return file_instance.status
+
+    def test_merge_join_matches_sorted_streams(self):
+        rows = [("a", 1, None), ("c", 2, 3), ("e", 3, None)]
+        objects = [("b", 10), ("c", 3), ("d", 4)]
+        self.assertEqual(
+            list(merge_join(rows, objects)),
+            [(1, None, None), (2, 3, 3), (3, None, None)],
+        )
+
+    def test_stuck_files_are_repaired_from_the_listing(self):
+        first, second = self.users
+        stored = self.make_file(first, "stored.txt", stored=b"abc", size=3)
+        lost = self.make_file(first, "lost.txt")
+        leased = self.make_file(
+            second,
+            "leased.txt",
+            status=FileStatus.PROCESSING,
+            lease_expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        expired = self.make_file(
+            second,
+            "expired.txt",
+            stored=b"data",
+            status=FileStatus.PROCESSING,
+            lease_expires_at=timezone.now() - timedelta(minutes=5),
+        )
+        recent = self.make_file(second, "recent.txt", age=0)
+        resumable = self.make_file(second, "resumable.txt", upload_id="upload-1")
+
+        with mock.patch(
+            "files.services.reconciliation_service.publish_status"
+        ) as publish, mock.patch.object(process_file_batch, "delay") as delay:
+            result = reconcile_stuck_uploads()
+
+        self.assertEqual(result, {"prefixes": 2, "requeued": 2, "failed": 1})
+        self.assertEqual(self.status_of(stored), FileStatus.PENDING)
+        self.assertEqual(self.status_of(expired), FileStatus.PENDING)
+        expired.refresh_from_db()
+        self.assertIsNone(expired.lease_expires_at)
+        delay.assert_called_once()
+        self.assertCountEqual(delay.call_args.args[0], [stored.pk, expired.pk])
+        self.assertEqual(self.status_of(lost), FileStatus.FAILED)
+        self.assertEqual(self.status_of(leased), FileStatus.PROCESSING)
+        self.assertEqual(self.status_of(recent), FileStatus.PENDING)
+        self.assertEqual(self.status_of(resumable), FileStatus.PENDING)
+        self.assertEqual(publish.call_count, 3)
+
+    def test_requeued_files_are_processed_in_place(self):
+        stored = self.make_file(self.users[0], "stored.txt", stored=b"abc", size=3)
+        with mock.patch.object(
+            process_file_batch, "delay", process_file_batch
+        ), mock.patch("files.task.S3StorageService", return_value=self.storage):
+            reconcile_stuck_uploads()
+        stored.refresh_from_db()
+        self.assertEqual(stored.status, FileStatus.COMPLETED)
+        self.assertEqual(stored.checksum, hashlib.sha256(b"abc").hexdigest())
+
+    def test_size_mismatch_and_listing_errors_are_left_alone(self):
+        first, second = self.users
+        growing = self.make_file(first, "growing.bin", stored=b"ab", size=10)
+        unlisted = self.make_file(second, "unlisted.txt")
+        original = self.storage.iter_objects
+
+        def iter_objects(prefix):
+            if prefix == f"files/{second.id}/":
+                raise ConnectionError("listing failed")
+            return original(prefix)
+
+        with mock.patch.object(
+            self.storage, "iter_objects", iter_objects
+        ), mock.patch.object(process_file_batch, "delay") as delay:
+            result = reconcile_stuck_uploads()
+
+        self.assertEqual(result["requeued"] + result["failed"], 0)
+        delay.assert_not_called()
+        self.assertEqual(self.status_of(growing), FileStatus.PENDING)
+        self.assertEqual(self.status_of(unlisted), FileStatus.PENDING)
+
+
+class ObjectKeyLayoutTest(FakeStorageMixin, TestCase):
+    user_name = "rekeyed"
+    storage_modules = ["files.management.commands.rekey_files"]
+
+    def test_keys_are_hash_sharded_and_unique_per_file(self):
+        first = File(original_name="same.txt", user=self.user)
+        second = File(original_name="same.txt", user=self.user)
+        key = File.object_key_path(first, "same.txt")
+        self.assertRegex(key, rf"^files/[0-9a-f]{{4}}/{first.guid}/same\.txt$")
+        self.assertNotEqual(key, File.object_key_path(second, "same.txt"))
+
+    def test_rekey_moves_legacy_objects(self):
+        legacy = File.objects.create(
+            original_name="old.txt",
+            file=f"files/{self.user.id}/old.txt",
+            user=self.user,
+            status=FileStatus.COMPLETED,
+        )
+        pending = File.objects.create(
+            original_name="pending.txt",
+            file=f"files/{self.user.id}/pending.txt",
+            user=self.user,
+        )
+        self.storage.objects[legacy.file.name] = b"old"
+
+        call_command("rekey_files", stdout=io.StringIO())
+
+        legacy.refresh_from_db()
+        new_key = object_key(legacy.guid, "old.txt")
+        self.assertEqual(legacy.file.name, new_key)
+        self.assertEqual(self.storage.objects, {new_key: b"old"})
+        pending.refresh_from_db()
+        self.assertEqual(pending.file.name, f"files/{self.user.id}/pending.txt")
+
+    def test_rekey_keeps_row_when_copy_fails(self):
+        missing = File.objects.create(
+            original_name="gone.txt",
+            file=f"files/{self.user.id}/gone.txt",
+            user=self.user,
+            status=FileStatus.COMPLETED,
+        )
+        out = io.StringIO()
+        call_command("rekey_files", stdout=out)
+        missing.refresh_from_db()
+        self.assertEqual(missing.file.name, f"files/{self.user.id}/gone.txt")
+        self.assertIn("1 copies failed", out.getvalue())
+
+
+class FileDownloadViewTest(FakeStorageMixin, TestCase):
+    content = b"0123456789abcdef"
+    user_name = "downloader"
+    user_fields = {"is_approved": True}
+    storage_modules = ["files.views"]
+
+    def setUp(self):
+        super().setUp()
+        self.file = File.objects.create(
+            original_name="report.pdf",
+            file="files/ab12/report.pdf",
+            user=self.user,
+            status=FileStatus.COMPLETED,
+            size=len(self.content),
+        )
+        self.storage.objects[self.file.file.name] = self.content
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        access = JWTServiceImpl().generate_token(self.user)["access"]
+        self.url = reverse("files:file-download", kwargs={"guid": self.file.guid})
+        self.headers = {"Authorization": f"Bearer {access}"}
+
+    async def download(self, **headers):
+        response = await self.async_client.get(
+            self.url, headers={**self.headers, **headers}
+        )
+        body = b""
+        if response.streaming:
+            body = b"".join([chunk async for chunk in response.streaming_content])
+        return response, body
+
+    async def test_full_download_streams_object(self):
+        response, body = await self.download()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response["Content-Length"], str(len(self.content)))
+        self.assertEqual(response["ETag"], f'"{self.file.guid}"')
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    async def test_range_requests(self):
+        response, body = await self.download(Range="bytes=2-5")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(body, b"2345")
+        self.assertEqual(response["Content-Range"], "bytes 2-5/16")
+
+        response, body = await self.download(Range="bytes=-3")
+        self.assertEqual(body, b"def")
+
+        response, _ = await self.download(Range="bytes=16-")
+        self.assertEqual(
+            response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(response["Content-Range"], "bytes */16")
+
+        response, body = await self.download(Range="bytes=2-5", **{"If-Range": '"x"'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, self.content)
+
+    async def test_matching_etag_is_not_modified(self):
+        response, _ = await self.download(**{"If-None-Match": f'"{self.file.guid}"'})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_repeated_reads_are_served_from_disk_cache(self):
+        with self.settings(FILE_DOWNLOAD_CACHE_DIR=self.cache_dir):
+            _, body = await self.download()
+            self.assertEqual(body, self.content)
+            del self.storage.objects[self.file.file.name]
+
+            _, body = await self.download()
+            self.assertEqual(body, self.content)
+            response, body = await self.download(Range="bytes=10-")
+            self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+            self.assertEqual(body, b"abcdef")
+
+            with self.settings(FILE_DOWNLOAD_ACCEL_REDIRECT="/_download_cache/"):
+                response, body = await self.download()
+            cache = DownloadCache.from_settings()
+            self.assertEqual(
+                response["X-Accel-Redirect"],
+                "/_download_cache/" + cache.relative_path(self.file.file.name),
+            )
+            self.assertEqual(body, b"")
+
+    async def test_range_reads_do_not_fill_cache(self):
+        with self.settings(FILE_DOWNLOAD_CACHE_DIR=self.cache_dir):
+            await self.download(Range="bytes=0-3")
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    async def test_compressed_file_is_decoded_unless_client_accepts_codec(self):
+        content = b"compress me " * 100
+        stored = zstandard.ZstdCompressor().compress(content)
+        self.storage.objects[self.file.file.name] = stored
+        await File.objects.filter(pk=self.file.pk).aupdate(
+            size=len(content), compression="zstd", stored_size=len(stored)
+        )
+
+        response, body = await self.download(Range="bytes=0-3")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, content)
+        self.assertEqual(response["Content-Length"], str(len(content)))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Accept-Ranges"], "none")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+        response, body = await self.download(**{"Accept-Encoding": "gzip, zstd"})
+        self.assertEqual(body, stored)
+        self.assertEqual(response["Content-Encoding"], "zstd")
+        self.assertEqual(response["Content-Length"], str(len(stored)))
+        self.assertEqual(response["ETag"], f'"{self.file.guid}-zstd"')
+
+        response, body = await self.download(**{"Accept-Encoding": "zstd;q=0"})
+        self.assertEqual(body, content)
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = DownloadCache(self.cache_dir, max_bytes=10, max_object_size=10)
+        for index, key in enumerate(["old", "used", "new"]):
+            writer = cache.writer(key)
+            writer.write(b"12345")
+            os.utime(writer.file.name, (index, index))
+            if key == "new":
+                cache.open("used").close()  # a hit makes "used" recent
+            writer.commit()
+        self.assertFalse(os.path.exists(cache.path("old")))
+        self.assertTrue(os.path.exists(cache.path("used")))
+        self.assertTrue(os.path.exists(cache.path("new")))
+
+
+@override_settings(FILE_ARCHIVE_SEGMENT_SIZE=4, FILE_ARCHIVE_PREFETCH=2)
+class FileArchiveViewTest(FakeStorageMixin, TestCase):
+    user_name = "archiver"
+    user_fields = {"is_approved": True}
+    storage_modules = ["files.views"]
+
+    def setUp(self):
+        super().setUp()
+        self.contents = {
+            "a.txt": b"first file",
+            "b.csv": b"x,y\n1,2\n",
+            "empty.txt": b"",
+            "notes/../c.txt": b"sneaky",
+        }
+        self.files = {}
+        for name, content in self.contents.items():
+            file_instance = File.objects.create(
+                original_name=name,
+                file=f"files/ab12/{name}",
+                user=self.user,
+                status=FileStatus.COMPLETED,
+                size=None if name == "b.csv" else len(content),
+            )
+            self.storage.objects[file_instance.file.name] = content
+            self.files[name] = file_instance
+        access = JWTServiceImpl().generate_token(self.user)["access"]
+        self.headers = {"Authorization": f"Bearer {access}"}
+
+    async def archive(self, **data):
+        response = await self.async_client.post(
+            reverse("files:archive"),
+            data,
+            content_type="application/json",
+            headers=self.headers,
+        )
+        if not response.streaming:
+            return response, None
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        return response, zipfile.ZipFile(io.BytesIO(body))
+
+    async def test_archive_contains_all_files(self):
+        response, archive = await self.archive()
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(
+            {info.filename: archive.read(info) for info in archive.infolist()},
+            {
+                "a.txt": b"first file",
+                "b.csv": b"x,y\n1,2\n",
+                "empty.txt": b"",
+                "notes_.._c.txt": b"sneaky",
+            },
+        )
+
+    async def test_archive_by_guids_and_filter(self):
+        guids = [str(self.files["a.txt"].guid), str(self.files["b.csv"].guid)]
+        _, archive = await self.archive(guids=guids)
+        self.assertEqual(archive.namelist(), ["a.txt", "b.csv"])
+
+        _, archive = await self.archive(guids=guids, name_contains=".")
+        self.assertEqual(archive.namelist(), ["a.txt", "b.csv"])
+
+        response, _ = await self.archive(name_contains="missing")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_unmatched_guids_are_listed_and_nothing_is_sent(self):
+        unknown = uuid.uuid4()
+        guids = [str(self.files["a.txt"].guid), str(self.files["b.csv"].guid)]
+        response, _ = await self.archive(guids=[*guids, str(unknown)])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json()["missing"], [str(unknown)])
+
+        response, _ = await self.archive(guids=guids, name_contains=".csv")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json()["missing"], [guids[0]])
+
+    async def test_colliding_entry_names_are_numbered(self):
+        guids = []
+        for name, content in [("a/b.txt", b"slash"), ("a_b.TXT", b"underscore")]:
+            file_instance = await File.objects.acreate(
+                original_name=name,
+                file=f"files/ab12/{uuid.uuid4()}",
+                user=self.user,
+                status=FileStatus.COMPLETED,
+                size=len(content),
+            )
+            self.storage.objects[file_instance.file.name] = content
+            guids.append(str(file_instance.guid))
+        _, archive = await self.archive(guids=guids)
+        self.assertEqual(archive.namelist(), ["a_b.txt", "a_b (2).TXT"])
+        self.assertEqual(archive.read("a_b (2).TXT"), b"underscore")
+
+    async def test_compressed_files_are_decompressed_into_the_archive(self):
+        content = b"x,y\n1,2\n" * 20
+        stored = zstandard.ZstdCompressor().compress(content)
+        csv = self.files["b.csv"]
+        self.storage.objects[csv.file.name] = stored
+        await File.objects.filter(pk=csv.pk).aupdate(
+            size=len(content), compression="zstd", stored_size=len(stored)
+        )
+        _, archive = await self.archive(guids=[str(csv.guid)])
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.read("b.csv"), content)
+
+    @override_settings(FILE_ARCHIVE_MAX_FILES=2)
+    async def test_too_many_files_is_rejected(self):
+        response, _ = await self.archive()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_read_failure_aborts_the_stream(self):
+        with mock.patch.object(self.storage, "get_object", return_value=None):
+            with self.assertRaises(IOError):
+                await self.archive()
+
+
+class BatchUploadTest(FakeStorageMixin, APITestCase):
+    user_name = "batcher"
+    storage_modules = ["files.upload_handlers"]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("files:file-batch-upload")
+
+    def upload(self, *files):
+        return self.client.post(
+            self.url,
+            {"files": [SimpleUploadedFile(name, content) for name, content in files]},
+            format="multipart",
+        )
+
+    def test_batch_is_stored_in_one_insert_and_one_task(self):
+        File.objects.create(
+            original_name="old.txt", file="files/ab12/old.txt", user=self.user
+        )
+        with mock.patch("files.views.process_file_batch") as task:
+            response = self.upload(
+                ("a.txt", b"alpha"),
+                ("b.txt", b"beta"),
+                ("old.txt", b"again"),
+                ("a.txt", b"repeat"),
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["duplicates"], ["old.txt", "a.txt"])
+        first = File.objects.get(original_name="a.txt")
+        second = File.objects.get(original_name="b.txt")
+        self.assertEqual(
+            self.storage.objects,
+            {first.file.name: b"alpha", second.file.name: b"beta"},
+        )
+        self.assertEqual(second.checksum, hashlib.sha256(b"beta").hexdigest())
+        task.delay.assert_called_once()
+        self.assertCountEqual(task.delay.call_args.args[0], [first.pk, second.pk])
+
+    def test_failed_write_discards_whole_batch(self):
+        original = self.storage.upload_file_or_object
+
+        def flaky(s3_key, local_file_path=None, file_object=None):
+            if s3_key.endswith("bad.txt"):
+                return False
+            return original(s3_key, file_object=file_object)
+
+        with mock.patch.object(self.storage, "upload_file_or_object", flaky):
+            response = self.upload(("good.txt", b"ok"), ("bad.txt", b"no"))
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertFalse(File.objects.exists())
+        self.assertEqual(self.storage.objects, {})
+
+    def test_write_that_raises_fails_the_batch(self):
+        original = self.storage.upload_file_or_object
+
+        def broken(s3_key, local_file_path=None, file_object=None):
+            if s3_key.endswith("bad.txt"):
+                raise RuntimeError("connection reset")
+            return original(s3_key, file_object=file_object)
+
+        with mock.patch.object(self.storage, "upload_file_or_object", broken):
+            response = self.upload(("good.txt", b"ok"), ("bad.txt", b"no"))
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual(self.storage.objects, {})
+
+    def test_unexpected_error_discards_stored_files(self):
+        with mock.patch.object(
+            S3BatchUploadHandler, "wait", side_effect=ValueError("bad form")
+        ):
+            with self.assertRaises(ValueError):
+                self.upload(("a.txt", b"alpha"), ("b.txt", b"beta"))
+        self.assertEqual(self.storage.objects, {})
+        self.assertFalse(File.objects.exists())
+
+    def test_batch_task_completes_files_in_place(self):
+        with mock.patch("files.views.process_file_batch"):
+            self.upload(("x.txt", b"x"), ("y.txt", b"yy"))
+        pks = list(File.objects.values_list("pk", flat=True))
+        with mock.patch("files.task.S3StorageService", return_value=self.storage):
+            self.assertEqual(process_file_batch(pks), 2)
+        self.assertEqual(File.objects.filter(status=FileStatus.COMPLETED).count(), 2)
+
+
+@override_settings(
+    FILE_DELETE_GRACE_SECONDS=60, FILE_GC_BATCH_SIZE=2, FILE_GC_WORKERS=2
+)
+class FileDeletionTest(FakeStorageMixin, APITestCase):
+    user_name = "deleter"
+
+    def setUp(self):
+        super().setUp()
+        self.files = [self.make_file(f"doc_{index}.txt") for index in range(5)]
+        self.client.force_authenticate(user=self.user)
+
+    def make_file(self, name, **kwargs):
+        guid = uuid.uuid4()
+        file_instance = File.objects.create(
+            guid=guid,
+            original_name=name,
+            file=object_key(guid, name),
+            user=self.user,
+            status=FileStatus.COMPLETED,
+            **kwargs,
+        )
+        self.storage.objects[file_instance.file.name] = b"content"
+        return file_instance
+
+    def delete(self, file_instance):
+        return self.client.delete(
+            reverse("files:file-delete", kwargs={"guid": file_instance.guid})
+        )
+
+    def collect(self):
+        return DeletedFileCollector(storage_service=self.storage).run()
+
+    def test_delete_hides_file_and_frees_its_name(self):
+        target = self.files[0]
+        self.assertEqual(self.delete(target).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.delete(target).status_code, status.HTTP_404_NOT_FOUND)
+        target.refresh_from_db()
+        self.assertEqual(target.status, FileStatus.DELETED)
+        self.assertIsNotNone(target.deleted_at)
+        response = self.client.get(
+            reverse("files:file-url", kwargs={"guid": target.guid})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.make_file(target.original_name)  # no unique violation
+
+    def test_other_users_file_is_not_deleted(self):
+        other = get_user_model().objects.create_user(user_name="other", password="p")
+        self.client.force_authenticate(user=other)
+        self.assertEqual(
+            self.delete(self.files[0]).status_code, status.HTTP_404_NOT_FOUND
+        )
+
+    def test_collector_waits_for_grace_period(self):
+        File.objects.filter(pk=self.files[0].pk).update(
+            status=FileStatus.DELETED, deleted_at=timezone.now()
+        )
+        self.assertEqual(self.collect(), {"collected": 0, "failed": 0})
+        self.assertIn(self.files[0].file.name, self.storage.objects)
+
+    def test_collector_deletes_objects_then_rows(self):
+        expired = timezone.now() - timedelta(seconds=120)
+        garbage = self.files[:4]
+        preview = preview_key(garbage[0].guid)
+        self.storage.objects[preview] = b"webp"
+        File.objects.filter(pk=garbage[0].pk).update(preview_key=preview)
+        File.objects.filter(pk__in=[f.pk for f in garbage]).update(
+            status=FileStatus.DELETED, deleted_at=expired
+        )
+        with mock.patch.object(
+            self.storage, "delete_objects", wraps=self.storage.delete_objects
+        ) as delete_objects:
+            self.assertEqual(self.collect(), {"collected": 4, "failed": 0})
+        self.assertEqual(delete_objects.call_count, 2)  # one per batch of 2
+        self.assertEqual(set(self.storage.objects), {self.files[4].file.name})
+        self.assertEqual(list(File.objects.all()), [self.files[4]])
+
+    def test_failed_object_keeps_its_row(self):
+        target = self.files[0]
+        File.objects.filter(pk=target.pk).update(
+            status=FileStatus.DELETED,
+            deleted_at=timezone.now() - timedelta(seconds=120),
+        )
+        with mock.patch.object(
+            self.storage, "delete_objects", return_value=[target.file.name]
+        ):
+            self.assertEqual(self.collect(), {"collected": 0, "failed": 1})
+        self.assertTrue(File.objects.filter(pk=target.pk).exists())
+
+    def test_user_deletion_detaches_files_for_collection(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.user.delete()
+        self.assertFalse(
+            any(
+                query["sql"].startswith("SELECT") and "files_file" in query["sql"]
+                for query in queries
+            )
+        )
+        self.assertEqual(File.objects.filter(user__isnull=True).count(), 5)
+        self.assertEqual(self.collect(), {"collected": 5, "failed": 0})
+        self.assertEqual(self.storage.objects, {})
+        self.assertFalse(File.objects.exists())
+
+    def test_file_deleted_during_processing_stays_deleted(self):
+        target = self.make_file("late.txt", size=7)
+        File.objects.filter(pk=target.pk).update(status=FileStatus.PROCESSING)
+        target.refresh_from_db()
+        File.objects.filter(pk=target.pk).update(status=FileStatus.DELETED)
+        with mock.patch("files.task.S3StorageService", return_value=self.storage):
+            transfer_claimed_file(target, pipeline=Pipeline([], self.storage))
+        target.refresh_from_db()
+        self.assertEqual(target.status, FileStatus.DELETED)
+
+    def test_delete_objects_sends_batches_of_1000_keys(self):
+        client = mock.Mock()
+        client.delete_objects.side_effect = [
+            {},
+            {"Errors": [{"Key": "key-1500", "Message": "Access Denied"}]},
+        ]
+        storage_service = S3StorageService(s3_client=client)
+        keys = [f"key-{index}" for index in range(1600)]
+        self.assertEqual(storage_service.delete_objects(keys), ["key-1500"])
+        sizes = [
+            len(call.kwargs["Delete"]["Objects"])
+            for call in client.delete_objects.call_args_list
+        ]
+        self.assertEqual(sizes, [1000, 600])
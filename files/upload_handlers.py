@@ -0,0 +1,268 @@
+# files/upload_handlers.py
+import hashlib
+import io
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+
+from files.models import object_key
+from files.repositories.file_repository import FileRepository
+from files.services import compression
+from files.services.storage_service import S3StorageService
+
+logger = logging.getLogger(__name__)
+
+
+class StreamedS3File(UploadedFile):
+    """
+    Result of S3StreamingUploadHandler: the bytes are already stored under
+    `s3_key`, the key of the File with `guid`, so this object carries metadata
+    only. `s3_key` is None when the upload was drained without storing
+    because the user already has a file with that name, which is then
+    `existing`. `size` and `checksum` describe the uploaded content;
+    `stored_size` the object, which is smaller when it was stored with
+    `compression`.
+    """
+
+    def __init__(
+        self,
+        name,
+        content_type,
+        size,
+        charset,
+        guid,
+        s3_key,
+        checksum,
+        compression=None,
+        stored_size=None,
+        existing=None,
+    ):
+        super().__init__(io.BytesIO(), name, content_type, size, charset)
+        self.guid = guid
+        self.s3_key = s3_key
+        self.checksum = checksum
+        self.compression = compression
+        self.stored_size = stored_size
+        self.existing = existing
+
+
+class S3StreamingUploadHandler(FileUploadHandler):
+    """
+    Upload handler that pipes the `upload_field` files of a multipart form
+    straight into S3. Files of other fields pass on to the handlers after it.
+
+    Chunks are buffered up to STREAMING_UPLOAD_PART_SIZE and sent as parts of
+    an S3 multipart upload (a single PutObject for files smaller than one
+    part), while the size and SHA-256 are computed on the fly. With
+    FILE_COMPRESSION_ENABLED, files that are not compressed already pass
+    through a streaming zstd compressor on the way. The handler holds at
+    most one part in memory and writes nothing to local disk itself.
+
+    Limitation under ASGI, which is how this project is served: Django's
+    ASGI handler reads the whole request body before any view or upload
+    handler runs, into a SpooledTemporaryFile that moves to local disk above
+    FILE_UPLOAD_MAX_MEMORY_SIZE. So an upload larger than that is still
+    written to a temp file once, and "never touches local disk" only holds
+    under WSGI. What this handler saves under ASGI is the second copy that
+    the default handlers wrote, and re-reading it to send it to S3. The
+    README's "Uploads and local disk" covers sizing for deployment.
+    """
+
+    upload_field = "file"
+
+    def __init__(self, request=None, storage_service=None):
+        super().__init__(request)
+        self.storage_service = storage_service or S3StorageService()
+        self.part_size = settings.STREAMING_UPLOAD_PART_SIZE
+        self.streaming = False
+        self.upload_id = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.streaming = self.field_name == self.upload_field
+        if not self.streaming:
+            return
+        self.guid = uuid.uuid4()
+        self.s3_key = object_key(self.guid, self.file_name)
+        # Don't store a file the view will reject as a duplicate name; it
+        # reports the conflict once the body has been drained.
+        self.existing = self._find_existing(self.request.user, self.file_name)
+        if self.existing is not None:
+            self.s3_key = None
+        self.buffer = bytearray()
+        self.sha256 = hashlib.sha256()
+        self.compressor = None
+        if compression.should_compress(self.file_name, self.content_type):
+            self.compressor = compression.compressor()
+        self.stored_size = 0
+        self.upload_id = None
+        self.parts = []
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.streaming:
+            return raw_data
+        if self.s3_key is None:
+            return None
+        self.sha256.update(raw_data)
+        self._buffer(
+            self.compressor.compress(raw_data) if self.compressor else raw_data
+        )
+        if len(self.buffer) >= self.part_size:
+            self._flush_part()
+        return None
+
+    def file_complete(self, file_size):
+        if not self.streaming:
+            return None
+        if self.s3_key is not None:
+            if self.compressor:
+                self._buffer(self.compressor.flush())
+            if self.upload_id is None:
+                stored = self._put_object(self.s3_key, bytes(self.buffer))
+            else:
+                if self.buffer:
+                    self._flush_part()
+                stored = self.storage_service.complete_multipart_upload(
+                    self.s3_key, self.upload_id, self.parts
+                )
+            if not stored:
+                self.upload_interrupted()
+                raise IOError(f"Failed to store {self.s3_key} in S3.")
+            self.upload_id = None
+            logger.info(
+                f"Streamed {file_size} bytes to {self.s3_key} ({self.stored_size} stored)"
+            )
+
+        self.buffer = bytearray()
+        return StreamedS3File(
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            guid=self.guid,
+            s3_key=self.s3_key,
+            checksum=self.sha256.hexdigest() if self.s3_key else None,
+            compression=compression.ZSTD if self.compressor else None,
+            stored_size=self.stored_size if self.s3_key else None,
+            existing=self.existing,
+        )
+
+    def _buffer(self, data):
+        self.buffer += data
+        self.stored_size += len(data)
+
+    def _find_existing(self, user, name):
+        return FileRepository().get_user_file_by_name(user, name)
+
+    def _put_object(self, s3_key, data):
+        return self.storage_service.upload_file_or_object(
+            s3_key, file_object=io.BytesIO(data)
+        )
+
+    def upload_interrupted(self):
+        if getattr(self, "upload_id", None):
+            self.storage_service.abort_multipart_upload(self.s3_key, self.upload_id)
+            self.upload_id = None
+
+    def _flush_part(self):
+        if self.upload_id is None:
+            self.upload_id = self.storage_service.create_multipart_upload(self.s3_key)
+            if not self.upload_id:
+                raise IOError(f"Failed to start multipart upload for {self.s3_key}.")
+        part_number = len(self.parts) + 1
+        etag = self.storage_service.upload_part(
+            self.s3_key, self.upload_id, part_number, bytes(self.buffer)
+        )
+        if not etag:
+            self.upload_interrupted()
+            raise IOError(f"Failed to upload part {part_number} of {self.s3_key}.")
+        self.parts.append({"PartNumber": part_number, "ETag": etag})
+        self.buffer = bytearray()
+
+
+class S3BatchUploadHandler(S3StreamingUploadHandler):
+    """
+    S3StreamingUploadHandler for requests carrying many files.
+
+    Files smaller than one part are written by a pool of
+    FILE_BATCH_UPLOAD_WORKERS threads while parsing moves on to the next
+    part, with at most twice that many writes in flight, so a batch of small
+    files costs about one S3 round trip per worker instead of one per file.
+    There is no per-file duplicate query: keys are unique per upload, so the
+    view checks all names at once after parsing and deletes the objects of
+    the duplicates. Call wait() before using the results.
+    """
+
+    upload_field = "files"
+
+    def __init__(self, request=None, storage_service=None):
+        super().__init__(request, storage_service)
+        workers = settings.FILE_BATCH_UPLOAD_WORKERS
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(2 * workers)
+        self.writes = []
+        self.completed = []  # files large enough for a multipart upload
+
+    def _find_existing(self, user, name):
+        return None
+
+    def file_complete(self, file_size):
+        multipart = self.streaming and self.upload_id is not None
+        uploaded = super().file_complete(file_size)
+        if multipart:
+            self.completed.append(self.s3_key)
+        return uploaded
+
+    def _put_object(self, s3_key, data):
+        self.slots.acquire()
+        future = self.executor.submit(super()._put_object, s3_key, data)
+        future.add_done_callback(lambda _: self.slots.release())
+        self.writes.append((s3_key, future))
+        return True
+
+    def wait(self):
+        """
+        Wait for the pending writes and return the keys stored. If any write
+        failed, deletes the others and raises IOError.
+        """
+        stored, failed = self._settle()
+        if failed:
+            self.delete_objects(stored)
+            raise IOError(f"Failed to store {failed} files of the batch in S3.")
+        return stored
+
+    def discard(self):
+        """Delete everything this request stored, e.g. after a parse error."""
+        stored, _ = self._settle()
+        self.delete_objects(stored)
+
+    def _settle(self):
+        """
+        Wait for the pending writes and return (keys stored, writes failed).
+        A write that raised counts as failed rather than propagating, so
+        callers always get to clean up. Each write is only reported once.
+        """
+        self.executor.shutdown(wait=True)
+        stored, failed = self.completed, 0
+        for s3_key, future in self.writes:
+            try:
+                written = future.result()
+            except Exception as e:
+                logger.error(f"Storing {s3_key} in S3 failed: {e}")
+                written = False
+            if written:
+                stored.append(s3_key)
+            else:
+                failed += 1
+        self.completed, self.writes = [], []
+        return stored, failed
+
+    def delete_objects(self, keys):
+        if keys:
+            self.storage_service.delete_objects(keys)
@@ -1,11 +1,40 @@
 from django.urls import path
 
-from .views import FileListView, FileUploadView, FileUrlView
+from .views import (
+    FileBatchUploadView,
+    FileArchiveView,
+    FileDeleteView,
+    FileDownloadView,
+    FileListView,
+    FilePreviewView,
+    FileStatusStreamView,
+    FileUploadView,
+    FileUrlView,
+    ResumableUploadCreateView,
+    ResumableUploadView,
+)
 
 app_name = "files"
 urlpatterns = [
     path("upload/", FileUploadView.as_view(), name="file-upload"),
+    path("upload/batch/", FileBatchUploadView.as_view(), name="file-batch-upload"),
+    path("uploads/", ResumableUploadCreateView.as_view(), name="resumable-uploads"),
+    path(
+        "uploads/<uuid:guid>/",
+        ResumableUploadView.as_view(),
+        name="resumable-upload",
+    ),
     # path("<uuid:guid>/", FileView.as_view(), name="file-view"),
+    path("<uuid:guid>/", FileDeleteView.as_view(), name="file-delete"),
     path("<uuid:guid>/url/", FileUrlView.as_view(), name="file-url"),
+    path("<uuid:guid>/download/", FileDownloadView.as_view(), name="file-download"),
+    path("<uuid:guid>/preview/", FilePreviewView.as_view(), name="file-preview"),
     path("list/", FileListView.as_view(), name="list"),
+    path("archive/", FileArchiveView.as_view(), name="archive"),
+    path("status/stream/", FileStatusStreamView.as_view(), name="status-stream"),
+    path(
+        "<uuid:guid>/status/stream/",
+        FileStatusStreamView.as_view(),
+        name="file-status-stream",
+    ),
 ]
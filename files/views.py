@@ -1,40 +1,98 @@
+import asyncio
+import base64
+import binascii
+import mimetypes
+import os
 from venv import logger
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.http import HttpResponseRedirect
-from rest_framework import generics, permissions, status
+from django.core.exceptions import TooManyFilesSent
+from django.db import IntegrityError, transaction
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from rest_framework import permissions, status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from files.models import File
+from accounts.authentication import TokenClaimsJWTAuthentication
+from common.http_range import RangeNotSatisfiable, parse_range
+from common.pubsub import get_hub
+from common.sse import (
+    EventStreamRenderer,
+    EventStreamResponse,
+    format_event,
+    keepalive,
+    relay,
+)
+from common.views.async_api_view import AsyncAPIView, AsyncListAPIView
+from files.models import File, FileStatus
 from files.repositories.file_repository import FileRepository
-from files.serializers import FileSerializer, FileUploadSerializer
+from files.serializers import (
+    FileArchiveSerializer,
+    FileSerializer,
+    FileUploadSerializer,
+)
+from files.services import compression
+from files.services.archive_service import ZipArchiveStreamer
+from files.services.download_cache import DownloadCache
+from files.services.previews import PREVIEW_CONTENT_TYPE
+from files.services.resumable_upload_service import (
+    ResumableUploadService,
+    UploadError,
+)
+from files.services.status_events import (
+    TERMINAL_STATUSES,
+    publish_status,
+    status_channel,
+    status_payload,
+)
 from files.services.storage_service import S3StorageService
-from files.task import process_file_upload
+from files.task import process_file_batch, process_file_upload
+from files.upload_handlers import S3BatchUploadHandler, S3StreamingUploadHandler
 
 
 class FileUploadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = "upload"
 
     def __init__(self, file_repository=None, **kwargs):
         super().__init__(**kwargs)
         self.file_repository = file_repository or FileRepository()
 
     def post(self, request):
-        file_obj = request.FILES.get("file")
+        # Stream the `file` part straight to S3 instead of spooling it to a
+        # temp file; must be set before request.FILES is first read. Other
+        # file fields fall through to the default handlers.
+        request._request.upload_handlers = [
+            S3StreamingUploadHandler(request._request),
+            *request._request.upload_handlers,
+        ]
+        try:
+            file_obj = request.FILES.get("file")
+        except IOError as e:
+            logger.error(f"Streaming upload to S3 failed: {e}")
+            return Response(
+                {"error": "Failed to store the uploaded file."},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
         if not file_obj:
             return Response(
                 {"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Check if file already exists (optional, based on your logic)
-        # Note: This checks based on name and user before async processing starts.
-        # Consider if duplicates are based on content hash later if needed.
-        existing_file = self.file_repository.get_file_by_name(
-            request.user, file_obj.name
-        )
-        if existing_file:
+        # The upload handler looked the name up before storing anything.
+        existing_file = file_obj.existing
+        if existing_file and existing_file.status == FileStatus.COMPLETED:
             # Decide how to handle existing files:
             # Option 1: Return existing file info (as before)
             serializer = FileUploadSerializer(
@@ -49,30 +107,43 @@ class FileUploadView(APIView):
             #     {"error": "A file with this name already exists."},
             #     status=status.HTTP_409_CONFLICT
             # )
+        if file_obj.s3_key is None:
+            # Same name as an upload that has not completed yet.
+            return Response(
+                {"error": "A file with this name is already being uploaded."},
+                status=status.HTTP_409_CONFLICT,
+            )
 
-        # Create the File model instance
-        # The file is saved to the default storage (likely local temporary storage first)
-        # by the FileField upon model saving.
-        file_instance = File(original_name=file_obj.name, user=request.user)
-        # Assign the file object to the field before saving the model instance
-        file_instance.file = file_obj
+        # Create the File model instance. The upload handler has already
+        # stored the content in S3, so only the key is recorded here.
+        file_instance = File(
+            guid=file_obj.guid,
+            original_name=file_obj.name,
+            user=request.user,
+            size=file_obj.size,
+            checksum=file_obj.checksum,
+            compression=file_obj.compression,
+            stored_size=file_obj.stored_size,
+        )
+        file_instance.file.name = file_obj.s3_key
         # --- Optional: Set initial status ---
         # file_instance.status = FileStatus.PENDING
         # ------------------------------------
 
         try:
-            # Save the model instance. This will save the file to the location
-            # defined by `upload_to` in your File model's FileField.
-            # This path should be accessible by the Celery worker.
+            # Save the model instance; the S3 object already exists at the
+            # key recorded in `file`, which the Celery worker reads.
             self.file_repository.save_file(file_instance)  # Handles the model .save()
             logger.info(
-                f"File model instance created (PK: {file_instance.pk}) and file saved locally for: {file_obj.name}"
+                f"File model instance created (PK: {file_instance.pk}) for streamed upload: {file_obj.name}"
             )
         except Exception as e:
             # Catch potential database errors or file saving errors during initial save
             logger.exception(
                 f"Error saving initial file record for {file_obj.name}: {e}"
             )
+            # The object's key is unique to this upload; nothing else uses it.
+            S3StorageService().delete_object(file_obj.s3_key)
             return Response(
                 {"error": "Failed to initiate file upload process."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -116,8 +187,122 @@ class FileUploadView(APIView):
         )
 
 
-class FileListView(generics.ListAPIView):
+class FileBatchUploadView(APIView):
+    """
+    Upload many files (repeated `files` parts) in one request: one
+    authentication, one duplicate query, one INSERT and one Celery task for
+    the whole batch, while S3BatchUploadHandler writes the objects in
+    parallel. Names the user already has, or that repeat within the batch,
+    are skipped and reported under `duplicates`. The number of parts is
+    capped by DATA_UPLOAD_MAX_NUMBER_FILES.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = "upload"
+
+    def __init__(self, file_repository=None, **kwargs):
+        super().__init__(**kwargs)
+        self.file_repository = file_repository or FileRepository()
+
+    def post(self, request):
+        handler = S3BatchUploadHandler(request._request)
+        request._request.upload_handlers = [handler, *request._request.upload_handlers]
+        try:
+            uploads = request.FILES.getlist("files")
+            handler.wait()
+        except TooManyFilesSent:
+            handler.discard()
+            return Response(
+                {"error": "Too many files in one request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except IOError as e:
+            logger.error(f"Streaming batch upload to S3 failed: {e}")
+            handler.discard()
+            return Response(
+                {"error": "Failed to store the uploaded files."},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
+        except Exception:
+            # Don't leave objects behind that no File row points to.
+            handler.discard()
+            raise
+        if not uploads:
+            return Response(
+                {"error": "No files provided"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        taken = self.file_repository.get_existing_names(
+            request.user, {upload.name for upload in uploads}
+        )
+        accepted, duplicates = [], []
+        for upload in uploads:
+            if upload.name in taken:
+                duplicates.append(upload)
+            else:
+                taken.add(upload.name)
+                accepted.append(upload)
+        handler.delete_objects([upload.s3_key for upload in duplicates])
+
+        files = [
+            File(
+                guid=upload.guid,
+                original_name=upload.name,
+                user=request.user,
+                file=upload.s3_key,
+                size=upload.size,
+                checksum=upload.checksum,
+                compression=upload.compression,
+                stored_size=upload.stored_size,
+            )
+            for upload in accepted
+        ]
+        try:
+            with transaction.atomic():
+                files = self.file_repository.bulk_create_files(files)
+                # bulk_create sends no post_save, so announce the files here.
+                for file_instance in files:
+                    payload = status_payload(file_instance)
+                    transaction.on_commit(
+                        lambda payload=payload: publish_status(request.user.id, payload)
+                    )
+        except IntegrityError:
+            # A concurrent upload took one of the names.
+            handler.delete_objects([upload.s3_key for upload in accepted])
+            return Response(
+                {"error": "A file with one of these names already exists."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        try:
+            process_file_batch.delay([file_instance.pk for file_instance in files])
+        except Exception as e:
+            logger.exception(
+                f"Error queuing Celery task for a batch of {len(files)}: {e}"
+            )
+            return Response(
+                {
+                    "error": "Failed to queue files for processing. Please try again later."
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        return Response(
+            {
+                "message": "Files received and are being processed.",
+                "files": [
+                    {"guid": str(f.guid), "original_name": f.original_name}
+                    for f in files
+                ],
+                "duplicates": [upload.name for upload in duplicates],
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class FileListView(AsyncListAPIView):
     serializer_class = FileSerializer
+    authentication_classes = [TokenClaimsJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def __init__(self, file_repository=None, **kwargs):
@@ -128,7 +313,8 @@ class FileListView(generics.ListAPIView):
         return self.file_repository.get_user_files(self.request.user)
 
 
-class FileUrlView(APIView):
+class FileUrlView(AsyncAPIView):
+    authentication_classes = [TokenClaimsJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def __init__(self, file_repository=None, storage_service=None, **kwargs):
@@ -136,20 +322,575 @@ class FileUrlView(APIView):
         self.file_repository = file_repository or FileRepository()
         self.storage_service = storage_service or S3StorageService()
 
-    def get(self, request, guid):
-        file_instance = self.file_repository.get_file_by_guid(guid, request.user)
+    async def get(self, request, guid):
+        file_instance = await self.file_repository.aget_file_by_guid(guid, request.user)
         if not file_instance:
             return Response(
                 {"error": "File not found or you don’t have access"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        presigned_url = self.storage_service.generate_presigned_url(
-            file_instance.file.name
+        codec = file_instance.compression
+        if codec and not compression.accepts_encoding(
+            request.headers.get("Accept-Encoding", ""), codec
+        ):
+            # This client could not decode the object as stored: point it at
+            # the proxied download, which decompresses on the fly.
+            response = Response(
+                {
+                    "url": request.build_absolute_uri(
+                        reverse("files:file-download", kwargs={"guid": guid})
+                    )
+                }
+            )
+            response["Vary"] = "Accept-Encoding"
+            return response
+
+        presigned_url = await self.storage_service.agenerate_presigned_url(
+            file_instance.file.name, content_encoding=codec
         )
+        if presigned_url and codec:
+            # Decoded transparently by the client, which accepts the encoding.
+            response = Response({"url": presigned_url, "content_encoding": codec})
+            response["Vary"] = "Accept-Encoding"
+            return response
         if presigned_url:
             return Response({"url": presigned_url})
         return Response(
             {"error": "Unable to generate URL"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
+
+
+class FileDeleteView(AsyncAPIView):
+    """
+    Deletes a file. The row is only marked DELETED, which hides it at once;
+    collect_deleted_files removes its objects and the row after
+    FILE_DELETE_GRACE_SECONDS.
+    """
+
+    authentication_classes = [TokenClaimsJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def __init__(self, file_repository=None, **kwargs):
+        super().__init__(**kwargs)
+        self.file_repository = file_repository or FileRepository()
+
+    async def delete(self, request, guid):
+        if not await self.file_repository.asoft_delete_file(guid, request.user):
+            return Response(
+                {"error": "File not found or you don’t have access"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FilePreviewView(AsyncAPIView):
+    """
+    Presigned URL of a file's preview: a WebP of at most
+    FILE_PREVIEW_MAX_SIZE pixels per side, rendered for images and PDFs by
+    the post-upload pipeline. Lists can show previews without fetching the
+    originals. 404 when the file has no preview.
+    """
+
+    authentication_classes = [TokenClaimsJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def __init__(self, file_repository=None, storage_service=None, **kwargs):
+        super().__init__(**kwargs)
+        self.file_repository = file_repository or FileRepository()
+        self.storage_service = storage_service or S3StorageService()
+
+    async def get(self, request, guid):
+        file_instance = await self.file_repository.aget_file_by_guid(guid, request.user)
+        if not file_instance:
+            return Response(
+                {"error": "File not found or you don’t have access"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if not file_instance.preview_key:
+            return Response(
+                {"error": "No preview for this file"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        presigned_url = await self.storage_service.agenerate_presigned_url(
+            file_instance.preview_key, content_type=PREVIEW_CONTENT_TYPE
+        )
+        if presigned_url:
+            return Response({"url": presigned_url})
+        return Response(
+            {"error": "Unable to generate URL"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+async def _stream_file(handle, start, length):
+    try:
+        await sync_to_async(handle.seek, thread_sensitive=False)(start)
+        while length > 0:
+            chunk = await sync_to_async(handle.read, thread_sensitive=False)(
+                min(DOWNLOAD_CHUNK_SIZE, length)
+            )
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+async def _stream_object(body, cache_writer=None):
+    # Tees the object into the download cache; the entry only appears once
+    # the whole body has been read.
+    complete = False
+    try:
+        while chunk := await sync_to_async(body.read, thread_sensitive=False)(
+            DOWNLOAD_CHUNK_SIZE
+        ):
+            if cache_writer:
+                await sync_to_async(cache_writer.write, thread_sensitive=False)(chunk)
+            yield chunk
+        complete = True
+    finally:
+        body.close()
+        if cache_writer:
+            finish = cache_writer.commit if complete else cache_writer.discard
+            await sync_to_async(finish, thread_sensitive=False)()
+
+
+async def _decompress(chunks, codec):
+    decompressor = compression.decompressor(codec)
+    try:
+        async for chunk in chunks:
+            for output in compression.decompress_chunk(decompressor, chunk):
+                yield output
+    finally:
+        await chunks.aclose()
+
+
+class FileDownloadView(AsyncAPIView):
+    """
+    Proxied download of a completed file, for consumers that would rather
+    not follow a presigned URL. Supports single byte ranges (`Range`,
+    `If-Range`) and `If-None-Match`; the ETag is the file's GUID because
+    its content never changes.
+
+    Bodies are streamed through async iterators (Django would buffer a sync
+    one in full under ASGI). With FILE_DOWNLOAD_CACHE_DIR set, full reads of
+    objects up to FILE_DOWNLOAD_CACHE_MAX_OBJECT_SIZE are kept in a local
+    LRU cache, and later requests are served from disk: by nginx through
+    X-Accel-Redirect when FILE_DOWNLOAD_ACCEL_REDIRECT names the internal
+    location aliasing the cache directory, by this view otherwise.
+
+    Compressed files are sent as stored, with `Content-Encoding`, to clients
+    whose Accept-Encoding allows the codec, and decompressed on the fly for
+    the others; their ETag depends on the encoding and Range is ignored.
+    """
+
+    authentication_classes = [TokenClaimsJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def __init__(self, file_repository=None, storage_service=None, **kwargs):
+        super().__init__(**kwargs)
+        self.file_repository = file_repository or FileRepository()
+        self.storage_service = storage_service or S3StorageService()
+
+    async def get(self, request, guid):
+        file_instance = await self.file_repository.aget_file_by_guid(guid, request.user)
+        if not file_instance:
+            return Response(
+                {"error": "File not found or you don’t have access"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        # Compressed files go out as stored to clients accepting the codec
+        # and are decompressed here for the others. Byte ranges would refer
+        # to positions nobody can map, so compressed files ignore Range.
+        codec = file_instance.compression
+        encoded = bool(codec) and compression.accepts_encoding(
+            request.headers.get("Accept-Encoding", ""), codec
+        )
+        decode = bool(codec) and not encoded
+        etag = (
+            f'"{file_instance.guid}-{codec}"' if encoded else f'"{file_instance.guid}"'
+        )
+        if_none_match = request.headers.get("If-None-Match", "")
+        if if_none_match == "*" or etag in if_none_match:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        s3_key = file_instance.file.name
+        cache = DownloadCache.from_settings()
+        cached = cache and await sync_to_async(cache.open, thread_sensitive=False)(
+            s3_key
+        )
+        if cached:
+            size = os.fstat(cached.fileno()).st_size
+        elif codec:
+            size = file_instance.stored_size
+        elif file_instance.size is not None:
+            size = file_instance.size
+        else:
+            # Network I/O: off the shared thread that serialises sync_to_async
+            # calls, like the other S3 and cache calls here.
+            head = await sync_to_async(
+                self.storage_service.head_object, thread_sensitive=False
+            )(s3_key)
+            if head is None:
+                return Response(
+                    {"error": "Unable to read the file"},
+                    status=status.HTTP_502_BAD_GATEWAY,
+                )
+            size = head["ContentLength"]
+
+        byte_range = None
+        if not codec and request.headers.get("If-Range", etag) == etag:
+            try:
+                byte_range = parse_range(request.headers.get("Range"), size)
+            except RangeNotSatisfiable:
+                if cached:
+                    cached.close()
+                response = HttpResponse(
+                    status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+                )
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+        start, end = byte_range or (0, size - 1)
+
+        if cached and settings.FILE_DOWNLOAD_ACCEL_REDIRECT and not codec:
+            cached.close()
+            # nginx serves the file (with sendfile) and applies the Range
+            # header itself.
+            response = HttpResponse()
+            response["X-Accel-Redirect"] = (
+                settings.FILE_DOWNLOAD_ACCEL_REDIRECT.rstrip("/")
+                + "/"
+                + cache.relative_path(s3_key)
+            )
+        else:
+            if cached:
+                body = _stream_file(cached, start, end - start + 1)
+            else:
+                s3_object = await sync_to_async(
+                    self.storage_service.get_object, thread_sensitive=False
+                )(s3_key, byte_range)
+                if s3_object is None:
+                    return Response(
+                        {"error": "Unable to read the file"},
+                        status=status.HTTP_502_BAD_GATEWAY,
+                    )
+                cache_writer = None
+                if cache and byte_range is None and cache.admits(size):
+                    cache_writer = await sync_to_async(
+                        cache.writer, thread_sensitive=False
+                    )(s3_key)
+                body = _stream_object(s3_object["Body"], cache_writer)
+            if decode:
+                body = _decompress(body, codec)
+            response = StreamingHttpResponse(body)
+            response["Content-Length"] = (
+                file_instance.size if decode else end - start + 1
+            )
+            if byte_range:
+                response.status_code = status.HTTP_206_PARTIAL_CONTENT
+                response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        content_type = file_instance.content_type
+        if not content_type:
+            content_type, _ = mimetypes.guess_type(file_instance.original_name)
+        response["Content-Type"] = content_type or "application/octet-stream"
+        response["Content-Disposition"] = content_disposition_header(
+            True, file_instance.original_name
+        )
+        if encoded:
+            response["Content-Encoding"] = codec
+        if codec:
+            response["Accept-Ranges"] = "none"
+            response["Vary"] = "Accept-Encoding"
+        else:
+            response["Accept-Ranges"] = "bytes"
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, max-age=3600"
+        return response
+
+
+class FileArchiveView(AsyncAPIView):
+    """
+    Streams one ZIP of several completed files, so clients need a single
+    request instead of a URL and a download per file. The body selects the
+    files by `guids` and/or a filter (`name_contains`, `uploaded_after`,
+    `uploaded_before`); an empty body archives all of the user's files, up
+    to FILE_ARCHIVE_MAX_FILES. See ZipArchiveStreamer for how the archive is
+    built.
+    """
+
+    authentication_classes = [TokenClaimsJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = "archive"
+
+    def __init__(self, file_repository=None, storage_service=None, **kwargs):
+        super().__init__(**kwargs)
+        self.file_repository = file_repository or FileRepository()
+        self.storage_service = storage_service or S3StorageService()
+
+    async def post(self, request):
+        serializer = FileArchiveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        limit = settings.FILE_ARCHIVE_MAX_FILES
+        files = await self.file_repository.aget_archive_files(
+            request.user, limit, **serializer.validated_data
+        )
+        guids = serializer.validated_data.get("guids")
+        if guids:
+            found = {f.guid for f in files}
+            missing = [guid for guid in guids if guid not in found]
+            if missing:
+                # Never send a partial archive of an explicit selection.
+                return Response(
+                    {"error": "Files not found", "missing": missing},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+        if not files:
+            return Response(
+                {"error": "No files matched"}, status=status.HTTP_404_NOT_FOUND
+            )
+        if len(files) > limit:
+            return Response(
+                {"error": f"At most {limit} files per archive."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Entry headers need each size up front; older files may not have one.
+        unsized = [f for f in files if f.size is None]
+        heads = await asyncio.gather(
+            *(
+                sync_to_async(self.storage_service.head_object, thread_sensitive=False)(
+                    f.file.name
+                )
+                for f in unsized
+            )
+        )
+        if any(head is None for head in heads):
+            return Response(
+                {"error": "Unable to read the files"},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
+        sizes = {f.pk: head["ContentLength"] for f, head in zip(unsized, heads)}
+        entries = [(f, sizes.get(f.pk, f.size)) for f in files]
+
+        response = StreamingHttpResponse(
+            ZipArchiveStreamer(self.storage_service).stream(entries),
+            content_type="application/zip",
+        )
+        response["Content-Disposition"] = content_disposition_header(
+            True, f"files-{timezone.now():%Y%m%d-%H%M%S}.zip"
+        )
+        response["Cache-Control"] = "no-store"
+        # Stop nginx from buffering the archive.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class FileStatusStreamView(AsyncAPIView):
+    """
+    Server-Sent Events stream of upload status transitions, replacing client
+    polling. With a guid it follows one file and closes once the file is
+    COMPLETED or FAILED; without one it follows all of the user's uploads.
+
+    The stream first sends the current state read from the database, then
+    relays the events published by files.signals. When it times out clients
+    reconnect and get the current state again. Serve it through ASGI: each
+    open stream is one coroutine there.
+    """
+
+    authentication_classes = [TokenClaimsJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def __init__(self, file_repository=None, **kwargs):
+        super().__init__(**kwargs)
+        self.file_repository = file_repository or FileRepository()
+
+    async def get(self, request, guid=None):
+        if guid is not None:
+            file_instance = await self.file_repository.aget_tracked_file(
+                guid, request.user
+            )
+            if not file_instance:
+                return Response(
+                    {"error": "File not found or you don’t have access"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+        return EventStreamResponse(self.events(request.user, guid))
+
+    async def events(self, user, guid):
+        # Subscribe before reading the current state so that a transition
+        # committed in between is not lost.
+        async with get_hub().subscribe(status_channel(user.id)) as subscription:
+            if guid is not None:
+                file_instance = await self.file_repository.aget_tracked_file(guid, user)
+                current = [file_instance] if file_instance else []
+            else:
+                current = await self.file_repository.aget_in_progress_files(user)
+            for file_instance in current:
+                yield format_event(status_payload(file_instance), event="status")
+                if guid is not None and file_instance.status in TERMINAL_STATUSES:
+                    return
+
+            async for item in relay(subscription):
+                if item is None:
+                    yield keepalive()
+                    continue
+                _, payload = item
+                if guid is not None and payload["guid"] != str(guid):
+                    continue
+                yield format_event(payload, event="status")
+                if guid is not None and payload["status"] in TERMINAL_STATUSES:
+                    return
+
+
+TUS_VERSION = "1.0.0"
+
+
+def parse_upload_metadata(header):
+    """
+    Decode a tus Upload-Metadata header: "key base64value,key base64value".
+    """
+    metadata = {}
+    for pair in filter(None, (item.strip() for item in header.split(","))):
+        key, _, value = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            raise UploadError(f"Invalid Upload-Metadata value for {key!r}.")
+    return metadata
+
+
+class TusMixin:
+    throttle_scope = "upload"
+    permission_classes = [permissions.IsAuthenticated]
+
+    def __init__(self, upload_service=None, **kwargs):
+        super().__init__(**kwargs)
+        self.upload_service = upload_service or ResumableUploadService(
+            process=process_file_upload.delay
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        response["Tus-Resumable"] = TUS_VERSION
+        return response
+
+    @staticmethod
+    def error_response(error):
+        return Response({"error": error.message}, status=error.status_code)
+
+    @staticmethod
+    def int_header(request, name):
+        try:
+            value = int(request.headers[name])
+        except (KeyError, ValueError):
+            raise UploadError(f"A valid {name} header is required.")
+        if value < 0:
+            raise UploadError(f"A valid {name} header is required.")
+        return value
+
+
+class ResumableUploadCreateView(TusMixin, APIView):
+    """
+    tus-style creation endpoint. POST with `Upload-Length` and an
+    `Upload-Metadata` header carrying the base64 `filename`; the response's
+    Location is the upload URL for HEAD/PATCH/DELETE. Creating an upload
+    for a file that is still being uploaded returns that upload instead.
+    """
+
+    def options(self, request, *args, **kwargs):
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        response["Tus-Version"] = TUS_VERSION
+        response["Tus-Extension"] = "creation,termination"
+        response["Tus-Max-Size"] = str(settings.RESUMABLE_UPLOAD_MAX_SIZE)
+        return response
+
+    def post(self, request):
+        try:
+            length = self.int_header(request, "Upload-Length")
+            metadata = parse_upload_metadata(request.headers.get("Upload-Metadata", ""))
+            if not metadata.get("filename"):
+                raise UploadError("Upload-Metadata must include a filename.")
+            file_instance, created = self.upload_service.create(
+                request.user, metadata["filename"], length
+            )
+        except UploadError as e:
+            return self.error_response(e)
+
+        response = Response(
+            {"file": FileUploadSerializer(file_instance).data},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+        response["Location"] = request.build_absolute_uri(
+            reverse("files:resumable-upload", kwargs={"guid": file_instance.guid})
+        )
+        response["Upload-Offset"] = str(file_instance.upload_offset)
+        return response
+
+
+class ResumableUploadView(TusMixin, APIView):
+    """
+    HEAD reports the acknowledged `Upload-Offset`; PATCH appends the chunk
+    at that offset (Content-Type application/offset+octet-stream); DELETE
+    abandons the upload and its stored parts.
+    """
+
+    def get_upload(self, request, guid):
+        file_instance = self.upload_service.file_repository.get_upload(
+            guid, request.user
+        )
+        if not file_instance:
+            raise UploadError(
+                "Upload not found or you don’t have access",
+                status.HTTP_404_NOT_FOUND,
+            )
+        return file_instance
+
+    def head(self, request, guid):
+        try:
+            file_instance = self.get_upload(request, guid)
+        except UploadError as e:
+            return Response(status=e.status_code)
+        response = Response(status=status.HTTP_200_OK)
+        response["Upload-Offset"] = str(file_instance.upload_offset)
+        response["Upload-Length"] = str(file_instance.size)
+        response["Cache-Control"] = "no-store"
+        return response
+
+    def patch(self, request, guid):
+        if request.content_type != "application/offset+octet-stream":
+            return Response(
+                {"error": "Content-Type must be application/offset+octet-stream."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            file_instance = self.get_upload(request, guid)
+            file_instance = self.upload_service.append(
+                file_instance,
+                self.int_header(request, "Upload-Offset"),
+                request.stream,
+                self.int_header(request, "Content-Length"),
+            )
+        except UploadError as e:
+            return self.error_response(e)
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        response["Upload-Offset"] = str(file_instance.upload_offset)
+        return response
+
+    def delete(self, request, guid):
+        try:
+            self.upload_service.terminate(self.get_upload(request, guid))
+        except UploadError as e:
+            return self.error_response(e)
+        return Response(status=status.HTTP_204_NO_CONTENT)
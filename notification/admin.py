@@ -1,3 +1,9 @@
 from django.contrib import admin
 
-# Register your models here.
+from notification.models import NotificationInbox
+
+
+@admin.register(NotificationInbox)
+class NotificationInboxAdmin(admin.ModelAdmin):
+    list_display = ["recipient", "unread_count", "last_notification_id", "updated_at"]
+    search_fields = ["recipient"]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:00
+
+from django.db import migrations, models
+
+
+def mark_existing_read(apps, schema_editor):
+    # Notifications sent before read tracking existed start out read, so
+    # badges begin at zero instead of counting a user's whole history.
+    Notification = apps.get_model("notification", "Notification")
+    Notification.objects.update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notification", "0003_alter_notification_recipient"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationInbox",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("recipient", models.CharField(max_length=255, unique=True)),
+                ("unread_count", models.PositiveIntegerField(default=0)),
+                ("last_notification_id", models.BigIntegerField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Notification inbox",
+                "verbose_name_plural": "Notification inboxes",
+            },
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="is_read",
+            field=models.BooleanField(
+                default=False,
+                help_text="Whether the recipient has read the notification",
+            ),
+        ),
+        migrations.RunPython(mark_existing_read, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["recipient", "notification_type", "is_read"],
+                name="notification_unread_idx",
+            ),
+        ),
+    ]
@@ -25,6 +25,9 @@ class Notification(models.Model):
     status = models.BooleanField(
         default=False, help_text="Delivery status: True if sent successfully"
     )
+    is_read = models.BooleanField(
+        default=False, help_text="Whether the recipient has read the notification"
+    )
 
     def __str__(self):
         return f"{self.get_notification_type_display()} to {self.recipient} at {self.sent_at}"
@@ -33,3 +36,28 @@ class Notification(models.Model):
         ordering = ["-sent_at"]
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
+        indexes = [
+            models.Index(
+                fields=["recipient", "notification_type", "is_read"],
+                name="notification_unread_idx",
+            ),
+        ]
+
+
+class NotificationInbox(models.Model):
+    """
+    Per-recipient summary of in-app notifications, maintained incrementally
+    so the unread badge never has to count rows in Notification.
+    """
+
+    recipient = models.CharField(max_length=255, unique=True)
+    unread_count = models.PositiveIntegerField(default=0)
+    last_notification_id = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.recipient}: {self.unread_count} unread"
+
+    class Meta:
+        verbose_name = "Notification inbox"
+        verbose_name_plural = "Notification inboxes"
@@ -19,4 +19,20 @@ class NotificationSerializer(serializers.ModelSerializer):
             "notification_type",
             "sent_at",
             "status",
+            "is_read",
         ]
+
+
+class MarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000,
+        required=False,
+    )
+    all = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs["all"] == ("ids" in attrs):
+            raise serializers.ValidationError("Provide either 'ids' or 'all': true.")
+        return attrs
@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
 from typing import Dict, List
 
-from notification.models import Notification
+from django.db import transaction
+
+from notification.models import Notification, NotificationType
+from notification.services.realtime import publish_notification
+from notification.services.unread_counter import unread_counter
 
 
 class NotificationService(ABC):
@@ -28,12 +32,16 @@ class NotificationService(ABC):
             raise ValueError("NOTIFICATION_TYPE must be defined in the subclass.")
 
         success = self._send(recipient, message)
-        Notification.objects.create(
-            recipient=recipient,
-            message=message,
-            notification_type=self.NOTIFICATION_TYPE,
-            status=success,
-        )
+        with transaction.atomic():
+            notification = Notification.objects.create(
+                recipient=recipient,
+                message=message,
+                notification_type=self.NOTIFICATION_TYPE,
+                status=success,
+            )
+            if self.NOTIFICATION_TYPE == NotificationType.PUSH:
+                unread_counter.notification_created(notification)
+                publish_notification(notification)
 
     @abstractmethod
     def list_notifications(self) -> List[Dict[str, str]]:
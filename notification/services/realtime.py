@@ -0,0 +1,19 @@
+from django.db import transaction
+
+from common.pubsub import publish
+from notification.serializers import NotificationSerializer
+
+
+def notification_channel(recipient):
+    return f"notifications:{recipient}"
+
+
+def publish_notification(notification):
+    """
+    Push an in-app notification to the recipient's open streams once the row
+    is committed, so a reconnecting client's catch-up query can see it too.
+    """
+    payload = NotificationSerializer(notification).data
+    transaction.on_commit(
+        lambda: publish(notification_channel(notification.recipient), payload)
+    )
@@ -0,0 +1,172 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from notification.models import Notification, NotificationInbox, NotificationType
+
+logger = logging.getLogger(__name__)
+
+# Increments a cached count only if it exists, in one atomic step. A missing
+# count is loaded from the summary row by the next read with SET NX; an INCR
+# that created it would store a partial value (1) that the SET NX then keeps,
+# and a separate EXISTS check could race with the key expiring or the load.
+#
+# KEYS[1]  counter key
+# Returns the new count, or nil if the key was missing.
+INCR_IF_CACHED_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCR', KEYS[1])
+end
+return false
+"""
+
+
+class UnreadCounter:
+    """
+    Unread in-app notification counts per recipient.
+
+    The source of truth is the NotificationInbox summary row, updated in the
+    same transaction as the notifications themselves. Redis holds a copy so
+    that badge reads cost no query at all: new notifications INCR it, and
+    marking notifications read overwrites it with the value committed to the
+    summary table. A missing or unreachable key falls back to the summary
+    row, never to a COUNT(*) over Notification.
+    """
+
+    _script = None
+
+    @staticmethod
+    def _key(recipient):
+        return f"notifications:unread:{recipient}"
+
+    def notification_created(self, notification):
+        """
+        Count a new push notification. Must run inside the transaction that
+        created it.
+        """
+        updated = NotificationInbox.objects.filter(
+            recipient=notification.recipient
+        ).update(
+            unread_count=F("unread_count") + 1,
+            last_notification_id=notification.id,
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    NotificationInbox.objects.create(
+                        recipient=notification.recipient,
+                        unread_count=1,
+                        last_notification_id=notification.id,
+                    )
+            except IntegrityError:
+                # Another notification created the row concurrently.
+                NotificationInbox.objects.filter(
+                    recipient=notification.recipient
+                ).update(
+                    unread_count=F("unread_count") + 1,
+                    last_notification_id=notification.id,
+                )
+        transaction.on_commit(lambda: self._incr(notification.recipient))
+
+    def mark_read(self, recipient, ids=None):
+        """
+        Mark the recipient's unread push notifications as read: only `ids`
+        if given, otherwise all of them. Returns (marked, unread).
+        """
+        unread = Notification.objects.filter(
+            recipient=recipient,
+            notification_type=NotificationType.PUSH,
+            is_read=False,
+        )
+        if ids is not None:
+            unread = unread.filter(id__in=ids)
+
+        with transaction.atomic():
+            marked = unread.update(is_read=True)
+            if marked:
+                NotificationInbox.objects.filter(recipient=recipient).update(
+                    unread_count=Greatest(F("unread_count") - marked, 0)
+                )
+            count = self._read_summary(recipient)
+            transaction.on_commit(lambda: self._store(recipient, count))
+        return marked, count
+
+    async def aget(self, recipient):
+        try:
+            count = await cache.aget(self._key(recipient))
+        except Exception as e:
+            logger.warning(f"Unread counter cache unavailable: {e}")
+            count = None
+        if count is not None:
+            return count
+
+        row = (
+            await NotificationInbox.objects.filter(recipient=recipient)
+            .values_list("unread_count", flat=True)
+            .afirst()
+        )
+        count = row or 0
+        # add(), not set(): never overwrite a value a concurrent INCR or
+        # mark_read() stored after our read.
+        try:
+            await cache.aadd(
+                self._key(recipient), count, settings.NOTIFICATION_UNREAD_CACHE_TTL
+            )
+        except Exception as e:
+            logger.warning(f"Could not cache unread count for {recipient}: {e}")
+        return count
+
+    @staticmethod
+    def _read_summary(recipient):
+        return (
+            NotificationInbox.objects.filter(recipient=recipient)
+            .values_list("unread_count", flat=True)
+            .first()
+        ) or 0
+
+    @staticmethod
+    def _get_script():
+        if UnreadCounter._script is None:
+            from django_redis import get_redis_connection
+
+            UnreadCounter._script = get_redis_connection("default").register_script(
+                INCR_IF_CACHED_LUA
+            )
+        return UnreadCounter._script
+
+    def _incr(self, recipient):
+        key = self._key(recipient)
+        try:
+            try:
+                self._get_script()(keys=[cache.make_key(key)])
+            except NotImplementedError:
+                # Not django-redis (e.g. in tests): the cache API's incr also
+                # leaves a missing key alone, without the atomicity.
+                cache.incr(key)
+        except ValueError:
+            pass  # not cached; the next read loads it from the summary row
+        except Exception as e:
+            logger.warning(f"Could not increment unread count for {recipient}: {e}")
+            self._forget(recipient)
+
+    def _store(self, recipient, count):
+        try:
+            cache.set(
+                self._key(recipient), count, settings.NOTIFICATION_UNREAD_CACHE_TTL
+            )
+        except Exception as e:
+            logger.warning(f"Could not store unread count for {recipient}: {e}")
+            self._forget(recipient)
+
+    def _forget(self, recipient):
+        try:
+            cache.delete(self._key(recipient))
+        except Exception:
+            pass
+
+
+unread_counter = UnreadCounter()
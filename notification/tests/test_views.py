@@ -1,12 +1,23 @@
+import asyncio
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
-from notification.models import Notification, NotificationType
+from accounts.services.jwt_service_impl import JWTServiceImpl
+from common.db.testing import QueryBudgetMixin
+from common.pubsub import get_hub, publish
+from notification.models import Notification, NotificationInbox, NotificationType
+from notification.services.dev_service import DevNotificationService
+from notification.services.realtime import notification_channel
+from notification.services.unread_counter import UnreadCounter, unread_counter
 
 
-class PushNotificationListViewTest(APITestCase):
+class PushNotificationListViewTest(QueryBudgetMixin, APITestCase):
     def setUp(self):
         # Create a test user with a user_name field.
         User = get_user_model()
@@ -79,3 +90,234 @@ class PushNotificationListViewTest(APITestCase):
         self.assertIn("count", response.data)
         self.assertIn("next", response.data)
         self.assertIn("previous", response.data)
+
+    def test_list_notifications_query_budget(self):
+        """
+        Pin the endpoint to one COUNT(*) for pagination plus one page SELECT.
+        """
+        self.client.force_authenticate(user=self.user)
+        with self.assertMaxQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(SSE_STREAM_TIMEOUT=5, SSE_KEEPALIVE_INTERVAL=1)
+class PushNotificationStreamViewTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            user_name="5550001111", password="testpass", is_approved=True
+        )
+        self.notifications = [
+            Notification.objects.create(
+                recipient="5550001111",
+                message=f"Push message {index}",
+                notification_type=NotificationType.PUSH,
+                status=True,
+            )
+            for index in range(3)
+        ]
+        access = JWTServiceImpl().generate_token(self.user)["access"]
+        self.headers = {
+            "Authorization": f"Bearer {access}",
+            "Accept": "text/event-stream",
+        }
+        self.url = reverse("notification:in_app_notifications_stream")
+
+    def serve(self, response):
+        """
+        Consume the stream in a task the way the ASGI handler does; the frames
+        arrive on the returned queue.
+        """
+        frames = asyncio.Queue()
+
+        async def send():
+            async for frame in response:
+                await frames.put(frame)
+
+        return frames, asyncio.create_task(send())
+
+    async def disconnect(self, task):
+        # The ASGI handler cancels the response task when the client goes.
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def test_reconnect_replays_missed_notifications_then_goes_live(self):
+        first, second, third = self.notifications
+        headers = dict(self.headers, **{"Last-Event-ID": str(first.id)})
+        response = await self.async_client.get(self.url, headers=headers)
+        frames, task = self.serve(response)
+        await frames.get()  # retry hint
+        self.assertIn(f"id: {second.id}".encode(), await frames.get())
+        self.assertIn(f"id: {third.id}".encode(), await frames.get())
+
+        channel = notification_channel("5550001111")
+        # Already replayed: dropped as a duplicate.
+        publish(channel, {"id": third.id, "message": "Push message 2"})
+        publish(channel, {"id": third.id + 1, "message": "Live"})
+        event = await frames.get()
+        self.assertIn(f"id: {third.id + 1}".encode(), event)
+        self.assertIn(b'"message": "Live"', event)
+        await self.disconnect(task)
+
+    async def test_live_notification_committed_out_of_order_is_sent(self):
+        first, second, third = self.notifications
+        headers = dict(self.headers, **{"Last-Event-ID": str(second.id)})
+        response = await self.async_client.get(self.url, headers=headers)
+        frames, task = self.serve(response)
+        await frames.get()
+        self.assertIn(f"id: {third.id}".encode(), await frames.get())
+
+        # An id below the last replayed one that the catch-up did not see,
+        # e.g. from a transaction that committed late.
+        publish(
+            notification_channel("5550001111"), {"id": second.id, "message": "Late"}
+        )
+        event = await frames.get()
+        self.assertIn(f"id: {second.id}".encode(), event)
+        self.assertIn(b'"message": "Late"', event)
+        await self.disconnect(task)
+
+    @override_settings(SSE_CATCH_UP_LIMIT=1)
+    async def test_catch_up_is_capped_to_the_newest(self):
+        first, second, third = self.notifications
+        headers = dict(self.headers, **{"Last-Event-ID": str(first.id)})
+        response = await self.async_client.get(self.url, headers=headers)
+        frames, task = self.serve(response)
+        await frames.get()
+        self.assertIn(f"id: {third.id}".encode(), await frames.get())
+        self.assertEqual(await frames.get(), b": keepalive\n\n")
+        await self.disconnect(task)
+
+    async def test_without_since_only_live_notifications_are_sent(self):
+        response = await self.async_client.get(self.url, headers=self.headers)
+        frames, task = self.serve(response)
+        await frames.get()
+        self.assertEqual(await frames.get(), b": keepalive\n\n")
+        await self.disconnect(task)
+
+    async def test_disconnect_leaves_the_subscription(self):
+        response = await self.async_client.get(self.url, headers=self.headers)
+        frames, task = self.serve(response)
+        await frames.get()
+        channel = notification_channel("5550001111")
+        self.assertIn(channel, get_hub()._subscribers)
+        await self.disconnect(task)
+        self.assertNotIn(channel, get_hub()._subscribers)
+
+    async def test_invalid_since_is_rejected(self):
+        response = await self.async_client.get(
+            self.url, {"since": "latest"}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PublishOnSendTest(TestCase):
+    def test_push_notification_is_published_on_commit(self):
+        service = DevNotificationService()
+        service.NOTIFICATION_TYPE = NotificationType.PUSH
+        with mock.patch("notification.services.realtime.publish") as publish_mock:
+            with mock.patch("builtins.print"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    service.send_notification("5550001111", "Hello")
+        channel, payload = publish_mock.call_args.args
+        self.assertEqual(channel, notification_channel("5550001111"))
+        self.assertEqual(payload["message"], "Hello")
+        self.assertEqual(payload["id"], Notification.objects.get().id)
+
+    def test_other_types_are_not_published(self):
+        with mock.patch("notification.services.realtime.publish") as publish_mock:
+            with mock.patch("builtins.print"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    DevNotificationService().send_notification("dev", "Hi")
+        publish_mock.assert_not_called()
+
+
+class UnreadCounterViewsTest(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            user_name="5552223333", password="testpass", is_approved=True
+        )
+        service = DevNotificationService()
+        service.NOTIFICATION_TYPE = NotificationType.PUSH
+        with mock.patch("builtins.print"):
+            with self.captureOnCommitCallbacks(execute=True):
+                for index in range(3):
+                    service.send_notification("5552223333", f"Push {index}")
+        access = JWTServiceImpl().generate_token(self.user)["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.count_url = reverse("notification:in_app_unread_count")
+        self.mark_url = reverse("notification:in_app_mark_read")
+
+    def test_summary_row_tracks_sent_notifications(self):
+        inbox = NotificationInbox.objects.get(recipient="5552223333")
+        self.assertEqual(inbox.unread_count, 3)
+        self.assertEqual(inbox.last_notification_id, Notification.objects.first().id)
+
+    def test_badge_read_is_served_without_queries_once_cached(self):
+        with self.assertMaxQueries(1):  # summary row on the first miss
+            response = self.client.get(self.count_url)
+        self.assertEqual(response.data, {"unread": 3})
+        with self.assertMaxQueries(0):
+            response = self.client.get(self.count_url)
+        self.assertEqual(response.data, {"unread": 3})
+
+    def send(self, count=1):
+        service = DevNotificationService()
+        service.NOTIFICATION_TYPE = NotificationType.PUSH
+        with mock.patch("builtins.print"):
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(count):
+                    service.send_notification("5552223333", "Push")
+
+    def test_new_notification_increments_the_cached_count(self):
+        self.client.get(self.count_url)  # warm the cache
+        self.send()
+        with self.assertMaxQueries(0):
+            self.assertEqual(self.client.get(self.count_url).data, {"unread": 4})
+
+    def test_new_notification_does_not_create_a_missing_count(self):
+        self.send()
+        self.assertIsNone(cache.get(unread_counter._key("5552223333")))
+        self.assertEqual(self.client.get(self.count_url).data, {"unread": 4})
+
+    def test_increment_runs_as_one_redis_script(self):
+        script = mock.Mock()
+        with mock.patch.object(UnreadCounter, "_get_script", return_value=script):
+            self.send()
+        script.assert_called_once_with(
+            keys=[cache.make_key(unread_counter._key("5552223333"))]
+        )
+
+    def test_mark_selected_ids_read(self):
+        self.client.get(self.count_url)  # warm the cache
+        first, second = Notification.objects.order_by("id")[:2]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.mark_url, {"ids": [first.id, second.id, 999999]}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"marked": 2, "unread": 1})
+        self.assertEqual(self.client.get(self.count_url).data, {"unread": 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.mark_url, {"all": True}, format="json")
+        self.assertEqual(response.data, {"marked": 1, "unread": 0})
+
+    def test_other_users_notifications_are_untouched(self):
+        other = Notification.objects.create(
+            recipient="someone-else",
+            message="Not yours",
+            notification_type=NotificationType.PUSH,
+        )
+        response = self.client.post(self.mark_url, {"ids": [other.id]}, format="json")
+        self.assertEqual(response.data, {"marked": 0, "unread": 3})
+        other.refresh_from_db()
+        self.assertFalse(other.is_read)
+
+    def test_ids_or_all_is_required(self):
+        response = self.client.post(self.mark_url, {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
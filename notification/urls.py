@@ -1,9 +1,29 @@
 from django.urls import path
 
-from notification.views import PushNotificationListView
+from notification.views import (
+    MarkNotificationsReadView,
+    PushNotificationListView,
+    PushNotificationStreamView,
+    UnreadNotificationCountView,
+)
 
 app_name = "notification"
 
 urlpatterns = [
     path("in-app/", PushNotificationListView.as_view(), name="in_app_notifications"),
+    path(
+        "in-app/stream/",
+        PushNotificationStreamView.as_view(),
+        name="in_app_notifications_stream",
+    ),
+    path(
+        "in-app/unread-count/",
+        UnreadNotificationCountView.as_view(),
+        name="in_app_unread_count",
+    ),
+    path(
+        "in-app/mark-read/",
+        MarkNotificationsReadView.as_view(),
+        name="in_app_mark_read",
+    ),
 ]
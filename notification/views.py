@@ -1,10 +1,27 @@
-from rest_framework import generics, pagination, permissions
+from django.conf import settings
+from rest_framework import permissions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from accounts.authentication import TokenClaimsJWTAuthentication
+from common.pagination import AsyncPageNumberPagination
+from common.pubsub import get_hub
+from common.sse import (
+    EventStreamRenderer,
+    EventStreamResponse,
+    format_event,
+    keepalive,
+    relay,
+)
+from common.views.async_api_view import AsyncAPIView, AsyncListAPIView
 from notification.models import Notification, NotificationType
-from notification.serializers import NotificationSerializer
+from notification.serializers import MarkReadSerializer, NotificationSerializer
+from notification.services.realtime import notification_channel
+from notification.services.unread_counter import unread_counter
 
 
-class NotificationPagination(pagination.PageNumberPagination):
+class NotificationPagination(AsyncPageNumberPagination):
     """
     Custom pagination class for notifications.
     """
@@ -14,7 +31,7 @@ class NotificationPagination(pagination.PageNumberPagination):
     max_page_size = 50
 
 
-class PushNotificationListView(generics.ListAPIView):
+class PushNotificationListView(AsyncListAPIView):
     """
     API endpoint for listing paginated in-app (push) notifications for the authenticated user.
 
@@ -24,6 +41,7 @@ class PushNotificationListView(generics.ListAPIView):
     """
 
     serializer_class = NotificationSerializer
+    authentication_classes = [TokenClaimsJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = NotificationPagination
 
@@ -35,3 +53,100 @@ class PushNotificationListView(generics.ListAPIView):
             notification_type=NotificationType.PUSH,
             recipient=self.request.user.user_name,
         ).order_by("-sent_at")
+
+
+class PushNotificationStreamView(AsyncAPIView):
+    """
+    Server-Sent Events stream of new in-app (push) notifications, replacing
+    repeated polling of PushNotificationListView.
+
+    Each event's id is the notification id. On reconnect, EventSource sends
+    it back as Last-Event-ID (or a client can pass ?since=<id>), and the
+    newest SSE_CATCH_UP_LIMIT notifications after it are replayed from the
+    database before live delivery resumes. Without either, only new
+    notifications are sent.
+    """
+
+    authentication_classes = [TokenClaimsJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    async def get(self, request):
+        since = request.headers.get("Last-Event-ID") or request.query_params.get(
+            "since"
+        )
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response(
+                    {"since": ["A valid integer is required."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        return EventStreamResponse(self.events(request.user.user_name, since))
+
+    async def events(self, recipient, since):
+        # Subscribe before the catch-up query so nothing committed in between
+        # is lost. Live messages for notifications the catch-up already sent
+        # are dropped; ids are not compared otherwise, because notifications
+        # can commit, and be published, out of id order.
+        async with get_hub().subscribe(notification_channel(recipient)) as subscription:
+            replayed = set()
+            if since is not None:
+                missed = Notification.objects.filter(
+                    notification_type=NotificationType.PUSH,
+                    recipient=recipient,
+                    id__gt=since,
+                ).order_by("-id")[: settings.SSE_CATCH_UP_LIMIT]
+                notifications = [notification async for notification in missed]
+                for notification in reversed(notifications):
+                    replayed.add(notification.id)
+                    yield format_event(
+                        NotificationSerializer(notification).data,
+                        event="notification",
+                        event_id=notification.id,
+                    )
+
+            async for item in relay(subscription):
+                if item is None:
+                    yield keepalive()
+                    continue
+                _, payload = item
+                if payload["id"] in replayed:
+                    replayed.discard(payload["id"])
+                    continue
+                yield format_event(
+                    payload, event="notification", event_id=payload["id"]
+                )
+
+
+class UnreadNotificationCountView(AsyncAPIView):
+    """
+    Unread in-app notification count for the badge. Served from Redis, or
+    from the NotificationInbox summary row on a miss; never counts rows in
+    the Notification table.
+    """
+
+    authentication_classes = [TokenClaimsJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
+        return Response({"unread": await unread_counter.aget(request.user.user_name)})
+
+
+class MarkNotificationsReadView(APIView):
+    """
+    Mark the user's in-app notifications as read, either the given `ids` or
+    `all` of them, and return the new unread count.
+    """
+
+    authentication_classes = [TokenClaimsJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        marked, unread = unread_counter.mark_read(
+            request.user.user_name, serializer.validated_data.get("ids")
+        )
+        return Response({"marked": marked, "unread": unread})